@@ -2,40 +2,173 @@ import streamlit as st
 import pandas as pd
 import os
 
+from money import from_cents
+from receipt_templates import is_store_header
+from settlement import settle_receipts
+from split_engine import SessionLedger, amounts_by_name, split_dataframe
+
 
 # --- Helper Functions ---
 def load_csv(file_path):
     """Load the CSV file and return as a DataFrame, skipping the store info row if found."""
     df = pd.read_csv(file_path)
     # Skip the first row if it contains store info
-    if (
-        "Aldi's" in df.iloc[0]["Item Name"]
-    ):  # Check if the first item's name has "Aldi's"
+    if is_store_header(
+        str(df.iloc[0]["Item Name"])
+    ):  # Check if the first item's name names a registered store
         df = df.iloc[1:].reset_index(drop=True)
     return df
 
 
-def calculate_splits(df, item_assignments):
-    """Calculate splits based on itemized data and assignments."""
-    participant_splits = {}
-    for _, row in df.iterrows():
-        item_name = row["Item Name"]
-        if item_assignments.get(item_name) == "excluded":
-            continue  # Skip items marked as excluded
+@st.cache_data(show_spinner=False, max_entries=64)
+def load_csv_cached(file_path, mtime):
+    """Parse a receipt CSV once per (path, modification time); reruns reuse the result."""
+    df = load_csv(file_path)
+    return df[~df["Item Name"].isin(["Subtotal", "Total"])].reset_index(drop=True)
+
+
+@st.cache_data(show_spinner=False)
+def list_csv_files(directory, mtime):
+    """List the CSV files of a folder, cached until the folder changes."""
+    return sorted(f for f in os.listdir(directory) if f.endswith(".csv"))
+
+
+def get_session():
+    """Return the session ledger aggregating every loaded receipt."""
+    if "session" not in st.session_state:
+        st.session_state.session = SessionLedger()
+        st.session_state.receipts = {}  # File path -> per-receipt UI state
+        st.session_state.editor_version = 0
+    return st.session_state.session
+
+
+def sync_receipts(file_paths):
+    """Load new or modified receipts into the session and drop deselected ones."""
+    session = get_session()
+    receipts = st.session_state.receipts
+    for file_path in list(receipts):
+        if file_path not in file_paths:
+            session.remove_receipt(file_path)
+            del receipts[file_path]
+    for file_path in file_paths:
+        mtime = os.path.getmtime(file_path)
+        state = receipts.get(file_path)
+        if state is not None and state["mtime"] == mtime:
+            continue  # Unchanged receipts keep their assignments
+        df = load_csv_cached(file_path, mtime)
+        session.add_receipt(file_path, amounts_by_name(df))
+        receipts[file_path] = {
+            "mtime": mtime,
+            "selections": {},  # Item name -> participants picked in the UI
+            "selected_rows": set(),  # Item names ticked for bulk actions
+            "payer": None,  # Participant who paid the receipt
+        }
+        st.session_state.editor_version += 1
+
+
+def set_participants(receipt_id, item_name, selected):
+    """Record an item's participants and update only the affected totals."""
+    st.session_state.receipts[receipt_id]["selections"][item_name] = selected
+    session = st.session_state.session
+    if session.receipts[receipt_id].assignments.get(item_name) != "excluded":
+        session.assign(receipt_id, item_name, selected)
 
-        assigned_participants = item_assignments.get(item_name, [])
-        if not assigned_participants:
-            continue  # Skip if no participants assigned
 
-        item_total = row["Price"] * row["Quantity"]
-        split_value = item_total / len(assigned_participants)
+def set_excluded(receipt_id, item_name, excluded):
+    """Exclude an item from the split or bring back its participants."""
+    selections = st.session_state.receipts[receipt_id]["selections"]
+    st.session_state.session.assign(
+        receipt_id,
+        item_name,
+        "excluded" if excluded else selections.get(item_name, []),
+    )
+
+
+def sync_participants(participants):
+    """Drop removed participants from the assignments, touching only the affected items."""
+    if st.session_state.get("participants") == participants:
+        return
+    st.session_state.participants = participants
+    for receipt_id, state in st.session_state.receipts.items():
+        for item_name, selected in list(state["selections"].items()):
+            kept = [p for p in selected if p in participants]
+            if kept != selected:
+                set_participants(receipt_id, item_name, kept)
+    st.session_state.editor_version += 1
 
-        for participant in assigned_participants:
-            if participant not in participant_splits:
-                participant_splits[participant] = 0.0
-            participant_splits[participant] += split_value
 
-    return participant_splits
+def editor_frame(receipt_id, item_names, participants):
+    """Build the item grid: one row per item, one checkbox column per participant."""
+    ledger = st.session_state.session.receipts[receipt_id]
+    state = st.session_state.receipts[receipt_id]
+    selections = state["selections"]
+    data = {
+        "Select": [name in state["selected_rows"] for name in item_names],
+        "Item": item_names,
+        "Amount": [from_cents(ledger.amounts[name]) for name in item_names],
+        "Excluded": [ledger.assignments.get(name) == "excluded" for name in item_names],
+    }
+    for participant in participants:
+        data[f"p:{participant}"] = [
+            participant in selections.get(name, ()) for name in item_names
+        ]
+    return pd.DataFrame(data)
+
+
+def on_edit(receipt_id, item_names, widget_key):
+    """Grid callback: apply only the edited cells to the session state and ledger."""
+    state = st.session_state.receipts[receipt_id]
+    for row, changes in st.session_state[widget_key]["edited_rows"].items():
+        item_name = item_names[row]
+        for column, value in changes.items():
+            if column == "Select":
+                if value:
+                    state["selected_rows"].add(item_name)
+                else:
+                    state["selected_rows"].discard(item_name)
+            elif column == "Excluded":
+                set_excluded(receipt_id, item_name, value)
+            elif column.startswith("p:"):
+                participant = column[2:]
+                selected = [
+                    p for p in state["selections"].get(item_name, [])
+                    if p != participant
+                ]
+                set_participants(
+                    receipt_id,
+                    item_name,
+                    selected + [participant] if value else selected,
+                )
+    st.session_state.editor_version += 1  # Rebuild the grid from the updated state
+
+
+def on_bulk(receipt_id, action, participants=()):
+    """Apply a bulk action to every selected row of a receipt."""
+    state = st.session_state.receipts[receipt_id]
+    for item_name in state["selected_rows"]:
+        if action == "assign":
+            current = state["selections"].get(item_name, [])
+            set_participants(
+                receipt_id,
+                item_name,
+                current + [p for p in participants if p not in current],
+            )
+        elif action == "clear":
+            set_participants(receipt_id, item_name, [])
+        else:
+            set_excluded(receipt_id, item_name, action == "exclude")
+    state["selected_rows"] = set()
+    st.session_state.editor_version += 1
+
+
+def calculate_splits(df, item_assignments):
+    """Calculate splits based on itemized data and assignments."""
+    return split_dataframe(df, item_assignments)
+
+
+def splits_table(splits):
+    """Participant splits as a two-column DataFrame."""
+    return pd.DataFrame(list(splits.items()), columns=["Participant", "Total Owed"])
 
 
 def export_csv(participant_splits, file_name="final_split.csv"):
@@ -51,93 +184,131 @@ def export_csv(participant_splits, file_name="final_split.csv"):
 st.title("Bill Splitter Dashboard")
 
 # Local File Selection
-st.sidebar.subheader("Select a CSV File")
+st.sidebar.subheader("Select CSV Files")
 csv_directory = "data/"  # Path to the folder containing CSV files
-csv_files = [f for f in os.listdir(csv_directory) if f.endswith(".csv")]
+csv_files = list_csv_files(csv_directory, os.path.getmtime(csv_directory))
 
 if csv_files:
-    selected_file = st.sidebar.selectbox("Available CSV Files", csv_files)
+    # Every receipt of the session keeps its own assignments
+    selected_files = st.sidebar.multiselect(
+        "Receipts in this session", csv_files, default=csv_files[:1]
+    )
+    sync_receipts([os.path.join(csv_directory, f) for f in selected_files])
+    session = get_session()
+
+    # Participant Management (initialize participants before usage)
+    st.sidebar.subheader("Participants")
+    participants = st.sidebar.text_area(
+        "Add participants (comma-separated):", "Alice, Bob"
+    )
+    participants = [name.strip() for name in participants.split(",") if name.strip()]
+    sync_participants(participants)
+
+    selected_file = None
+    if selected_files:
+        selected_file = st.sidebar.selectbox("Edit receipt", selected_files)
     if selected_file:
-        file_path = os.path.join(csv_directory, selected_file)
-        df = load_csv(file_path)
+        receipt_id = os.path.join(csv_directory, selected_file)
+        state = st.session_state.receipts[receipt_id]
+        if participants:
+            payer_index = (
+                participants.index(state["payer"])
+                if state["payer"] in participants
+                else 0
+            )
+            state["payer"] = st.sidebar.selectbox(
+                "Paid by", participants, index=payer_index
+            )
 
-        # Participant Management (initialize participants before usage)
-        st.sidebar.subheader("Participants")
-        participants = st.sidebar.text_area(
-            "Add participants (comma-separated):", "Alice, Bob"
+        # Display Itemized Receipt as a single grid, one row per distinct item name
+        st.subheader(f"Itemized Receipt (Editable): {selected_file}")
+        item_names = list(session.receipts[receipt_id].amounts)
+        editor_key = f"editor_{st.session_state.editor_version}"
+        column_config = {
+            "Select": st.column_config.CheckboxColumn("Select", width="small"),
+            "Amount": st.column_config.NumberColumn("Amount", format="$%.2f"),
+            "Excluded": st.column_config.CheckboxColumn("Excluded", width="small"),
+        }
+        for participant in participants:
+            column_config[f"p:{participant}"] = st.column_config.CheckboxColumn(
+                participant
+            )
+        st.data_editor(
+            editor_frame(receipt_id, item_names, participants),
+            key=editor_key,
+            column_config=column_config,
+            disabled=["Item", "Amount"],
+            hide_index=True,
+            on_change=on_edit,
+            args=(receipt_id, item_names, editor_key),
         )
-        participants = [
-            name.strip() for name in participants.split(",") if name.strip()
-        ]
 
-        # Initialize Session State for Exclusion
-        if "item_states" not in st.session_state:
-            st.session_state.item_states = {
-                row["Item Name"]: "included" for _, row in df.iterrows()
-            }
-
-        # Display Itemized Receipt
-        st.subheader("Itemized Receipt (Editable)")
-        item_assignments = {}  # Store assignments and exclusions
-
-        for i, row in df.iterrows():
-            item_name = row["Item Name"]
-            if item_name in ["Subtotal", "Total"]:
-                continue  # Skip subtotal and total
-
-            # Add row-specific exclusion toggle
-            col1, col2 = st.columns([2, 1])  # Create two columns for better alignment
-
-            with col1:
-                st.write(f"**{item_name}** - ${row['Price']} x {row['Quantity']}")
-
-            with col2:
-                # Toggle button to exclude/include the item
-                if st.button(
-                    "Exclude"
-                    if st.session_state.item_states[item_name] == "included"
-                    else "Include",
-                    key=f"toggle_{item_name}",
-                ):
-                    st.session_state.item_states[item_name] = (
-                        "excluded"
-                        if st.session_state.item_states[item_name] == "included"
-                        else "included"
-                    )
+        # Bulk-assign controls for the ticked rows
+        selected_count = len(state["selected_rows"])
+        bulk_participants = st.multiselect(
+            f"Assign the {selected_count} selected rows to:", participants
+        )
+        col1, col2, col3, col4 = st.columns(4)
+        col1.button(
+            "Assign selected",
+            on_click=on_bulk,
+            args=(receipt_id, "assign", bulk_participants),
+            disabled=not selected_count,
+        )
+        col2.button(
+            "Clear selected",
+            on_click=on_bulk,
+            args=(receipt_id, "clear"),
+            disabled=not selected_count,
+        )
+        col3.button(
+            "Exclude selected",
+            on_click=on_bulk,
+            args=(receipt_id, "exclude"),
+            disabled=not selected_count,
+        )
+        col4.button(
+            "Include selected",
+            on_click=on_bulk,
+            args=(receipt_id, "include"),
+            disabled=not selected_count,
+        )
 
-                # Grey out excluded rows
-                if st.session_state.item_states[item_name] == "excluded":
-                    st.markdown(
-                        f'<div style="color: grey; font-style: italic;">Excluded from split</div>',
-                        unsafe_allow_html=True,
-                    )
+        if participants:
+            # Totals are maintained incrementally by the ledgers
+            st.subheader("Receipt Split")
+            st.table(splits_table(session.receipt_splits(receipt_id)))
+
+            splits = session.splits()
+            st.subheader(f"Final Split ({len(selected_files)} receipts)")
+            st.table(splits_table(splits))
 
-            # Multiselect for assigning participants (only if included)
-            if st.session_state.item_states[item_name] == "included":
-                assigned = st.multiselect(
-                    f"Assign '{item_name}' to participants:",
-                    participants,
-                    key=item_name,
+            # Who pays whom, given who paid each receipt (defaults to the first participant)
+            payments = []
+            for rid, receipt_state in st.session_state.receipts.items():
+                payer = receipt_state["payer"]
+                if payer not in participants:
+                    payer = participants[0]
+                payments.append((payer, sum(session.receipt_splits(rid).values())))
+            st.subheader("Settlement")
+            try:
+                transfers = settle_receipts(
+                    payments, [session.receipt_splits(rid) for rid in session.receipts]
                 )
-                item_assignments[item_name] = assigned
+            except ValueError as error:
+                st.error(f"Cannot settle: {error}")
             else:
-                item_assignments[item_name] = "excluded"
-
-        if participants:
-            # Calculate Splits
-            if st.button("Calculate Splits"):
-                splits = calculate_splits(df, item_assignments)
-                st.subheader("Final Split")
                 st.table(
                     pd.DataFrame(
-                        list(splits.items()), columns=["Participant", "Total Owed"]
+                        [(t.debtor, t.creditor, t.amount) for t in transfers],
+                        columns=["From", "To", "Amount"],
                     )
                 )
 
-                # Export Splits
-                if st.button("Export to CSV"):
-                    file_name = export_csv(splits)
-                    st.success(f"Splits exported to {file_name}")
+            # Export Splits
+            if st.button("Export to CSV"):
+                file_name = export_csv(splits)
+                st.success(f"Splits exported to {file_name}")
 
 else:
     st.error(f"No CSV files found in {csv_directory}. Please add files to this folder.")
@@ -1,14 +1,27 @@
 import re
+import os
 import csv
+import glob
+import argparse
 import logging
-import tkinter as tk
-from tkinter import filedialog
-from typing import Dict, Any, List
+from itertools import chain, islice
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple
+
+from money import to_cents
+from receipt_templates import (
+    HEADER_LINES,
+    CompiledTemplate,
+    detect_template,
+    get_template,
+    match_date,
+)
 
 
 # Setup logging for debugging
 logging.basicConfig(level=logging.DEBUG)
 
+WHITESPACE_PATTERN = re.compile(r"\s{2,}")
+
 
 def log_debug_info(step: str, data: Any) -> None:
     """
@@ -32,31 +45,147 @@ def clean_text(text: str) -> str:
     Returns:
         str: Cleaned and normalized text.
     """
-    text = re.sub(r"\s{2,}", " ", text)  # Replace multiple spaces with one
+    text = WHITESPACE_PATTERN.sub(" ", text)  # Replace multiple spaces with one
     return text.strip()
 
 
 # Function to parse fields in a line
-def parse_fields(line: str) -> Dict[str, Any]:
+def parse_fields(line: str, template: Optional[CompiledTemplate] = None) -> Dict[str, Any]:
     """
-    Parse fields in a line separated by '|'.
+    Parse fields in a line using the store template's grammar ('|' separated by default).
 
     Args:
         line (str): A single line of text from the receipt.
+        template (CompiledTemplate): Store grammar, the generic one if omitted.
 
     Returns:
         dict: Parsed item details or an empty dict if parsing fails.
     """
-    fields = [field.strip() for field in line.split("|") if field.strip()]
-    if len(fields) >= 3:  # Ensure at least item name, price, and tax class
-        try:
-            price = float(fields[-2])  # Second last field as price
-            tax_class = fields[-1].upper()  # Last field as tax class
-            item_name = " ".join(fields[:-2])  # Rest as item name
-            return {"name": item_name, "price": price, "tax_class": tax_class}
-        except ValueError:
-            return {}  # Skip invalid rows
-    return {}  # Return empty if insufficient fields
+    return (template or get_template()).parse_fields(line)
+
+
+# Function to stream receipt lines into parsed events
+def iter_receipt_events(
+    lines: Iterable[str], template: Optional[CompiledTemplate] = None
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Incrementally parse receipt lines, yielding results as soon as they are recognized.
+
+    Without a template the store is detected from the first HEADER_LINES lines, falling
+    back to the generic grammar. Lines without the delimiter are buffered and prepended
+    to the next delimited line, so items wrapped over several OCR lines are still
+    recognized. Blank lines are ignored.
+
+    Args:
+        lines (Iterable[str]): Receipt lines, e.g. an open file or pipeline output.
+        template (CompiledTemplate): Store grammar to use instead of detecting it.
+
+    Yields:
+        tuple: ("store", str) first, then ("item", dict), ("date", str),
+        ("subtotal", float) or ("total", float). Items carry the 1-based number
+        of the line that completed them.
+    """
+    if template is None:
+        lines = iter(lines)
+        header = list(islice(lines, HEADER_LINES))
+        template = detect_template(header) or get_template()
+        lines = chain(header, lines)
+    yield "store", template.name
+
+    delimiter = template.delimiter
+    buffer: List[str] = []  # Fragments of an incomplete row
+    date_found = False
+    number = 0
+
+    for number, line in enumerate(lines, 1):
+        line = clean_text(line)
+        if not line:
+            continue
+
+        # The first date on the receipt is its purchase date
+        if not date_found and "/" in line:
+            date = match_date(line)
+            if date:
+                date_found = True
+                yield "date", date
+
+        # Check if line contains a valid row using the template delimiter
+        if delimiter in line:
+            if buffer:
+                buffer.append(line)
+                line = " ".join(buffer)  # Combine with buffered fragments
+                buffer.clear()
+
+            parsed_item = template.parse_fields(line)
+            if parsed_item:  # Valid item parsed
+                parsed_item["line"] = number
+                yield "item", parsed_item
+            else:
+                buffer.append(line)  # Keep for the next line
+        else:
+            buffer.append(line)  # Accumulate in buffer
+
+        # Check for subtotal and total patterns
+        totals = template.match_totals(line)
+        if totals:
+            yield totals
+
+    # If buffer still has content, attempt to parse it
+    if buffer:
+        parsed_item = template.parse_fields(" ".join(buffer))
+        if parsed_item:
+            parsed_item["line"] = number
+            yield "item", parsed_item
+
+
+# Function to parse receipt lines
+def parse_receipt_lines(
+    lines: Iterable[str], template: Optional[CompiledTemplate] = None
+) -> Dict[str, Any]:
+    """
+    Parse receipt lines into the store, items and totals in a single pass.
+
+    Args:
+        lines (Iterable[str]): Receipt lines, e.g. an open file or pipeline output.
+        template (CompiledTemplate): Store grammar, detected from the header if omitted.
+
+    Returns:
+        dict: Parsed receipt details with store, date, items, prices, tax info,
+        and totals.
+    """
+    parsed = {"store": None, "date": None, "items": [], "subtotal": 0.0, "total": 0.0}
+    for kind, value in iter_receipt_events(lines, template):
+        if kind == "item":
+            parsed["items"].append(value)
+        else:
+            parsed[kind] = value
+    difference = subtotal_difference(parsed)
+    if parsed["subtotal"] and difference:
+        logging.warning(
+            "Items add up to %d cents %s than the subtotal %.2f",
+            abs(difference),
+            "more" if difference > 0 else "less",
+            parsed["subtotal"],
+        )
+    return parsed
+
+
+# Function to reconcile items against the subtotal
+def subtotal_difference(parsed_data: Dict[str, Any]) -> int:
+    """
+    Compare the parsed items with the parsed subtotal, exactly in cents.
+
+    Args:
+        parsed_data (dict): Parsed receipt data.
+
+    Returns:
+        int: Sum of the item prices minus the subtotal in cents, 0 if they reconcile.
+    """
+    items = sum(
+        to_cents(item["price"]) * item.get("quantity", 1)
+        for item in parsed_data["items"]
+    )
+    return items - to_cents(parsed_data["subtotal"])
 
 
 # Function to process receipt text
@@ -70,47 +199,60 @@ def parse_aldi_receipt(text: str) -> Dict[str, Any]:
     Returns:
         dict: Parsed receipt details with items, prices, tax info, and totals.
     """
-    text = clean_text(text)  # Clean the input text
-    lines = text.split("\n")  # Split text into lines
+    return parse_receipt_lines(text.splitlines(), get_template("Aldi"))
 
-    items = []
-    subtotal = 0.0
-    total = 0.0
 
-    temp_buffer = ""  # Temporary buffer for incomplete rows
+# Function to parse receipt text files
+def parse_receipt_files(paths: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Parse receipt text files one at a time, streaming each file line by line.
 
-    for line in lines:
-        # Check if line contains a valid row using '|' as delimiter
-        if "|" in line:
-            if temp_buffer:
-                line = temp_buffer + " " + line  # Combine with buffered line
-                temp_buffer = ""  # Clear the buffer
+    Args:
+        paths (Iterable[str]): Text files, e.g. the outputs of Pipeline.save_text.
 
-            parsed_item = parse_fields(line)
-            if parsed_item:  # Valid item parsed
-                items.append(parsed_item)
-            else:
-                temp_buffer = line  # Store in buffer for the next line
-        else:
-            temp_buffer += " " + line  # Accumulate in buffer
+    Files that cannot be read or parsed are logged and skipped, so one bad receipt
+    does not stop a batch.
 
-        # Check for subtotal and total patterns
-        if "SUBTOTAL" in line.upper():
-            match = re.search(r"SUBTOTAL[\s|]+([\d\.]+)", line, re.IGNORECASE)
-            if match:
-                subtotal = float(match.group(1))
-        elif "TOTAL" in line.upper():
-            match = re.search(r"TOTAL[\s|]+\$?([\d\.]+)", line, re.IGNORECASE)
-            if match:
-                total = float(match.group(1))
+    Yields:
+        tuple: The file path and its parsed receipt details.
+    """
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as file:
+                parsed_receipt = parse_receipt_lines(file)
+        except (OSError, ValueError) as error:
+            logging.error(f"Skipping {path}: {error}")
+            continue
+        yield path, parsed_receipt
 
-    # If buffer still has content, attempt to parse it
-    if temp_buffer:
-        parsed_item = parse_fields(temp_buffer)
-        if parsed_item:
-            items.append(parsed_item)
 
-    return {"items": items, "subtotal": subtotal, "total": total}
+# Function to read OCR confidences saved next to a receipt text file
+def read_line_confidences(path: str) -> List[Optional[float]]:
+    """
+    Read the per-line OCR confidence written by Pipeline.save_text to '<name>.conf'.
+
+    Each line of the file holds 'engine:confidence' entries separated by '|', one
+    per text box of the matching receipt line; the lowest one is kept.
+
+    Args:
+        path (str): The receipt text file.
+
+    Returns:
+        list: Confidence of every receipt line, empty if no confidence file exists.
+    """
+    conf_path = os.path.splitext(path)[0] + ".conf"
+    if not os.path.exists(conf_path):
+        return []
+    confidences = []
+    with open(conf_path, "r", encoding="utf-8") as file:
+        for line in file:
+            values = [
+                float(entry.rsplit(":", 1)[1])
+                for entry in line.split("|")
+                if ":" in entry
+            ]
+            confidences.append(min(values) if values else None)
+    return confidences
 
 
 # Function to save parsed data to CSV
@@ -140,33 +282,100 @@ def save_to_csv(parsed_data: Dict[str, Any], filename: str) -> None:
         writer.writerow(["Total", parsed_data["total"]])
 
 
-# Main execution block
-if __name__ == "__main__":
-    # Use tkinter to choose file
+# Function to collect receipt text files
+def find_text_files(inputs: Iterable[str]) -> List[str]:
+    """
+    Expand files and folders into a sorted list of receipt text files.
+
+    Args:
+        inputs (Iterable[str]): Text files or folders containing them.
+
+    Returns:
+        list: Paths of the .txt files found.
+    """
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(sorted(glob.glob(os.path.join(path, "*.txt"))))
+        else:
+            paths.append(path)
+    return paths
+
+
+# Function to pick a single file interactively
+def choose_file() -> str:
+    """
+    Ask for a receipt text file with a tkinter dialog.
+
+    Returns:
+        str: The selected path, or an empty string if none was chosen.
+    """
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()  # Hide the main tkinter window
-    file_path = filedialog.askopenfilename(
+    return filedialog.askopenfilename(
         title="Select Receipt Text File", filetypes=[("Text Files", "*.txt")]
     )
 
-    if not file_path:
-        print("No file selected.")
-    else:
-        try:
-            with open(file_path, "r") as file:
-                receipt_text = file.read()
-
-            # Parse the receipt
-            parsed_receipt = parse_aldi_receipt(receipt_text)
-
-            # Debugging output
-            log_debug_info("Parsed Receipt", parsed_receipt)
 
-            # Save to CSV
-            save_to_csv(parsed_receipt, "aldi_receipt.csv")
+# Main execution block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse receipt text files into CSV")
+    parser.add_argument(
+        "inputs", nargs="*", help="Receipt .txt files or folders (Default: file dialog)"
+    )
+    parser.add_argument(
+        "-o", "--output", default=".", help="Output folder for batch mode (Default: .)"
+    )
+    parser.add_argument(
+        "-s",
+        "--store",
+        help="Append all receipts to this Parquet dataset instead of writing CSVs",
+    )
+    args = parser.parse_args()
+
+    if args.inputs and args.store:
+        # Headless bulk mode: every receipt goes into one columnar dataset
+        from receipt_store import ReceiptStoreWriter
+
+        with ReceiptStoreWriter(args.store) as writer:
+            for path, parsed_receipt in parse_receipt_files(find_text_files(args.inputs)):
+                writer.add(
+                    os.path.splitext(os.path.basename(path))[0],
+                    parsed_receipt,
+                    read_line_confidences(path),
+                )
+        print(f"Appended {writer.receipts} receipts ({writer.rows} items) to {args.store}")
+    elif args.inputs:
+        # Headless batch mode: one CSV per receipt, named after the text file
+        os.makedirs(args.output, exist_ok=True)
+        count = 0
+        for path, parsed_receipt in parse_receipt_files(find_text_files(args.inputs)):
+            name = os.path.splitext(os.path.basename(path))[0]
+            save_to_csv(parsed_receipt, os.path.join(args.output, f"{name}.csv"))
+            count += 1
+        print(f"Parsed {count} receipts into {args.output}")
+    else:
+        file_path = choose_file()
 
-            print("Parsed receipt saved to aldi_receipt.csv")
-        except FileNotFoundError:
-            print("The specified file was not found.")
-        except Exception as e:
-            print(f"An error occurred: {e}")
+        if not file_path:
+            print("No file selected.")
+        else:
+            try:
+                with open(file_path, "r") as file:
+                    # Parse the receipt
+                    parsed_receipt = parse_receipt_lines(file)
+
+                # Debugging output
+                log_debug_info("Parsed Receipt", parsed_receipt)
+
+                # Save to CSV
+                save_to_csv(parsed_receipt, "aldi_receipt.csv")
+
+                print("Parsed receipt saved to aldi_receipt.csv")
+            except FileNotFoundError:
+                print("The specified file was not found.")
+            except Exception as e:
+                print(f"An error occurred: {e}")
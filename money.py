@@ -0,0 +1,162 @@
+import re
+import sys
+from typing import Any, Sequence
+
+
+# numpy dtype of cent arrays; numpy is imported by the array functions only, so
+# parsing receipt text does not load it
+CENTS_DTYPE = "int64"
+
+AMOUNT_PATTERN = re.compile(r"^\s*([+-]?)\$?(\d*)(?:\.(\d*))?\s*$")
+
+
+def parse_cents(text: str) -> int:
+    """
+    Parse a decimal amount such as "12.99", "$3.5" or "-0.40" into integer cents.
+
+    Digits past the cents are rounded half away from zero without going through float.
+
+    Args:
+        text (str): The amount as written on the receipt.
+
+    Returns:
+        int: The amount in cents.
+
+    Raises:
+        ValueError: If the text is not a plain decimal amount.
+    """
+    match = AMOUNT_PATTERN.match(text)
+    if not match or not (match.group(2) or match.group(3)):
+        raise ValueError(f"Invalid amount: {text!r}")
+    sign, whole, fraction = match.group(1), match.group(2), match.group(3) or ""
+    cents = int(whole or "0") * 100 + int((fraction[:2] or "0").ljust(2, "0"))
+    if fraction[2:3] >= "5":
+        cents += 1
+    return -cents if sign == "-" else cents
+
+
+def to_cents(value: Any) -> int:
+    """
+    Convert a dollar amount (str, int or float) to integer cents.
+
+    Args:
+        value: The amount in dollars.
+
+    Returns:
+        int: The amount in cents, floats rounded to the nearest cent.
+    """
+    if isinstance(value, str):
+        return parse_cents(value)
+    return int(round(float(value) * 100))
+
+
+def to_cents_array(values) -> "np.ndarray":
+    """
+    Convert dollar amounts to an int64 array of cents in one vectorized step.
+
+    Args:
+        values: Sequence or array of amounts in dollars.
+
+    Returns:
+        numpy.ndarray: The amounts in cents.
+    """
+    import numpy as np
+
+    return np.rint(np.asarray(values, dtype=np.float64) * 100).astype(CENTS_DTYPE)
+
+
+def from_cents(cents):
+    """
+    Convert cents (int or array) back to dollars for display and CSV output.
+
+    Args:
+        cents: Amount(s) in cents.
+
+    Returns:
+        float or numpy.ndarray: The amount(s) in dollars.
+    """
+    np = sys.modules.get("numpy")  # Without numpy loaded, cents cannot be an array
+    if np is not None and isinstance(cents, np.ndarray):
+        return cents / 100
+    return int(cents) / 100
+
+
+def format_cents(cents: int) -> str:
+    """
+    Format cents as a dollar string, e.g. 1299 -> "$12.99".
+
+    Args:
+        cents (int): The amount in cents.
+
+    Returns:
+        str: The formatted amount.
+    """
+    sign = "-" if cents < 0 else ""
+    whole, rest = divmod(abs(int(cents)), 100)
+    return f"{sign}${whole}.{rest:02d}"
+
+
+def allocate(amounts, weights) -> "np.ndarray":
+    """
+    Split each amount into integer cents in proportion to a row of weights.
+
+    Every row is floored first; the leftover cents go one each to the shares with
+    the largest remainders, ties going to the leftmost column. Rows therefore always
+    sum exactly to their amount, and the result does not depend on the call order.
+
+    Args:
+        amounts: Amounts in cents, shape (n,).
+        weights: Non-negative weights, shape (n, m). Integral weights are split
+            exactly; other weights use float shares before the remainder step.
+
+    Returns:
+        numpy.ndarray: int64 shares, shape (n, m); rows with no weight are all zero.
+    """
+    import numpy as np
+
+    amounts = np.asarray(amounts, dtype=CENTS_DTYPE)
+    weights = np.asarray(weights)
+    if weights.ndim == 1:
+        return allocate(amounts[None], weights[None])[0]
+
+    if np.issubdtype(weights.dtype, np.integer) or np.array_equal(
+        weights, np.round(weights)
+    ):
+        weights = weights.astype(CENTS_DTYPE)
+        row_sums = weights.sum(axis=1, keepdims=True)
+        divisor = np.where(row_sums > 0, row_sums, 1)
+        numerators = amounts[:, None] * weights
+        shares = numerators // divisor
+        remainders = numerators - shares * divisor  # Same divisor across a row
+    else:
+        weights = weights.astype(np.float64)
+        row_sums = weights.sum(axis=1, keepdims=True)
+        divisor = np.where(row_sums > 0, row_sums, 1.0)
+        exact = amounts[:, None] * weights / divisor
+        shares = np.floor(exact).astype(CENTS_DTYPE)
+        remainders = exact - shares
+
+    left = amounts - shares.sum(axis=1)
+    order = np.argsort(-remainders, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(
+        ranks, order, np.arange(weights.shape[1])[None].repeat(len(order), 0), axis=1
+    )
+    shares += (ranks < left[:, None]) & (weights > 0)
+    shares[row_sums[:, 0] <= 0] = 0
+    return shares
+
+
+def split_evenly(amount: int, n: int) -> Sequence[int]:
+    """
+    Split cents into n shares differing by at most one cent, larger shares first.
+
+    Args:
+        amount (int): The amount in cents.
+        n (int): Number of shares.
+
+    Returns:
+        list: The shares, summing to amount.
+    """
+    base, extra = divmod(int(amount), n)
+    return [base + 1 if i < extra else base for i in range(n)]
@@ -1,9 +1,28 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import csv
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-import copy
+import os
+import sys
+from collections import deque
+
+# The shared split engine lives at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from split_engine import BillItem, BillLedger, resolve_split_quantities
+
+# Number of item changes that can be undone
+HISTORY_LIMIT = 100
+
+
+def bill_item(details):
+    # Build the split engine's item from the stored item details
+    return BillItem(
+        details["name"],
+        details["price"],
+        details["quantity"],
+        details["category"],
+        details["tax_rate"],
+        details["split_quantities"],
+    )
 
 
 class BillSplitterApp:
@@ -16,8 +35,14 @@ class BillSplitterApp:
         self.participants = []
         self.categories = {"Groceries (non-taxable)": 0.0}
         self.item_splits = {}
-        self.action_stack = []
+        self.ledger = BillLedger()  # Running totals, updated per item change
+        self.chart_canvas = None  # Pie chart, matplotlib is loaded on first use
+        # Undo history of item changes: (item_id, index, details before, details after)
+        self.action_stack = deque(maxlen=HISTORY_LIMIT)
         self.redo_stack = []
+        self.split_frames = {}  # Item id -> its "Split for" frame
+        self.item_counter = 0
+        self.first_split_row = 9  # Split frames follow the item widgets
 
         # Setup the main layout with a canvas and scrollbar
         self.setup_main_layout()
@@ -209,15 +234,28 @@ class BillSplitterApp:
             # Remove from participants list
             if entry in self.participants:
                 self.participants.remove(entry)
-            # Remove associated item splits
-            items_to_remove = []
-            for item_id, details in self.item_splits.items():
-                if participant_name in details["split_quantities"]:
-                    del details["split_quantities"][participant_name]
-                    if not details["split_quantities"]:
-                        items_to_remove.append(item_id)
-            for item_id in items_to_remove:
-                del self.item_splits[item_id]
+            # Drop them from their items, removing items nobody else takes; one
+            # undoable command per item, later rows first so the indices of the
+            # rows before them still hold
+            items = list(self.item_splits.items())
+            for index in reversed(range(len(items))):
+                item_id, details = items[index]
+                if participant_name not in details["split_quantities"]:
+                    continue
+                split_data = dict(details["split_quantities"])
+                del split_data[participant_name]
+                new_details = None
+                if split_data:
+                    new_details = dict(
+                        details,
+                        responsible_people=[
+                            p
+                            for p in details["responsible_people"]
+                            if p != participant_name
+                        ],
+                        split_quantities=split_data,
+                    )
+                self.do_command(item_id, index, details, new_details)
             # Remove the entry widget
             entry.destroy()
             self.show_participant_checkboxes()
@@ -343,15 +381,32 @@ class BillSplitterApp:
         )
         redo_btn.grid(row=7, column=1, pady=5, padx=5, sticky="e")
 
+        # Edit and Remove Buttons for the item selected in the listbox
+        edit_btn = tk.Button(
+            self.items_frame,
+            text="Edit Selected",
+            command=self.edit_item,
+            bg="#2196F3",
+            fg="white",
+            font=("Arial", 12, "bold"),
+        )
+        edit_btn.grid(row=8, column=0, pady=5, padx=5, sticky="w")
+
+        remove_btn = tk.Button(
+            self.items_frame,
+            text="Remove Selected",
+            command=self.remove_item,
+            bg="#f44336",
+            fg="white",
+            font=("Arial", 12, "bold"),
+        )
+        remove_btn.grid(row=8, column=1, pady=5, padx=5, sticky="e")
+
     def add_item(self):
         if not self.participant_vars:
             messagebox.showerror("Error", "Please add and select participants first.")
             return
 
-        # Save current state for undo
-        self.action_stack.append(copy.deepcopy(self.item_splits))
-        self.redo_stack.clear()
-
         # Collect responsible participants
         responsible_people = [
             name for name, var in self.participant_vars if var.get() == 1
@@ -390,75 +445,20 @@ class BillSplitterApp:
         tax_rate = self.categories.get(category, 0.0)
 
         # Create a unique identifier for the item
-        item_id = f"{item_name}_{len(self.item_splits) + 1}"
+        self.item_counter += 1
+        item_id = f"{item_name}_{self.item_counter}"
 
-        # Create a sub-frame for split inputs
-        split_frame = tk.LabelFrame(
-            self.items_frame, text=f"Split for '{item_name}'", padx=10, pady=10
-        )
-        split_frame.grid(
-            row=len(self.item_splits) + 8,
-            column=0,
-            columnspan=2,
-            padx=5,
-            pady=5,
-            sticky="w",
-        )
-
-        split_quantities = {}
-
-        for i, person in enumerate(responsible_people):
-            split_label = tk.Label(
-                split_frame, text=f"{person}'s Quantity:", font=("Arial", 12)
-            )
-            split_label.grid(row=i, column=0, padx=5, pady=5, sticky="w")
-
-            split_entry = tk.Entry(split_frame, font=("Arial", 12))
-            split_entry.grid(row=i, column=1, padx=5, pady=5, sticky="w")
-            split_quantities[person] = split_entry.get().strip()
-
-        # Validate and store split quantities
-        split_data = {}
-        specified_quantities = 0.0
-        unspecified_participants = []
-
-        for person in responsible_people:
-            qty = split_quantities[person]
-            if qty:
-                try:
-                    qty_val = float(qty)
-                    if qty_val < 0:
-                        raise ValueError
-                    split_data[person] = qty_val
-                    specified_quantities += qty_val
-                except ValueError:
-                    messagebox.showerror(
-                        "Error",
-                        f"Please enter a valid non-negative quantity for {person}.",
-                    )
-                    return
-            else:
-                unspecified_participants.append(person)
-
-        remaining_quantity = item_quantity - specified_quantities
-        if remaining_quantity < 0:
-            messagebox.showerror(
-                "Error",
-                f"The total specified quantities exceed the total item quantity for '{item_name}'.",
+        # Split the quantity equally; "Edit Selected" changes the item later
+        try:
+            split_data = resolve_split_quantities(
+                item_name, item_quantity, responsible_people, {}
             )
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
 
-        equal_split = (
-            remaining_quantity / len(unspecified_participants)
-            if unspecified_participants
-            else 0.0
-        )
-
-        for person in unspecified_participants:
-            split_data[person] = equal_split
-
-        # Store item details
-        self.item_splits[item_id] = {
+        # Store item details and show its row
+        details = {
             "name": item_name,
             "price": item_price,
             "quantity": item_quantity,
@@ -467,76 +467,140 @@ class BillSplitterApp:
             "responsible_people": responsible_people,
             "split_quantities": split_data,
         }
-
-        # Add item to the listbox
-        self.added_items_box.insert(
-            tk.END,
-            f"{item_name} - ${item_price:.2f} x {item_quantity} - {category} - Split among {', '.join(responsible_people)}",
-        )
+        self.do_command(item_id, len(self.item_splits), None, details)
 
         # Clear item entry fields
         self.item_name_entry.delete(0, tk.END)
         self.item_price_entry.delete(0, tk.END)
         self.item_quantity_entry.delete(0, tk.END)
 
+    def selected_item(self):
+        # Return the index and id of the item selected in the listbox
+        selection = self.added_items_box.curselection()
+        if not selection:
+            messagebox.showinfo("Info", "Please select an item first.")
+            return None, None
+        index = selection[0]
+        return index, list(self.item_splits)[index]
+
+    def edit_item(self):
+        index, item_id = self.selected_item()
+        if item_id is None:
+            return
+        details = self.item_splits[item_id]
+
+        item_price = simpledialog.askfloat(
+            "Edit Item",
+            f"Price of '{details['name']}' ($):",
+            initialvalue=details["price"],
+            minvalue=0.0,
+        )
+        if item_price is None:
+            return
+        item_quantity = simpledialog.askinteger(
+            "Edit Item",
+            f"Quantity of '{details['name']}':",
+            initialvalue=details["quantity"],
+            minvalue=1,
+        )
+        if item_quantity is None:
+            return
+
+        # A new quantity is shared equally again
+        split_data = details["split_quantities"]
+        if item_quantity != details["quantity"]:
+            split_data = resolve_split_quantities(
+                details["name"], item_quantity, details["responsible_people"], {}
+            )
+        new_details = dict(
+            details,
+            price=item_price,
+            quantity=item_quantity,
+            split_quantities=split_data,
+        )
+        self.do_command(item_id, index, details, new_details)
+
+    def remove_item(self):
+        index, item_id = self.selected_item()
+        if item_id is None:
+            return
+        self.do_command(item_id, index, self.item_splits[item_id], None)
+
+    def do_command(self, item_id, index, before, after):
+        # Record an item change for undo and apply it; item details are never
+        # mutated in place, so the log holds references instead of copies
+        self.action_stack.append((item_id, index, before, after))
+        self.redo_stack.clear()
+        self.apply_item_change(item_id, index, after)
+
     def undo_action(self):
         if self.action_stack:
-            last_state = self.action_stack.pop()
-            self.redo_stack.append(copy.deepcopy(self.item_splits))
-            self.item_splits = last_state
-            self.refresh_items()
+            item_id, index, before, after = self.action_stack.pop()
+            self.redo_stack.append((item_id, index, before, after))
+            self.apply_item_change(item_id, index, before)
         else:
             messagebox.showinfo("Info", "No actions to undo.")
 
     def redo_action(self):
         if self.redo_stack:
-            next_state = self.redo_stack.pop()
-            self.action_stack.append(copy.deepcopy(self.item_splits))
-            self.item_splits = next_state
-            self.refresh_items()
+            item_id, index, before, after = self.redo_stack.pop()
+            self.action_stack.append((item_id, index, before, after))
+            self.apply_item_change(item_id, index, after)
         else:
             messagebox.showinfo("Info", "No actions to redo.")
 
-    def refresh_items(self):
-        # Clear split frames
-        for widget in self.items_frame.winfo_children():
-            if isinstance(widget, tk.LabelFrame) and "Split for" in widget["text"]:
-                widget.destroy()
-        # Clear added items listbox
-        self.added_items_box.delete(0, tk.END)
-        # Recreate item entries
-        for item_id, details in self.item_splits.items():
-            # Recreate split frames
-            split_frame = tk.LabelFrame(
-                self.items_frame,
-                text=f"Split for '{details['name']}'",
-                padx=10,
-                pady=10,
+    def apply_item_change(self, item_id, index, details):
+        # Set (or remove, if details is None) one item and update only its widgets
+        self.ledger.set_item(item_id, None if details is None else bill_item(details))
+        if item_id in self.item_splits:
+            del self.item_splits[item_id]
+            self.added_items_box.delete(index)
+            self.split_frames.pop(item_id).destroy()
+        if details is None:
+            self.grid_split_frames(index)
+            return
+
+        items = list(self.item_splits.items())
+        items.insert(index, (item_id, details))
+        self.item_splits = dict(items)
+
+        # Split frame with the resolved quantities
+        split_frame = tk.LabelFrame(
+            self.items_frame,
+            text=f"Split for '{details['name']}'",
+            padx=10,
+            pady=10,
+        )
+        split_data = details["split_quantities"]
+        for i, person in enumerate(details["responsible_people"]):
+            split_label = tk.Label(
+                split_frame, text=f"{person}'s Quantity:", font=("Arial", 12)
             )
-            split_frame.grid(
-                row=len(self.item_splits) + 8,
+            split_label.grid(row=i, column=0, padx=5, pady=5, sticky="w")
+
+            split_entry = tk.Entry(split_frame, font=("Arial", 12))
+            split_entry.insert(0, split_data[person])
+            split_entry.grid(row=i, column=1, padx=5, pady=5, sticky="w")
+        self.split_frames[item_id] = split_frame
+        self.grid_split_frames(index)
+
+        # Listbox row at the item's position
+        self.added_items_box.insert(
+            index,
+            f"{details['name']} - ${details['price']:.2f} x {details['quantity']} - {details['category']} - Split among {', '.join(details['responsible_people'])}",
+        )
+
+    def grid_split_frames(self, start):
+        # Re-grid the split frames from position start on, in listbox order
+        for position, item_id in enumerate(list(self.item_splits)[start:], start):
+            self.split_frames[item_id].grid(
+                row=self.first_split_row + position,
                 column=0,
                 columnspan=2,
                 padx=5,
                 pady=5,
                 sticky="w",
             )
-            split_data = details["split_quantities"]
-            for i, person in enumerate(details["responsible_people"]):
-                split_label = tk.Label(
-                    split_frame, text=f"{person}'s Quantity:", font=("Arial", 12)
-                )
-                split_label.grid(row=i, column=0, padx=5, pady=5, sticky="w")
-
-                split_entry = tk.Entry(split_frame, font=("Arial", 12))
-                split_entry.insert(0, split_data[person])
-                split_entry.grid(row=i, column=1, padx=5, pady=5, sticky="w")
-
-            # Re-add item to the listbox
-            self.added_items_box.insert(
-                tk.END,
-                f"{details['name']} - ${details['price']:.2f} x {details['quantity']} - {details['category']} - Split among {', '.join(details['responsible_people'])}",
-            )
 
     def setup_categories_section(self):
         # Category management section
@@ -736,23 +800,7 @@ class BillSplitterApp:
         visualize_btn.grid(row=9, column=0, columnspan=2, pady=10, padx=5, sticky="w")
 
     def calculate_final_bill(self):
-        # Initialize totals with detailed breakdown
-        totals = {
-            entry.get().strip(): {
-                "total_before_tax": 0.0,
-                "taxable": 0.0,
-                "tax": 0.0,
-                "total_owed": 0.0,
-            }
-            for entry in self.participants
-        }
-
-        # Initialize aggregate variables
-        aggregate_total_before_discount = 0.0
-        aggregate_taxable = 0.0
-        aggregate_non_taxable = 0.0
-        aggregate_tax_paid = 0.0
-        aggregate_total = 0.0
+        participants = [entry.get().strip() for entry in self.participants]
 
         # Handle empty discount field by setting discount to 0 if left blank
         try:
@@ -761,98 +809,34 @@ class BillSplitterApp:
                 if self.discount_entry.get()
                 else 0.0
             )
-            if not (0 <= discount < 1):
-                raise ValueError
+            # Only the taxable items are re-allocated when the discount changed
+            self.ledger.set_discount(discount)
         except ValueError:
             messagebox.showerror(
                 "Error", "Please enter a valid discount value between 0 and 100."
             )
             return None
 
-        # Iterate through each item to calculate splits
-        for item_id, details in self.item_splits.items():
-            price = details["price"]
-            quantity = details["quantity"]
-            category = details["category"]
-            tax_rate = details["tax_rate"]
-            responsible_people = details["responsible_people"]
-            split_quantities = details["split_quantities"]
-
-            total_price = price * quantity
-
-            if tax_rate > 0:
-                # Taxable item: apply discount first
-                discounted_total_price = total_price * (1 - discount)
-                tax_amount = discounted_total_price * (tax_rate / 100)
-                total_price_with_tax = discounted_total_price + tax_amount
-            else:
-                # Non-taxable item: no discount
-                discounted_total_price = total_price
-                tax_amount = 0.0
-                total_price_with_tax = discounted_total_price
-
-            # Update aggregate amounts before discount
-            aggregate_total_before_discount += total_price
-
-            # Calculate each person's share
-            for person, qty in split_quantities.items():
-                if quantity == 0:
-                    person_share_before_tax = 0.0
-                    taxable_share = 0.0
-                    tax_share = 0.0
-                    person_total = 0.0
-                else:
-                    if tax_rate > 0:
-                        # Taxable item
-                        person_share_before_tax = (
-                            qty / quantity
-                        ) * discounted_total_price
-                        taxable_share = person_share_before_tax
-                        tax_share = (qty / quantity) * tax_amount
-                        person_total = person_share_before_tax + tax_share
-                    else:
-                        # Non-taxable item
-                        person_share_before_tax = (
-                            qty / quantity
-                        ) * discounted_total_price
-                        taxable_share = 0.0
-                        tax_share = 0.0
-                        person_total = person_share_before_tax
-
-                totals[person]["total_before_tax"] += person_share_before_tax
-                totals[person]["taxable"] += taxable_share
-                totals[person]["tax"] += tax_share
-                totals[person]["total_owed"] += person_total
-
-                # Update aggregate amounts
-                if tax_rate > 0:
-                    aggregate_taxable += taxable_share
-                    aggregate_tax_paid += tax_share
-                else:
-                    aggregate_non_taxable += person_share_before_tax
-                aggregate_total += person_total
+        summary = self.ledger.summary(participants)
 
         # Update aggregate labels
-        aggregate_amount_before_discount = aggregate_total_before_discount
-        aggregate_amount_after_discount = aggregate_total
-
         self.total_amount_label.config(
-            text=f"Total Amount (Before Discount): ${aggregate_total_before_discount:.2f}"
+            text=f"Total Amount (Before Discount): ${summary.total_before_discount:.2f}"
         )
         self.taxable_amount_label.config(
-            text=f"Total Taxable Amount: ${aggregate_taxable:.2f}"
+            text=f"Total Taxable Amount: ${summary.taxable:.2f}"
         )
         self.non_taxable_amount_label.config(
-            text=f"Total Non-Taxable Amount: ${aggregate_non_taxable:.2f}"
+            text=f"Total Non-Taxable Amount: ${summary.non_taxable:.2f}"
         )
         self.amount_before_discount_label.config(
-            text=f"Amount Before Discount: ${aggregate_amount_before_discount:.2f}"
+            text=f"Amount Before Discount: ${summary.total_before_discount:.2f}"
         )
         self.amount_after_discount_label.config(
-            text=f"Amount After Discount: ${aggregate_amount_after_discount:.2f}"
+            text=f"Amount After Discount: ${summary.total_after_discount:.2f}"
         )
 
-        return totals
+        return summary.totals
 
     def show_split(self):
         # Clear previous results
@@ -883,6 +867,10 @@ class BillSplitterApp:
         names = list(totals.keys())
         amounts = [amounts["total_owed"] for amounts in totals.values()]
 
+        # matplotlib is only needed here, so it is not imported at startup
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots(figsize=(6, 6))
         ax.pie(amounts, labels=names, autopct="%1.1f%%", startangle=140)
         ax.axis("equal")  # Equal aspect ratio ensures the pie chart is circular.
@@ -890,13 +878,19 @@ class BillSplitterApp:
 
         # Embed the chart in the Tkinter window
         # Remove previous visualizations
-        for widget in self.final_bill_frame.winfo_children():
-            if isinstance(widget, FigureCanvasTkAgg):
-                widget.get_tk_widget().destroy()
+        self.clear_chart()
+
+        self.chart_canvas = FigureCanvasTkAgg(fig, master=self.final_bill_frame)
+        self.chart_canvas.draw()
+        self.chart_canvas.get_tk_widget().grid(
+            row=10, column=0, columnspan=2, padx=5, pady=5
+        )
+        plt.close(fig)
 
-        canvas = FigureCanvasTkAgg(fig, master=self.final_bill_frame)
-        canvas.draw()
-        canvas.get_tk_widget().grid(row=10, column=0, columnspan=2, padx=5, pady=5)
+    def clear_chart(self):
+        if self.chart_canvas is not None:
+            self.chart_canvas.get_tk_widget().destroy()
+            self.chart_canvas = None
 
     def export_to_csv(self):
         totals = self.calculate_final_bill()
@@ -934,6 +928,7 @@ class BillSplitterApp:
     def reset_bill(self):
         # Clear all data structures
         self.item_splits.clear()
+        self.ledger = BillLedger()
         self.action_stack.clear()
         self.redo_stack.clear()
 
@@ -947,9 +942,9 @@ class BillSplitterApp:
             widget.destroy()
 
         # Clear split frames
-        for widget in self.items_frame.winfo_children():
-            if isinstance(widget, tk.LabelFrame) and "Split for" in widget["text"]:
-                widget.destroy()
+        for split_frame in self.split_frames.values():
+            split_frame.destroy()
+        self.split_frames.clear()
 
         # Clear added items listbox
         self.added_items_box.delete(0, tk.END)
@@ -975,9 +970,7 @@ class BillSplitterApp:
         self.amount_after_discount_label.config(text="Amount After Discount: $0.00")
 
         # Clear visualization
-        for widget in self.final_bill_frame.winfo_children():
-            if isinstance(widget, FigureCanvasTkAgg):
-                widget.get_tk_widget().destroy()
+        self.clear_chart()
 
     def run(self):
         self.root.mainloop()
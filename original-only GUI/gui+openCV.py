@@ -1,12 +1,80 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import re
+import os
+import queue
+import threading
 import pytesseract
 import cv2
 from PIL import Image
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
+ITEM_LINE_PATTERN = re.compile(r"(.+?)\s+\$([\d\.]+)")
+
+# How often the Tk loop checks the ingest queue (ms)
+POLL_INTERVAL = 100
+
+# Same as split_engine.DEFAULT_CATEGORY, without loading the engine and numpy
+DEFAULT_CATEGORY = "Groceries (non-taxable)"
+
+
+def ocr_image(image_path):
+    """Threshold a receipt image and run Tesseract on it."""
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError(f"Cannot read image '{image_path}'")
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
+    return pytesseract.image_to_string(thresh)
+
+
+def parse_item_lines(text, source=None):
+    """
+    Extract item records ("name $price" lines) from OCR text.
+    Items start with quantity 1 in the default category, not yet assigned.
+    """
+    items = []
+    for line in text.split("\n"):
+        match = ITEM_LINE_PATTERN.match(line)
+        if match:
+            try:
+                item_price = float(match.group(2).strip())
+            except ValueError:
+                continue
+            items.append(new_item(match.group(1).strip(), item_price, source))
+    return items
+
+
+def new_item(item_name, item_price, source=None):
+    """Full item record, in the same layout as the other bill splitter GUIs."""
+    return {
+        "name": item_name,
+        "price": item_price,
+        "quantity": 1,
+        "category": DEFAULT_CATEGORY,
+        "tax_rate": 0.0,
+        "responsible_people": [],
+        "split_quantities": {},
+        "source": source,
+    }
+
+
+def ingest_worker(image_paths, results, cancel_event):
+    """
+    OCR and parse images off the Tk thread, reporting through the results queue:
+    ("items", path, records), ("error", path, message) and finally ("done", None, None).
+    """
+    for image_path in image_paths:
+        if cancel_event.is_set():
+            break
+        try:
+            text = ocr_image(image_path)
+            results.put(("items", image_path, parse_item_lines(text, image_path)))
+        except Exception as e:
+            results.put(("error", image_path, str(e)))
+    results.put(("done", None, None))
+
 
 class BillSplitterApp:
     def __init__(self, root):
@@ -16,7 +84,13 @@ class BillSplitterApp:
 
         # Initialize data structures
         self.participants = []
-        self.item_splits = {}
+        self.item_splits = {}  # Key: unique item identifier, Value: item details
+        self.item_counter = 0
+
+        # Background image ingest
+        self.ingest_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.ingest_thread = None
 
         # Setup the main layout
         self.setup_main_layout()
@@ -119,60 +193,111 @@ class BillSplitterApp:
             messagebox.showerror("Invalid Input", "Item name cannot be empty.")
             return
 
-        self.item_splits[item_name] = item_price
+        self.store_item(new_item(item_name, item_price))
         messagebox.showinfo(
             "Success", f"Item '{item_name}' added with price ${item_price:.2f}."
         )
 
+    def store_item(self, details):
+        self.item_counter += 1
+        self.item_splits[f"{details['name']}_{self.item_counter}"] = details
+
     def setup_image_upload_section(self):
         self.image_upload_frame = tk.LabelFrame(
-            self.main_frame, text="Upload Bill Image", padx=10, pady=10
+            self.main_frame, text="Upload Bill Images", padx=10, pady=10
         )
         self.image_upload_frame.pack(fill="x", padx=10, pady=5)
 
-        tk.Button(
+        self.upload_button = tk.Button(
             self.image_upload_frame,
-            text="Upload Image",
+            text="Upload Images",
             font=("Arial", 12),
             command=self.upload_and_process_image,
-        ).pack(pady=10)
+        )
+        self.upload_button.pack(side="left", pady=10)
+
+        self.cancel_button = tk.Button(
+            self.image_upload_frame,
+            text="Cancel",
+            font=("Arial", 12),
+            command=self.cancel_ingest,
+            state="disabled",
+        )
+        self.cancel_button.pack(side="left", padx=10, pady=10)
+
+        self.progress = ttk.Progressbar(
+            self.image_upload_frame, mode="determinate", length=300
+        )
+        self.progress.pack(side="left", padx=10)
+
+        self.status_label = tk.Label(
+            self.image_upload_frame, text="", font=("Arial", 12)
+        )
+        self.status_label.pack(side="left", padx=5)
 
     def upload_and_process_image(self):
-        image_path = filedialog.askopenfilename(
-            title="Select Image",
+        image_paths = filedialog.askopenfilenames(
+            title="Select Images",
             filetypes=(("Image Files", "*.jpg *.png *.jpeg"), ("All Files", "*.*")),
         )
-        if not image_path:
+        if not image_paths:
             return
 
-        try:
-            image = cv2.imread(image_path)
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-            text = pytesseract.image_to_string(thresh)
-            self.process_extracted_text(text)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to process image: {e}")
-
-    def process_extracted_text(self, text):
-        """
-        Process the text extracted from the image.
-        Example: Extract item name, price, and tax type from text.
-        """
-        lines = text.split("\n")
-        for line in lines:
-            match = re.match(r"(.+?)\s+\$([\d\.]+)", line)
-            if match:
-                item_name = match.group(1).strip()
-                try:
-                    item_price = float(match.group(2).strip())
-                except ValueError:
-                    continue
-                self.item_splits[item_name] = item_price
-
-        messagebox.showinfo(
-            "Processing Complete", "Bill details have been processed and added."
+        # OCR runs on a worker thread; results come back through the queue
+        self.cancel_event.clear()
+        self.ingest_errors = []
+        self.ingested_items = 0
+        self.progress.configure(maximum=len(image_paths), value=0)
+        self.status_label.config(text=f"0/{len(image_paths)} images")
+        self.upload_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self.ingest_thread = threading.Thread(
+            target=ingest_worker,
+            args=(list(image_paths), self.ingest_queue, self.cancel_event),
+            daemon=True,
         )
+        self.ingest_thread.start()
+        self.root.after(POLL_INTERVAL, self.poll_ingest)
+
+    def cancel_ingest(self):
+        # The image being processed finishes; the rest are skipped
+        self.cancel_event.set()
+        self.cancel_button.config(state="disabled")
+        self.status_label.config(text="Cancelling...")
+
+    def poll_ingest(self):
+        # Drain the worker's results on the Tk thread
+        while True:
+            try:
+                kind, image_path, payload = self.ingest_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "done":
+                self.finish_ingest()
+                return
+            if kind == "items":
+                for details in payload:
+                    self.store_item(details)
+                self.ingested_items += len(payload)
+            else:
+                self.ingest_errors.append(f"{os.path.basename(image_path)}: {payload}")
+            self.progress["value"] += 1
+            self.status_label.config(
+                text=f"{int(self.progress['value'])}/{int(self.progress['maximum'])} images"
+            )
+        self.root.after(POLL_INTERVAL, self.poll_ingest)
+
+    def finish_ingest(self):
+        self.upload_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+        cancelled = self.cancel_event.is_set()
+        self.status_label.config(text="Cancelled" if cancelled else "Done")
+        message = f"{self.ingested_items} items added from the processed images."
+        if self.ingest_errors:
+            message += "\n\nFailed to process:\n" + "\n".join(self.ingest_errors)
+            messagebox.showerror("Processing Complete", message)
+        else:
+            messagebox.showinfo("Processing Complete", message)
 
     def setup_final_bill_section(self):
         self.final_bill_frame = tk.LabelFrame(
@@ -193,7 +318,10 @@ class BillSplitterApp:
             return
 
         final_bill_text = "\n".join(
-            [f"{name}: ${price:.2f}" for name, price in self.item_splits.items()]
+            [
+                f"{details['name']}: ${details['price']:.2f}"
+                for details in self.item_splits.values()
+            ]
         )
         messagebox.showinfo("Final Bill", final_bill_text)
 
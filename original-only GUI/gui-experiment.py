@@ -4,6 +4,12 @@ import csv
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
 import copy
+import os
+import sys
+
+# The shared split engine lives at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from split_engine import BillItem, calculate_bill, resolve_split_quantities
 
 
 class BillSplitterApp:
@@ -418,45 +424,14 @@ class BillSplitterApp:
             split_quantities[person] = split_entry.get().strip()
 
         # Validate and store split quantities
-        split_data = {}
-        specified_quantities = 0.0
-        unspecified_participants = []
-
-        for person in responsible_people:
-            qty = split_quantities[person]
-            if qty:
-                try:
-                    qty_val = float(qty)
-                    if qty_val < 0:
-                        raise ValueError
-                    split_data[person] = qty_val
-                    specified_quantities += qty_val
-                except ValueError:
-                    messagebox.showerror(
-                        "Error",
-                        f"Please enter a valid non-negative quantity for {person}.",
-                    )
-                    return
-            else:
-                unspecified_participants.append(person)
-
-        remaining_quantity = item_quantity - specified_quantities
-        if remaining_quantity < 0:
-            messagebox.showerror(
-                "Error",
-                f"The total specified quantities exceed the total item quantity for '{item_name}'.",
+        try:
+            split_data = resolve_split_quantities(
+                item_name, item_quantity, responsible_people, split_quantities
             )
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
             return
 
-        equal_split = (
-            remaining_quantity / len(unspecified_participants)
-            if unspecified_participants
-            else 0.0
-        )
-
-        for person in unspecified_participants:
-            split_data[person] = equal_split
-
         # Store item details
         self.item_splits[item_id] = {
             "name": item_name,
@@ -735,24 +710,24 @@ class BillSplitterApp:
         )
         visualize_btn.grid(row=9, column=0, columnspan=2, pady=10, padx=5, sticky="w")
 
+    def bill_items(self):
+        # Build the engine's items from the stored item details
+        return [
+            BillItem(
+                details["name"],
+                details["price"],
+                details["quantity"],
+                details["category"],
+                details["tax_rate"],
+                details["split_quantities"],
+            )
+            for details in self.item_splits.values()
+        ]
+
     def calculate_final_bill(self):
-        # Initialize totals with detailed breakdown
-        totals = {
-            entry.get().strip(): {
-                "total_before_tax": 0.0,
-                "taxable": 0.0,
-                "tax": 0.0,
-                "total_owed": 0.0,
-            }
-            for entry in self.participants
-        }
+        participants = [entry.get().strip() for entry in self.participants]
 
-        # Initialize aggregate variables
-        aggregate_total_before_tax = 0.0
-        aggregate_taxable = 0.0
-        aggregate_non_taxable = 0.0
-        aggregate_tax_paid = 0.0
-        aggregate_total = 0.0
+        items = self.bill_items()
 
         # Handle empty discount field by setting discount to 0 if left blank
         try:
@@ -761,83 +736,31 @@ class BillSplitterApp:
                 if self.discount_entry.get()
                 else 0.0
             )
-            if not (0 <= discount < 1):
-                raise ValueError
+            summary = calculate_bill(items, participants, discount)
         except ValueError:
             messagebox.showerror(
                 "Error", "Please enter a valid discount value between 0 and 100."
             )
             return None
 
-        # Iterate through each item to calculate splits
-        for item_id, details in self.item_splits.items():
-            price = details["price"]
-            quantity = details["quantity"]
-            category = details["category"]
-            tax_rate = details["tax_rate"]
-            responsible_people = details["responsible_people"]
-            split_quantities = details["split_quantities"]
-
-            total_price = price * quantity
-            tax_amount = total_price * (tax_rate / 100) if tax_rate > 0 else 0.0
-            total_price_with_tax = total_price + tax_amount
-
-            # Apply discount
-            total_price_with_tax *= 1 - discount
-            tax_amount *= 1 - discount
-
-            # Update aggregate amounts before discount
-            aggregate_total_before_tax += price * quantity
-
-            # Calculate each person's share
-            for person, qty in split_quantities.items():
-                if quantity == 0:
-                    person_share_before_tax = 0.0
-                    taxable_share = 0.0
-                    tax_share = 0.0
-                    person_total = 0.0
-                else:
-                    person_share_before_tax = (qty / quantity) * total_price
-                    taxable_share = (
-                        (qty / quantity) * total_price if tax_rate > 0 else 0.0
-                    )
-                    tax_share = (qty / quantity) * tax_amount if tax_rate > 0 else 0.0
-                    person_total = person_share_before_tax + tax_share
-
-                totals[person]["total_before_tax"] += person_share_before_tax
-                totals[person]["taxable"] += taxable_share
-                totals[person]["tax"] += tax_share
-                totals[person]["total_owed"] += person_total
-
-                # Update aggregate amounts
-                aggregate_taxable += taxable_share
-                aggregate_tax_paid += tax_share
-                aggregate_non_taxable += person_share_before_tax - taxable_share
-                aggregate_total += person_total
-
         # Update aggregate labels
-        aggregate_amount_before_discount = aggregate_total_before_tax
-        aggregate_amount_after_discount = (
-            aggregate_total_before_tax * (1 - discount) + aggregate_tax_paid
-        )
-
         self.total_amount_label.config(
-            text=f"Total Amount (Before Discount): ${aggregate_total_before_tax:.2f}"
+            text=f"Total Amount (Before Discount): ${summary.total_before_discount:.2f}"
         )
         self.taxable_amount_label.config(
-            text=f"Total Taxable Amount: ${aggregate_taxable:.2f}"
+            text=f"Total Taxable Amount: ${summary.taxable:.2f}"
         )
         self.non_taxable_amount_label.config(
-            text=f"Total Non-Taxable Amount: ${aggregate_non_taxable:.2f}"
+            text=f"Total Non-Taxable Amount: ${summary.non_taxable:.2f}"
         )
         self.amount_before_discount_label.config(
-            text=f"Amount Before Discount: ${aggregate_amount_before_discount:.2f}"
+            text=f"Amount Before Discount: ${summary.total_before_discount:.2f}"
         )
         self.amount_after_discount_label.config(
-            text=f"Amount After Discount: ${aggregate_amount_after_discount:.2f}"
+            text=f"Amount After Discount: ${summary.total_after_discount:.2f}"
         )
 
-        return totals
+        return summary.totals
 
     def show_split(self):
         # Clear previous results
@@ -1,6 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import csv
+import os
+import sys
+
+# The shared split engine lives at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from split_engine import BillItem, calculate_bill, resolve_split_quantities
 
 
 class BillSplitterApp:
@@ -503,24 +509,40 @@ class BillSplitterApp:
         )
         reset_btn.grid(row=8, column=1, padx=10, pady=10, sticky="e")
 
-    def calculate_final_bill(self):
-        # Initialize totals with detailed breakdown
-        totals = {
-            entry.get().strip(): {
-                "total_before_tax": 0.0,
-                "taxable": 0.0,
-                "tax": 0.0,
-                "total_owed": 0.0,
+    def bill_items(self):
+        # Build the engine's items, reading the quantities typed into the split frames
+        items = []
+        for details in self.item_splits.values():
+            entered = {
+                person: entry.get()
+                for person, entry in details["split_entries"].items()
             }
-            for entry in self.participants
-        }
+            split_quantities = resolve_split_quantities(
+                details["name"],
+                details["quantity"],
+                details["responsible_people"],
+                entered,
+            )
+            items.append(
+                BillItem(
+                    details["name"],
+                    details["price"],
+                    details["quantity"],
+                    details["category"],
+                    details["tax_rate"],
+                    split_quantities,
+                )
+            )
+        return items
 
-        # Initialize aggregate variables
-        aggregate_total_before_tax = 0.0
-        aggregate_taxable = 0.0
-        aggregate_non_taxable = 0.0
-        aggregate_tax_paid = 0.0
-        aggregate_total = 0.0
+    def calculate_final_bill(self):
+        participants = [entry.get().strip() for entry in self.participants]
+
+        try:
+            items = self.bill_items()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return None
 
         # Handle empty discount field by setting discount to 0 if left blank
         try:
@@ -529,124 +551,31 @@ class BillSplitterApp:
                 if self.discount_entry.get()
                 else 0.0
             )
-            if not (0 <= discount < 1):
-                raise ValueError
+            summary = calculate_bill(items, participants, discount)
         except ValueError:
             messagebox.showerror(
                 "Error", "Please enter a valid discount value between 0 and 100."
             )
             return None
 
-        # Iterate through each item to calculate splits
-        for item_id, details in self.item_splits.items():
-            price = details["price"]
-            quantity = details["quantity"]
-            category = details["category"]
-            tax_rate = details["tax_rate"]
-            responsible_people = details["responsible_people"]
-            split_entries = details["split_entries"]
-
-            total_price = price * quantity
-            tax_amount = total_price * (tax_rate / 100) if tax_rate > 0 else 0.0
-            total_price_with_tax = total_price + tax_amount
-
-            # Apply discount
-            total_price_with_tax *= 1 - discount
-            tax_amount *= 1 - discount
-
-            # Update aggregate amounts before discount
-            aggregate_total_before_tax += price * quantity
-
-            # Calculate specified and unspecified quantities
-            specified_quantities = 0.0
-            unspecified_participants = []
-            per_person_quantity = {}
-
-            for person in responsible_people:
-                qty_entry = split_entries[person].get().strip()
-                if qty_entry:
-                    try:
-                        qty = float(qty_entry)
-                        if qty < 0:
-                            raise ValueError
-                        per_person_quantity[person] = qty
-                        specified_quantities += qty
-                    except ValueError:
-                        messagebox.showerror(
-                            "Error",
-                            f"Please enter a valid non-negative quantity for {person} in item '{details['name']}'.",
-                        )
-                        return None
-                else:
-                    unspecified_participants.append(person)
-
-            # Calculate equal split for unspecified quantities
-            remaining_quantity = quantity - specified_quantities
-            if remaining_quantity < 0:
-                messagebox.showerror(
-                    "Error",
-                    f"The total specified quantities for item '{details['name']}' exceed the total quantity.",
-                )
-                return None
-
-            equal_split = (
-                remaining_quantity / len(unspecified_participants)
-                if unspecified_participants
-                else 0.0
-            )
-
-            for person in unspecified_participants:
-                per_person_quantity[person] = equal_split
-
-            # Now, calculate each person's share based on their quantity
-            for person, qty in per_person_quantity.items():
-                if quantity == 0:
-                    person_share_before_tax = 0.0
-                    taxable_share = 0.0
-                    tax_share = 0.0
-                    person_total = 0.0
-                else:
-                    person_share_before_tax = (qty / quantity) * total_price
-                    taxable_share = (
-                        (qty / quantity) * total_price if tax_rate > 0 else 0.0
-                    )
-                    tax_share = (qty / quantity) * tax_amount if tax_rate > 0 else 0.0
-                    person_total = person_share_before_tax + tax_share
-
-                totals[person]["total_before_tax"] += person_share_before_tax
-                totals[person]["taxable"] += taxable_share
-                totals[person]["tax"] += tax_share
-                totals[person]["total_owed"] += person_total
-
-                # Update aggregate amounts
-                aggregate_taxable += taxable_share
-                aggregate_tax_paid += tax_share
-                aggregate_non_taxable += person_share_before_tax - taxable_share
-                aggregate_total += person_total
-
         # Update aggregate labels
-        aggregate_amount_before_discount = aggregate_total_before_tax
-        aggregate_amount_after_discount = (
-            aggregate_total_before_tax * (1 - discount) + aggregate_tax_paid
-        )
-
         self.total_amount_label.config(
-            text=f"Total Amount (Before Discount): ${aggregate_total_before_tax:.2f}"
+            text=f"Total Amount (Before Discount): ${summary.total_before_discount:.2f}"
         )
         self.taxable_amount_label.config(
-            text=f"Total Taxable Amount: ${aggregate_taxable:.2f}"
+            text=f"Total Taxable Amount: ${summary.taxable:.2f}"
         )
         self.non_taxable_amount_label.config(
-            text=f"Total Non-Taxable Amount: ${aggregate_non_taxable:.2f}"
+            text=f"Total Non-Taxable Amount: ${summary.non_taxable:.2f}"
         )
         self.amount_before_discount_label.config(
-            text=f"Amount Before Discount: ${aggregate_amount_before_discount:.2f}"
+            text=f"Amount Before Discount: ${summary.total_before_discount:.2f}"
         )
         self.amount_after_discount_label.config(
-            text=f"Amount After Discount: ${aggregate_amount_after_discount:.2f}"
+            text=f"Amount After Discount: ${summary.total_after_discount:.2f}"
         )
 
-        return totals
+        return summary.totals
 
     def show_split(self):
         # Clear previous results
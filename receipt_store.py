@@ -0,0 +1,153 @@
+import os
+import uuid
+from typing import Dict, Any, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# Columns of the item store, one row per parsed receipt line item
+SCHEMA = pa.schema(
+    [
+        ("receipt_id", pa.string()),
+        ("store", pa.string()),
+        ("date", pa.string()),
+        ("line", pa.int32()),
+        ("name", pa.string()),
+        ("price", pa.float64()),
+        ("tax_class", pa.string()),
+        ("quantity", pa.int32()),
+        ("confidence", pa.float32()),
+        ("subtotal", pa.float64()),
+        ("total", pa.float64()),
+    ]
+)
+
+PARTITION_COLUMNS = ["store", "date"]
+UNKNOWN_DATE = "unknown"
+
+
+class ReceiptStoreWriter:
+    """
+    Buffer parsed receipts and append them to a Parquet dataset partitioned by store and date.
+
+    Rows are collected column by column and written in large batches, so thousands of
+    receipts end up in a handful of files instead of one CSV each.
+
+    Args:
+        root (str): Dataset folder, created if missing.
+        batch_rows (int): Number of buffered item rows that triggers a write.
+    """
+
+    def __init__(self, root: str, batch_rows: int = 100_000):
+        self.root = root
+        self.batch_rows = batch_rows
+        self.receipts = 0
+        self.rows = 0
+        self._columns: Dict[str, List[Any]] = {name: [] for name in SCHEMA.names}
+        os.makedirs(root, exist_ok=True)
+
+    def add(
+        self,
+        receipt_id: str,
+        parsed_data: Dict[str, Any],
+        confidences: Optional[Sequence[Optional[float]]] = None,
+    ) -> None:
+        """
+        Add the items of one parsed receipt.
+
+        Args:
+            receipt_id (str): Unique identifier of the receipt, e.g. its file name.
+            parsed_data (dict): Parsed receipt data from final_text_to_csv.
+            confidences (Sequence): OCR confidence per receipt line (1-based line
+                numbers index into it), if known.
+        """
+        columns = self._columns
+        store = parsed_data.get("store") or "unknown"
+        date = parsed_data.get("date") or UNKNOWN_DATE
+        for item in parsed_data["items"]:
+            line = item.get("line")
+            confidence = None
+            if confidences and line is not None and line <= len(confidences):
+                confidence = confidences[line - 1]
+            columns["receipt_id"].append(receipt_id)
+            columns["store"].append(store)
+            columns["date"].append(date)
+            columns["line"].append(line)
+            columns["name"].append(item["name"])
+            columns["price"].append(item["price"])
+            columns["tax_class"].append(item["tax_class"])
+            columns["quantity"].append(item.get("quantity", 1))
+            columns["confidence"].append(confidence)
+            columns["subtotal"].append(parsed_data["subtotal"])
+            columns["total"].append(parsed_data["total"])
+        self.receipts += 1
+        self.rows += len(parsed_data["items"])
+        if len(columns["receipt_id"]) >= self.batch_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered rows as new files in the dataset."""
+        if not self._columns["receipt_id"]:
+            return
+        table = pa.Table.from_pydict(self._columns, schema=SCHEMA)
+        pq.write_to_dataset(
+            table,
+            self.root,
+            partition_cols=PARTITION_COLUMNS,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        )
+        self._columns = {name: [] for name in SCHEMA.names}
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_items(root: str, columns: Optional[List[str]] = None, filter=None) -> pa.Table:
+    """
+    Scan the item store, reading only the requested columns and partitions.
+
+    Args:
+        root (str): Dataset folder.
+        columns (list): Columns to read, all if None.
+        filter: A pyarrow.dataset expression, e.g. ds.field("store") == "Aldi".
+
+    Returns:
+        pyarrow.Table: The matching item rows.
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def load_receipt(root: str, receipt_id: str):
+    """
+    Load one receipt's items as the DataFrame layout used by dash.py.
+
+    Args:
+        root (str): Dataset folder.
+        receipt_id (str): The receipt to load.
+
+    Returns:
+        pandas.DataFrame: Columns 'Item Name', 'Price', 'Taxable' and 'Quantity'.
+    """
+    table = read_items(
+        root,
+        ["line", "name", "price", "tax_class", "quantity"],
+        ds.field("receipt_id") == receipt_id,
+    )
+    df = table.to_pandas().sort_values("line")
+    return df.rename(
+        columns={
+            "name": "Item Name",
+            "price": "Price",
+            "tax_class": "Taxable",
+            "quantity": "Quantity",
+        }
+    )[["Item Name", "Price", "Taxable", "Quantity"]].reset_index(drop=True)
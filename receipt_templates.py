@@ -0,0 +1,236 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+
+from money import from_cents, parse_cents
+
+
+# Number of lines at the top of a receipt searched for the store name
+HEADER_LINES = 8
+
+WORD_PATTERN = re.compile(r"[A-Z0-9']+")
+DATE_PATTERN = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})\b")
+
+
+@dataclass(frozen=True)
+class StoreTemplate:
+    """
+    Line grammar of one store chain.
+
+    Attributes:
+        name (str): Store name written to the parsed receipt.
+        keywords (tuple): Upper-case header words identifying the store.
+        delimiter (str): Column separator in the OCR text.
+        price_column (int): Index of the price field among the split fields.
+        tax_column (int): Index of the tax-class field among the split fields.
+        tax_codes (tuple): Accepted tax-class codes, empty to accept any.
+        subtotal_markers (tuple): Words introducing the subtotal.
+        total_markers (tuple): Words introducing the total.
+    """
+
+    name: str
+    keywords: Tuple[str, ...] = ()
+    delimiter: str = "|"
+    price_column: int = -2
+    tax_column: int = -1
+    tax_codes: Tuple[str, ...] = ()
+    subtotal_markers: Tuple[str, ...] = ("SUBTOTAL",)
+    total_markers: Tuple[str, ...] = ("TOTAL",)
+
+
+@dataclass
+class CompiledTemplate:
+    """
+    A StoreTemplate with its patterns compiled once for fast matching.
+    """
+
+    template: StoreTemplate
+    subtotal_pattern: Any = field(init=False)
+    total_pattern: Any = field(init=False)
+    tax_codes: frozenset = field(init=False)
+
+    def __post_init__(self):
+        separator = re.escape(self.template.delimiter)
+        self.subtotal_pattern = self._marker_pattern(
+            self.template.subtotal_markers, separator
+        )
+        self.total_pattern = self._marker_pattern(
+            self.template.total_markers, separator
+        )
+        self.tax_codes = frozenset(code.upper() for code in self.template.tax_codes)
+        # At least one field is left over for the item name
+        columns = (self.template.price_column, self.template.tax_column)
+        self.min_fields = max(
+            len(set(columns)) + 1, max(-c if c < 0 else c + 1 for c in columns)
+        )
+
+    @staticmethod
+    def _marker_pattern(markers: Tuple[str, ...], separator: str):
+        alternatives = "|".join(re.escape(marker) for marker in markers)
+        return re.compile(
+            rf"(?:{alternatives})[\s{separator}]+\$?([\d\.]+)", re.IGNORECASE
+        )
+
+    @property
+    def name(self) -> str:
+        return self.template.name
+
+    @property
+    def delimiter(self) -> str:
+        return self.template.delimiter
+
+    def parse_fields(self, line: str) -> Dict[str, Any]:
+        """
+        Parse the fields of a delimited item line.
+
+        Args:
+            line (str): A single line of text from the receipt.
+
+        Returns:
+            dict: Parsed item details or an empty dict if parsing fails.
+        """
+        fields = [f.strip() for f in line.split(self.template.delimiter) if f.strip()]
+        if len(fields) < self.min_fields:
+            return {}  # Return empty if insufficient fields
+        try:
+            price = from_cents(parse_cents(fields[self.template.price_column]))
+        except ValueError:
+            return {}  # Skip invalid rows
+        tax_class = fields[self.template.tax_column].upper()
+        if self.tax_codes and tax_class not in self.tax_codes:
+            return {}
+        used = {
+            self.template.price_column % len(fields),
+            self.template.tax_column % len(fields),
+        }
+        item_name = " ".join(f for i, f in enumerate(fields) if i not in used)
+        return {"name": item_name, "price": price, "tax_class": tax_class}
+
+    def match_totals(self, line: str) -> Optional[Tuple[str, float]]:
+        """
+        Match a subtotal or total line.
+
+        Args:
+            line (str): A single line of text from the receipt.
+
+        Returns:
+            tuple: ("subtotal" or "total", amount), or None if the line has neither
+                or its amount does not parse.
+        """
+        upper = line.upper()
+        if any(marker in upper for marker in self.template.subtotal_markers):
+            kind, pattern = "subtotal", self.subtotal_pattern
+        elif any(marker in upper for marker in self.template.total_markers):
+            kind, pattern = "total", self.total_pattern
+        else:
+            return None
+        match = pattern.search(line)
+        if not match:
+            return None
+        try:
+            return kind, from_cents(parse_cents(match.group(1)))
+        except ValueError:
+            return None  # OCR noise such as "12.34."
+
+
+# --- Registry ---
+_TEMPLATES: Dict[str, CompiledTemplate] = {}
+_KEYWORD_INDEX: Dict[str, CompiledTemplate] = {}
+
+GENERIC = "Generic"
+
+
+def register_template(template: StoreTemplate) -> CompiledTemplate:
+    """
+    Compile a store template and add it to the registry and header keyword index.
+
+    Args:
+        template (StoreTemplate): The store grammar.
+
+    Returns:
+        CompiledTemplate: The compiled template.
+    """
+    compiled = CompiledTemplate(template)
+    _TEMPLATES[template.name] = compiled
+    for keyword in template.keywords:
+        _KEYWORD_INDEX[keyword.upper()] = compiled
+    return compiled
+
+
+def get_template(name: Optional[str] = None) -> CompiledTemplate:
+    """
+    Look up a registered template by store name.
+
+    Args:
+        name (str): Store name, None for the generic template.
+
+    Returns:
+        CompiledTemplate: The compiled template.
+    """
+    return _TEMPLATES[name or GENERIC]
+
+
+def detect_template(header: Iterable[str]) -> Optional[CompiledTemplate]:
+    """
+    Find the store of a receipt from its header lines via the keyword index.
+
+    Args:
+        header (Iterable[str]): The first lines of the receipt.
+
+    Returns:
+        CompiledTemplate: The matching template, or None if no keyword is found.
+    """
+    for line in header:
+        for word in WORD_PATTERN.findall(line.upper()):
+            template = _KEYWORD_INDEX.get(word)
+            if template is not None:
+                return template
+    return None
+
+
+def match_date(line: str) -> Optional[str]:
+    """
+    Find a MM/DD/YY or MM/DD/YYYY date in a receipt line.
+
+    Args:
+        line (str): A single line of text from the receipt.
+
+    Returns:
+        str: The date in ISO format (YYYY-MM-DD), or None if the line has no valid date.
+    """
+    match = DATE_PATTERN.search(line)
+    if not match:
+        return None
+    month, day, year = (int(part) for part in match.groups())
+    if len(match.group(3)) == 2:
+        year += 2000
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def is_store_header(text: str) -> bool:
+    """
+    Check whether a parsed row is really the store header of a receipt.
+
+    Args:
+        text (str): Item name of the row.
+
+    Returns:
+        bool: True if the text names a registered store.
+    """
+    return detect_template([text]) is not None
+
+
+def templates() -> List[CompiledTemplate]:
+    """
+    List the registered templates.
+
+    Returns:
+        list: All compiled templates.
+    """
+    return list(_TEMPLATES.values())
+
+
+register_template(StoreTemplate(GENERIC))
+register_template(StoreTemplate("Aldi", keywords=("ALDI", "ALDIAUS", "ALDI'S")))
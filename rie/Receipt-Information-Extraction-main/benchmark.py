@@ -0,0 +1,280 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+from time import time
+
+from profiles import PROFILES
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(ROOT))
+
+# Entry points whose startup is measured: name -> (arguments to python, working folder)
+STARTUP_TARGETS = {
+	'run.py --help': (['run.py', '--help'], ROOT),
+	'run.py --check-config': (['run.py', '--check-config'], ROOT),
+	'final_text_to_csv.py --help': (['final_text_to_csv.py', '--help'], REPO),
+	'import split_engine': (['-c', 'import split_engine'], REPO),
+	'import gui ex2.py': (['-c', "import runpy; runpy.run_path('original-only GUI/gui ex2.py')"], REPO),
+}
+
+IMPORT_TIME_PATTERN = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+# Checkpoints must already be in weights/ (run.py downloads them on first use)
+COLD_START_TARGETS = ('vietocr', 'craft')
+
+BOX_IOU = 0.5  # a box found by a profile matches an fp32 box above this overlap
+
+
+def import_times(stderr):
+	"""Parse `python -X importtime` output into {module: cumulative us} for top level imports"""
+	times = {}
+	for line in stderr.splitlines():
+		match = IMPORT_TIME_PATTERN.match(line)
+		if match and len(match.group(3)) == 1:  # one space: imported by the entry point itself
+			times[match.group(4)] = int(match.group(2))
+	return times
+
+
+def measure_startup(args, cwd, repeat):
+	"""Best wall time (s) of `python -X importtime args` and the import times of that run"""
+	best, best_imports = None, {}
+	for _ in range(repeat):
+		start = time()
+		result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=cwd,
+		                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+		elapsed = time() - start
+		if best is None or elapsed < best:
+			best, best_imports = elapsed, import_times(result.stderr)
+	return best, best_imports
+
+
+def startup(args):
+	"""Startup-time report of the entry points, slowest imports first"""
+	over_budget = []
+	for name, (target, cwd) in STARTUP_TARGETS.items():
+		elapsed, imports = measure_startup(target, cwd, args.repeat)
+		total_imports = sum(imports.values()) / 1e6
+		print(f'{name:<32} {elapsed:6.3f}s  (imports {total_imports:.3f}s)')
+		for module, us in sorted(imports.items(), key=lambda x: -x[1])[:args.top]:
+			print(f'    {us / 1e6:6.3f}s  {module}')
+		if elapsed > args.budget:
+			over_budget.append(name)
+	if over_budget:
+		print(f'Over the {args.budget}s budget: {", ".join(over_budget)}')
+		return 1
+	return 0
+
+
+def build_vietocr(legacy):
+	"""Build the run config's vietocr model and load its checkpoint, return (build s, load s)"""
+	import torch
+	from utils import load_config, load_weights
+	from text_extraction.vietocr import Config
+	from text_extraction.vietocr.tool.translate import build_model
+	from text_extraction.vietocr.tool.utils import download_weights
+	config = Config.load_config_from_name(load_config('run')['vietocr_model'])
+	config['device'] = 'cpu'
+	weights = download_weights(config['weights'])
+	start = time()
+	model, _ = build_model(config, pretrained=legacy)
+	built = time()
+	model.load_state_dict(torch.load(weights, map_location='cpu') if legacy else load_weights(weights, 'cpu'))
+	return built - start, time() - built
+
+
+def build_craft(legacy):
+	"""Build CRAFT and load its checkpoint, return (build s, load s)"""
+	import torch
+	from utils import download_weight, load_weights
+	from rotation.CRAFT import model
+	from rotation.CRAFT.net import copyStateDict
+	weights = download_weight('craft_mlt_25k.pth')
+	start = time()
+	net = model.CRAFT()
+	built = time()
+	net.load_state_dict(copyStateDict(torch.load(weights, map_location='cpu') if legacy else load_weights(weights, 'cpu')))
+	return built - start, time() - built
+
+
+def measure_cold_start(name, legacy, repeat):
+	"""Best (total, build, load) seconds of building a model in a fresh interpreter"""
+	code = f'import benchmark; print(*benchmark.build_{name}({legacy}))'
+	best = None
+	for _ in range(repeat):
+		start = time()
+		result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+		elapsed = time() - start
+		if result.returncode:
+			raise RuntimeError(result.stderr.strip().splitlines()[-1])
+		build, load = map(float, result.stdout.split()[-2:])
+		if best is None or elapsed < best[0]:
+			best = (elapsed, build, load)
+	return best
+
+
+def cold_start(args):
+	"""Cold-start report of the models: fresh interpreter, architecture build and checkpoint load"""
+	for name in COLD_START_TARGETS:
+		for legacy in ((False, True) if args.legacy else (False,)):
+			label = f'{name} (legacy)' if legacy else name
+			try:
+				elapsed, build, load = measure_cold_start(name, legacy, args.repeat)
+			except RuntimeError as error:
+				print(f'{label:<18} failed: {error}')
+				continue
+			print(f'{label:<18} {elapsed:6.3f}s  (build {build:.3f}s, load {load:.3f}s)')
+	return 0
+
+
+def edit_distance(a, b):
+	"""Levenshtein distance between two strings"""
+	previous = list(range(len(b) + 1))
+	for i, char_a in enumerate(a, 1):
+		current = [i]
+		for j, char_b in enumerate(b, 1):
+			current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+		previous = current
+	return previous[-1]
+
+
+def box_recall(reference, boxes):
+	"""Share of the reference boxes overlapped by one of boxes (IoU of their bounding rectangles)"""
+	def rect(box):
+		xs, ys = [p[0] for p in box], [p[1] for p in box]
+		return min(xs), min(ys), max(xs), max(ys)
+
+	def iou(a, b):
+		w = min(a[2], b[2]) - max(a[0], b[0])
+		h = min(a[3], b[3]) - max(a[1], b[1])
+		inter = max(w, 0) * max(h, 0)
+		union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+		return inter / union if union > 0 else 0
+
+	rects = [rect(box) for box in boxes]
+	found = sum(any(iou(rect(box), other) >= BOX_IOU for other in rects) for box in reference)
+	return found / len(reference) if len(reference) else 1.0
+
+
+def detect(craft, images):
+	"""CRAFT boxes of every image and the seconds it took"""
+	start = time()
+	boxes = [craft(image) for image in images]
+	return boxes, time() - start
+
+
+def recognize(predictor, lines):
+	"""Text of every line crop and the seconds it took, '' where the OCR fails"""
+	start = time()
+	texts = []
+	for line in lines:
+		try:
+			texts.append(predictor.predict(line))
+		except Exception:
+			texts.append('')
+	return texts, time() - start
+
+
+def load_receipts(folder):
+	"""RGB receipts of a folder, CRAFT and the run config's vietocr Predictor, on cpu"""
+	from skimage import io
+	from rotation import Craft, model
+	from text_extraction.vietocr import Config, Predictor
+	from utils import load_config
+	images = [model.loadImage(io.imread(os.path.join(folder, f))) for f in sorted(os.listdir(folder))]
+	config = Config.load_config_from_name(load_config('run')['vietocr_model'])
+	config['device'] = 'cpu'
+	return images, Craft('cpu'), Predictor(config)
+
+
+def text_lines(images, boxes):
+	"""Line crops (PIL images) of the boxes of every image"""
+	from PIL import Image
+	from utils import crop_box
+	return [Image.fromarray(crop) for image, image_boxes in zip(images, boxes)
+	        for crop in (crop_box(image, box) for box in image_boxes) if crop.size]
+
+
+def profiles_report(args):
+	"""Throughput and accuracy delta of each inference profile against fp32, on cpu"""
+	import copy
+	from profiles import apply_profile
+
+	images, craft, predictor = load_receipts(args.input)
+	reference, detect_s = detect(craft, images)
+	lines = text_lines(images, reference)
+	texts, ocr_s = recognize(predictor, lines)
+	characters = max(sum(len(text) for text in texts), 1)
+	print(f'{len(images)} receipts, {len(lines)} lines, calibrated on the first {args.calibration} receipts')
+	print(f'{"profile":<14} {"CRAFT img/s":>11} {"x":>5} {"OCR lines/s":>11} {"x":>5} {"box recall":>10} {"CER vs fp32":>11}')
+
+	for profile in args.profiles:
+		if profile == 'fp32':
+			boxes, profile_detect_s, profile_texts, profile_ocr_s = reference, detect_s, texts, ocr_s
+		else:
+			profile_craft, profile_predictor = copy.deepcopy(craft), copy.deepcopy(predictor)
+			apply_profile(profile_craft, profile_predictor, profile, images[:args.calibration])
+			boxes, profile_detect_s = detect(profile_craft, images)
+			profile_texts, profile_ocr_s = recognize(profile_predictor, lines)  # same crops as fp32
+		recall = sum(box_recall(r, b) for r, b in zip(reference, boxes)) / len(images)
+		cer = sum(edit_distance(r, t) for r, t in zip(texts, profile_texts)) / characters
+		print(f'{profile:<14} {len(images) / profile_detect_s:11.2f} {detect_s / profile_detect_s:5.2f} '
+		      f'{len(lines) / profile_ocr_s:11.1f} {ocr_s / profile_ocr_s:5.2f} {recall:10.3f} {cer:11.4f}')
+	return 0
+
+
+def batching_report(args):
+	"""Batches and throughput of Predictor.predict_batch with padded width classes against exact widths"""
+	from text_extraction.vietocr.tool.translate import can_pad
+
+	images, craft, predictor = load_receipts(args.input)
+	boxes, _ = detect(craft, images)
+	lines = text_lines(images, boxes)
+	if not can_pad(predictor.model):
+		print('The vietocr model cannot mask padding, predict_batch falls back to exact widths')
+	print(f'{len(images)} receipts, {len(lines)} lines')
+	print(f'{"batching":<10} {"batches":>7} {"lines/batch":>11} {"lines/s":>8} {"x":>5} {"same text":>9} {"max prob diff":>13}')
+
+	reference = None
+	for padded in (False, True):
+		batches = len(predictor.batches(lines, padded))
+		start = time()
+		texts, probs = predictor.predict_batch(lines, return_prob=True, padded=padded)
+		elapsed = time() - start
+		if reference is None:
+			reference = texts, probs, elapsed
+		same = sum(a == b for a, b in zip(reference[0], texts))
+		diff = max((abs(a - b) for a, b in zip(reference[1], probs) if a == a and b == b), default=0.0)  # nan: no text
+		print(f'{"padded" if padded else "exact":<10} {batches:7d} {len(lines) / max(batches, 1):11.1f} '
+		      f'{len(lines) / elapsed:8.1f} {reference[2] / elapsed:5.2f} {same:>4}/{len(lines):<4} {diff:13.2e}')
+	return 0
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Benchmark the receipt pipeline')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	startup_parser = commands.add_parser('startup', help='Startup time and slowest imports of the entry points')
+	startup_parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs per entry point, the best is kept (Default: 3)')
+	startup_parser.add_argument('-t', '--top', type=int, default=5, help='Slowest imports listed per entry point (Default: 5)')
+	startup_parser.add_argument('-b', '--budget', type=float, default=1.0, help='Seconds an entry point may take (Default: 1.0)')
+	startup_parser.set_defaults(func=startup)
+
+	cold_start_parser = commands.add_parser('coldstart', help='Time to build the models and load their checkpoints')
+	cold_start_parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs per model, the best is kept (Default: 3)')
+	cold_start_parser.add_argument('-l', '--legacy', action='store_true', help='Also measure the old path: pretrained backbone download and plain torch.load')
+	cold_start_parser.set_defaults(func=cold_start)
+
+	profiles_parser = commands.add_parser('profiles', help='Throughput and accuracy delta of the inference profiles against fp32')
+	profiles_parser.add_argument('-i', '--input', type=str, default='data/rotated', help='Folder of receipts (Default: data/rotated)')
+	profiles_parser.add_argument('-c', '--calibration', type=int, default=2, help='Receipts, from the start of input, that calibrate static_int8 (Default: 2)')
+	profiles_parser.add_argument('-p', '--profiles', nargs='+', choices=PROFILES, default=list(PROFILES), help='Profiles to compare (Default: all)')
+	profiles_parser.set_defaults(func=profiles_report)
+
+	batching_parser = commands.add_parser('batching', help='Batches and throughput of padded width classes against exact-width OCR batches')
+	batching_parser.add_argument('-i', '--input', type=str, default='data/rotated', help='Folder of receipts (Default: data/rotated)')
+	batching_parser.set_defaults(func=batching_report)
+
+	args = parser.parse_args()
+	exit(args.func(args))
@@ -0,0 +1,129 @@
+import argparse
+import inspect
+import os
+
+import torch
+from torch import nn
+
+from runtime import BACKENDS, GRAPHS, graph_path, load_graph
+from utils import load_config
+
+FORMATS = tuple(backend for backend in BACKENDS if backend != 'eager')
+TOLERANCE = 1e-3  # largest absolute difference to the eager model accepted by --check
+
+
+class OCREncoder(nn.Module):
+	"""VietOCR CNN and sequence encoder: image -> decoder memory"""
+	def __init__(self, model):
+		super().__init__()
+		self.model = model
+
+	def forward(self, image):
+		hidden, encoder_outputs, keys, _ = self.model.transformer.forward_encoder(self.model.cnn(image))
+		return hidden, encoder_outputs, keys
+
+
+class OCRDecoder(nn.Module):
+	"""One decode step of the Seq2Seq decoder: last token and memory -> logits, new hidden state"""
+	def __init__(self, model):
+		super().__init__()
+		self.decoder = model.transformer.decoder
+
+	def forward(self, token, hidden, encoder_outputs, keys):
+		return self.decoder.step(token, hidden, encoder_outputs, keys)
+
+
+def load_models():
+	"""Eager CRAFT, refiner and VietOCR model on cpu, with their checkpoints"""
+	from rotation.CRAFT import net
+	from text_extraction.vietocr import Config, Predictor
+	craft, refiner, _ = net.setup('cpu')
+	config = Config.load_config_from_name(load_config('run')['vietocr_model'])
+	if config['seq_modeling'] != 'seq2seq':
+		raise SystemExit(f"Only seq2seq vietocr models can be exported, '{config['seq_modeling']}' is not supported")
+	config['device'] = 'cpu'
+	ocr = Predictor(config).model.eval()
+	return {
+		'craft': craft,
+		'craft_refiner': refiner,
+		'ocr_encoder': OCREncoder(ocr).eval(),
+		'ocr_decoder': OCRDecoder(ocr).eval(),
+	}
+
+
+def example_inputs(models, width=160, batch=2, size=768):
+	"""Inputs of every graph; other sizes than the defaults are used to check dynamic shapes"""
+	with torch.no_grad():
+		image = torch.rand(1, 3, size, size)
+		y, feature = models['craft'](image)
+		text = torch.rand(batch, 3, 32, width)
+		hidden, encoder_outputs, keys = models['ocr_encoder'](text)
+	token = torch.ones(batch, dtype=torch.long)
+	return {
+		'craft': (image,),
+		'craft_refiner': (y, feature),
+		'ocr_encoder': (text,),
+		'ocr_decoder': (token, hidden, encoder_outputs, keys),
+	}
+
+
+# Sizes that change between calls: graph -> {input or output name: {axis: label}}
+DYNAMIC_AXES = {
+	'craft': {'image': {2: 'height', 3: 'width'}, 'y': {1: 'map_height', 2: 'map_width'},
+	          'feature': {2: 'map_height', 3: 'map_width'}},
+	'craft_refiner': {'y': {1: 'map_height', 2: 'map_width'}, 'feature': {2: 'map_height', 3: 'map_width'},
+	                  'refined': {1: 'map_height', 2: 'map_width'}},
+	'ocr_encoder': {'image': {0: 'batch', 3: 'width'}, 'hidden': {0: 'batch'},
+	                'encoder_outputs': {0: 'batch', 1: 'steps'}, 'keys': {0: 'batch', 1: 'steps'}},
+	'ocr_decoder': {'token': {0: 'batch'}, 'hidden': {0: 'batch'}, 'encoder_outputs': {0: 'batch', 1: 'steps'},
+	                'keys': {0: 'batch', 1: 'steps'}, 'output': {0: 'batch'}, 'new_hidden': {0: 'batch'}},
+}
+
+
+def export_graph(module, inputs, path, name, fmt):
+	"""Write one graph as TorchScript (traced) or ONNX"""
+	with torch.no_grad():
+		if fmt == 'torchscript':
+			torch.jit.trace(module, inputs, check_trace=False).save(path)
+			return
+		input_names, output_names = GRAPHS[name]
+		kwargs = {}
+		if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+			kwargs['dynamo'] = False  # the TorchScript based exporter, as on torch < 2.5
+		torch.onnx.export(module, inputs, path, input_names=input_names, output_names=output_names,
+		                  dynamic_axes=DYNAMIC_AXES[name], opset_version=14, **kwargs)
+
+
+def check(models, folder, fmt):
+	"""Compare every exported graph with its eager model on inputs of new sizes, return the failures"""
+	failures = []
+	inputs = example_inputs(models, width=320, batch=3, size=640)
+	for name, module in models.items():
+		graph = load_graph(folder, name, fmt)
+		with torch.no_grad():
+			expected, got = module(*inputs[name]), graph(*inputs[name])
+		expected = expected if isinstance(expected, tuple) else (expected,)
+		got = got if isinstance(got, (tuple, list)) else (got,)
+		diff = max((e - g).abs().max().item() for e, g in zip(expected, got))
+		status = 'ok' if diff <= TOLERANCE else 'FAIL'
+		print(f'{name:<14} max abs diff {diff:.2e}  {status}')
+		if status != 'ok':
+			failures.append(name)
+	return failures
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Export CRAFT and the vgg_seq2seq OCR for the torchscript or onnx backend')
+	parser.add_argument('-f', '--format', choices=FORMATS, default='torchscript', help='Graph format (Default: torchscript)')
+	parser.add_argument('-o', '--output', type=str, default='exported', help='Output folder (Default: exported/)')
+	parser.add_argument('--check', action='store_true', help='Compare the exported graphs with the eager models and exit 1 on a mismatch')
+	args = parser.parse_args()
+
+	models = load_models()
+	os.makedirs(args.output, exist_ok=True)
+	for name, inputs in example_inputs(models).items():
+		path = graph_path(args.output, name, args.format)
+		export_graph(models[name], inputs, path, name, args.format)
+		print(f'Saved {path}')
+	if args.check:
+		exit(1 if check(models, args.output, args.format) else 0)
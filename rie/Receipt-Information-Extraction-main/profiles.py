@@ -0,0 +1,206 @@
+# CPU inference profiles for CRAFT and the vietocr Predictor. torch is imported by the
+# functions, so run.py can validate a profile name without loading it.
+#   fp32           eager float32, as trained
+#   channels_last  conv weights in NHWC memory format
+#   dynamic_int8   int8 weights for the GRU/Linear layers of the sequence model
+#   static_int8    dynamic_int8 plus int8 VGG backbone and CRAFT convs, calibrated on receipts
+#   bf16           bfloat16 autocast, the models take uint8 images and normalize them
+PROFILES = ('fp32', 'channels_last', 'dynamic_int8', 'static_int8', 'bf16')
+INT8_PROFILES = ('dynamic_int8', 'static_int8')
+CPU_PROFILES = INT8_PROFILES + ('bf16',)  # the others also run on cuda
+
+# CRAFT blocks run in int8 by static_int8, the refiner stays float
+CRAFT_STATIC = ('basenet.slice1', 'basenet.slice2', 'basenet.slice3', 'basenet.slice4', 'basenet.slice5',
+                'upconv1.conv', 'upconv2.conv', 'upconv3.conv', 'upconv4.conv', 'conv_cls')
+
+CALIBRATION_LINES = 256  # text lines, at most, that calibrate the OCR backbone
+
+CRAFT_MEAN = (0.485, 0.456, 0.406)  # of rotation.CRAFT.model.normalizeMeanVariance, times 255
+CRAFT_VARIANCE = (0.229, 0.224, 0.225)
+
+
+def autocast():
+	"""bfloat16 autocast on cpu"""
+	import torch
+	return torch.autocast('cpu', dtype=torch.bfloat16)
+
+
+def to_float(outputs):
+	"""bfloat16 tensors of outputs (a tensor or a tuple of them) back to float32, numpy has no bfloat16"""
+	import torch
+	if isinstance(outputs, tuple):
+		return tuple(to_float(output) for output in outputs)
+	if isinstance(outputs, torch.Tensor) and outputs.dtype == torch.bfloat16:
+		return outputs.float()
+	return outputs
+
+
+class AutocastNet:
+	"""
+	Stands in for the CRAFT model or its refiner in rotation.CRAFT.net.test_net: runs it
+	under bf16 autocast, the model takes the uint8 image when normalize is set
+	"""
+	def __init__(self, model, normalize=False):
+		self.model = model
+		self.takes_uint8 = normalize
+
+	def __call__(self, *inputs):
+		import torch
+		with torch.no_grad(), autocast():
+			if self.takes_uint8:  # image: 1 x 3 x H x W uint8
+				mean = torch.tensor(CRAFT_MEAN).view(1, 3, 1, 1) * 255
+				variance = torch.tensor(CRAFT_VARIANCE).view(1, 3, 1, 1) * 255
+				inputs = (((inputs[0].float() - mean) / variance).to(torch.bfloat16),) + inputs[1:]
+			return to_float(self.model(*inputs))
+
+
+class AutocastOCR:
+	"""
+	Stands in for the VietOCR model in vietocr's translate functions, like runtime.ExportedOCR:
+	runs it under bf16 autocast, cnn takes the uint8 image and scales it to [0, 1]
+	"""
+	takes_uint8 = True
+
+	def __init__(self, model):
+		self.model = model
+		self.transformer = self
+
+	def eval(self):
+		self.model.eval()
+		return self
+
+	def cnn(self, img, widths=None):
+		import torch
+		with autocast():
+			img = img.to(torch.bfloat16) / 255
+			return self.model.cnn(img) if widths is None else self.model.cnn(img, widths)
+
+	def forward_encoder(self, src, lengths=None):
+		with autocast():
+			return self.model.transformer.forward_encoder(src, lengths)
+
+	def forward_decoder(self, tgt, memory):
+		with autocast():
+			output, memory = self.model.transformer.forward_decoder(tgt, memory)
+		return output.float(), memory
+
+	def expand_memory(self, memory, beam_size):
+		return self.model.transformer.expand_memory(memory, beam_size)
+
+	def get_memory(self, memory, i):
+		return self.model.transformer.get_memory(memory, i)
+
+
+def fuse_conv_bn_relu(sequential):
+	"""Fuse every Conv2d followed by BatchNorm2d and/or ReLU in a Sequential, in place"""
+	from torch import nn
+	from torch.ao.quantization import fuse_modules
+	layers = list(sequential.named_children())
+	groups, i = [], 0
+	while i < len(layers):
+		group = [layers[i][0]]
+		if isinstance(layers[i][1], nn.Conv2d):
+			for follower in (nn.BatchNorm2d, nn.ReLU):
+				if i + len(group) < len(layers) and isinstance(layers[i + len(group)][1], follower):
+					group.append(layers[i + len(group)][0])
+		if len(group) > 1:
+			groups.append(group)
+		i += len(group)
+	if groups:
+		fuse_modules(sequential, groups, inplace=True)
+	return sequential
+
+
+def prepare_static(model, names):
+	"""Wrap the Sequentials model.<name> with quant/dequant stubs and observers, return the wrappers"""
+	import torch
+	from torch.ao import quantization
+	wrappers = []
+	for name in names:
+		parent, _, attr = name.rpartition('.')
+		owner = model.get_submodule(parent) if parent else model
+		wrapper = quantization.QuantWrapper(fuse_conv_bn_relu(getattr(owner, attr).eval()))
+		wrapper.qconfig = quantization.get_default_qconfig(torch.backends.quantized.engine)
+		quantization.prepare(wrapper, inplace=True)
+		setattr(owner, attr, wrapper)
+		wrappers.append(wrapper)
+	return wrappers
+
+
+def convert_static(wrappers):
+	"""Turn calibrated wrappers from prepare_static into int8 modules"""
+	from torch.ao import quantization
+	for wrapper in wrappers:
+		quantization.convert(wrapper, inplace=True)
+
+
+def quantize_sequence_model(transformer):
+	"""int8 weights with float activations for the GRU and Linear layers of a vietocr sequence model"""
+	from torch import nn
+	from torch.ao import quantization
+	spec = {
+		nn.GRU: quantization.default_dynamic_qconfig,
+		nn.Linear: quantization.default_dynamic_qconfig,
+		'decoder.attention.attn': None,  # Seq2Seq slices its weight to precompute the encoder side
+	}
+	return quantization.quantize_dynamic(transformer, spec, inplace=False)
+
+
+def calibration_lines(craft, images, limit=CALIBRATION_LINES):
+	"""Text line crops (PIL images) found by the float CRAFT on the calibration receipts"""
+	from PIL import Image
+	from utils import crop_box
+	lines = []
+	for image in images:
+		for box in craft(image):
+			crop = crop_box(image, box)
+			if crop.size:
+				lines.append(Image.fromarray(crop))
+	return lines[:limit]
+
+
+def apply_craft_profile(craft, profile, images=()):
+	"""Switch a rotation.Craft to a profile, images (RGB receipts) calibrate static_int8"""
+	import torch
+	if profile == 'channels_last':
+		craft.model.to(memory_format=torch.channels_last)
+		craft.refine_net.to(memory_format=torch.channels_last)
+	elif profile == 'static_int8':
+		wrappers = prepare_static(craft.model, CRAFT_STATIC)
+		with torch.no_grad():
+			for image in images:
+				craft(image)
+		convert_static(wrappers)
+	elif profile == 'bf16':
+		craft.model = AutocastNet(craft.model, normalize=True)
+		if craft.refine_net is not None:
+			craft.refine_net = AutocastNet(craft.refine_net)
+	# dynamic_int8: CRAFT has no GRU/Linear layer, it stays float
+
+
+def apply_ocr_profile(predictor, profile, lines=()):
+	"""Switch a vietocr Predictor to a profile, lines (PIL text crops) calibrate static_int8"""
+	import torch
+	from text_extraction.vietocr.tool.translate import process_input
+	model = predictor.model
+	if profile == 'channels_last':
+		model.cnn.to(memory_format=torch.channels_last)
+	if profile in INT8_PROFILES:
+		model.transformer = quantize_sequence_model(model.transformer)
+	if profile == 'static_int8' and hasattr(model.cnn.model, 'features'):  # VGG backbones only
+		dataset = predictor.config['dataset']
+		wrappers = prepare_static(model.cnn.model, ['features'])
+		with torch.no_grad():
+			for line in lines:
+				model.cnn(process_input(line, dataset['image_height'], dataset['image_min_width'],
+				                        dataset['image_max_width']))
+		convert_static(wrappers)
+	if profile == 'bf16':
+		predictor.model = AutocastOCR(model)
+
+
+def apply_profile(craft, predictor, profile, images=()):
+	"""Switch CRAFT and the vietocr Predictor (both on cpu) to an inference profile"""
+	lines = calibration_lines(craft, images) if profile == 'static_int8' else []
+	apply_craft_profile(craft, profile, images)
+	apply_ocr_profile(predictor, profile, lines)
@@ -10,7 +10,7 @@ import torch.nn.functional as F
 import torch.nn.init as init
 from skimage import io
 from torchvision import models
-from torchvision.models.vgg import model_urls
+from torchvision.models.vgg import cfgs, make_layers
 
 
 class RefineNet(nn.Module):
@@ -95,7 +95,7 @@ def denormalizeMeanVariance(in_img, mean=(0.485, 0.456, 0.406), variance=(0.229,
     return img
 
 
-def resize_aspect_ratio(img, square_size, interpolation, mag_ratio=1):
+def resize_aspect_ratio(img, square_size, interpolation, mag_ratio=1, dtype=np.float32):
     height, width, channel = img.shape
 
     # magnify image size
@@ -116,7 +116,7 @@ def resize_aspect_ratio(img, square_size, interpolation, mag_ratio=1):
         target_h32 = target_h + (32 - target_h % 32)
     if target_w % 32 != 0:
         target_w32 = target_w + (32 - target_w % 32)
-    resized = np.zeros((target_h32, target_w32, channel), dtype=np.float32)
+    resized = np.zeros((target_h32, target_w32, channel), dtype=dtype)
     resized[0:target_h, 0:target_w, :] = proc
     target_h, target_w = target_h32, target_w32
 
@@ -468,8 +468,15 @@ def init_weights(modules):
 class vgg16_bn(torch.nn.Module):
     def __init__(self, pretrained=True, freeze=True):
         super(vgg16_bn, self).__init__()
-        model_urls['vgg16_bn'] = model_urls['vgg16_bn'].replace('https://', 'http://')
-        vgg_pretrained_features = models.vgg16_bn(pretrained=pretrained).features
+        if pretrained:
+            try:  # torchvision < 0.13 only
+                from torchvision.models.vgg import model_urls
+                model_urls['vgg16_bn'] = model_urls['vgg16_bn'].replace('https://', 'http://')
+            except ImportError:
+                pass
+            vgg_pretrained_features = models.vgg16_bn(pretrained=True).features
+        else:  # conv layers only (init_weights below), the CRAFT checkpoint provides the weights
+            vgg_pretrained_features = make_layers(cfgs['D'], batch_norm=True)
         self.slice1 = torch.nn.Sequential()
         self.slice2 = torch.nn.Sequential()
         self.slice3 = torch.nn.Sequential()
@@ -7,7 +7,7 @@ import torch
 from torch.autograd import Variable
 
 from rotation.CRAFT import model
-from utils import download_weight
+from utils import download_weight, load_weights
 
 
 def copyStateDict(state_dict):
@@ -25,12 +25,16 @@ def copyStateDict(state_dict):
 def test_net(net, image, text_threshold, link_threshold, low_text, cuda, poly, refine_net=None):
     t0 = time.time()
 
+    # nets that normalize the image themselves (profiles.AutocastNet) take it as uint8
+    takes_uint8 = getattr(net, 'takes_uint8', False)
+
     # resize
-    img_resized, target_ratio, size_heatmap = model.resize_aspect_ratio(image, 1536, interpolation=cv2.INTER_LINEAR, mag_ratio=1.5)
+    img_resized, target_ratio, size_heatmap = model.resize_aspect_ratio(image, 1536, interpolation=cv2.INTER_LINEAR, mag_ratio=1.5,
+                                                                        dtype=np.uint8 if takes_uint8 else np.float32)
     ratio_h = ratio_w = 1 / target_ratio
 
     # preprocessing
-    x = model.normalizeMeanVariance(img_resized)
+    x = img_resized if takes_uint8 else model.normalizeMeanVariance(img_resized)
     x = torch.from_numpy(x).permute(2, 0, 1)  # [h, w, c] to [c, h, w]
     x = Variable(x.unsqueeze(0))  # [c, h, w] to [b, c, h, w]
     if cuda:
@@ -75,11 +79,11 @@ def test_net(net, image, text_threshold, link_threshold, low_text, cuda, poly, r
 
 def model_setup(model, pretrained, cuda):
     if cuda:
-        model.load_state_dict(copyStateDict(torch.load(pretrained)))
+        model.load_state_dict(copyStateDict(load_weights(pretrained)))
         model = model.cuda()
         model = torch.nn.DataParallel(model)
     else:
-         model.load_state_dict(copyStateDict(torch.load(pretrained, map_location='cpu')))
+         model.load_state_dict(copyStateDict(load_weights(pretrained, map_location='cpu')))
     model.eval()
     return model
     
@@ -95,3 +99,14 @@ def setup(device):
     refine_net = model_setup(refine_net, refine_model, cuda)
 
     return net, refine_net, cuda
+
+
+def load_exported(folder, backend, device):
+    """CRAFT and its refiner as graphs written by export.py, same return as setup"""
+    from runtime import load_graph
+
+    cuda = True if (device == 'cuda' and torch.cuda.is_available()) else False
+    net = load_graph(folder, 'craft', backend, 'cuda' if cuda else 'cpu')
+    refine_net = load_graph(folder, 'craft_refiner', backend, 'cuda' if cuda else 'cpu')
+
+    return net, refine_net, cuda
@@ -7,8 +7,11 @@ from rotation.CRAFT import net
 
 
 class Craft:
-	def __init__(self, device):
-		model, refine_net, cuda = net.setup(device)
+	def __init__(self, device, backend='eager', folder='exported'):
+		if backend == 'eager':
+			model, refine_net, cuda = net.setup(device)
+		else:  # graphs written by export.py
+			model, refine_net, cuda = net.load_exported(folder, backend, device)
 		self.model = model
 		self.refine_net = refine_net
 		self.cuda = cuda
@@ -1,15 +1,71 @@
 import argparse
-from utils import load_config, crop_background, measure, Progress
-import cv2
+from utils import load_config, crop_background, crop_box, measure, Progress, plan_parallelism, limit_threads, pin_cores
 import os
 from time import time
-from PIL import Image
-from multiprocessing import Pool
-from rembg import remove
-from rotation import model, Craft, align_box, rotate_90, rotate_180
-from text_extraction import Config, Predictor
-import numpy as np
-import torch
+from multiprocessing import Pool, Value
+from profiles import PROFILES, CPU_PROFILES
+from runtime import BACKENDS
+
+# Heavy modules (torch, cv2, rembg, CRAFT, vietocr) are imported by the stage that
+# needs them, so --help and --check-config start without loading them
+
+ENGINES = ('beamsearch', 'trocr', 'none')  # fallback engines besides vietocr model names
+
+_rembg_session = None
+
+
+def validate_config(config):
+	"""Check the run config without loading any model, return a list of problems"""
+	problems = []
+	if not os.path.exists(config['input']):
+		problems.append(f"input: no such file or directory '{config['input']}'")
+	if not isinstance(config['image_size'], int) or config['image_size'] <= 0:
+		problems.append('image_size: must be a positive integer')
+	if not isinstance(config['gpu'], int) or config['gpu'] < -1:
+		problems.append('gpu: must be -1, 0 or a gpu number')
+	if not isinstance(config['multiprocessing'], int) or config['multiprocessing'] < -1:
+		problems.append('multiprocessing: must be -1, 0 or a number of cpu')
+	if not isinstance(config['cores'], int) or config['cores'] < -1 or config['cores'] == 0:
+		problems.append('cores: must be -1 or a number of cores')
+	if not isinstance(config['pin_workers'], bool):
+		problems.append('pin_workers: must be True or False')
+	if not 0 <= config['fallback_threshold'] <= 1:
+		problems.append('fallback_threshold: must be between 0 and 1')
+	if config['profile'] not in PROFILES:
+		problems.append(f"profile: must be one of {', '.join(PROFILES)}")
+	elif config['profile'] == 'static_int8' and not os.path.isdir(config['calibration']):
+		problems.append(f"calibration: no such folder '{config['calibration']}'")
+	if config['backend'] not in BACKENDS:
+		problems.append(f"backend: must be one of {', '.join(BACKENDS)}")
+	elif config['backend'] != 'eager' and not os.path.isdir(config['exported']):
+		problems.append(f"exported: no such folder '{config['exported']}', run export.py first")
+	from text_extraction.vietocr.tool.config import url_config
+	for key in ('vietocr_model', 'fallback_engine'):
+		if key == 'fallback_engine' and config[key] in ENGINES:
+			continue
+		if config[key] not in url_config or config[key] == 'base':
+			problems.append(f"{key}: unknown model '{config[key]}'")
+	return problems
+
+
+def rembg_session():
+	"""rembg session of this process, created on first use so it takes the thread limits set by then"""
+	global _rembg_session
+	if _rembg_session is None:
+		from rembg import new_session
+		_rembg_session = new_session()  # onnxruntime reads OMP_NUM_THREADS here
+	return _rembg_session
+
+
+def init_worker(layout, counter, pin):
+	"""Pool initializer: give the worker its own slice of the cores and matching thread pools"""
+	with counter.get_lock():
+		index = counter.value
+		counter.value += 1
+	if pin:
+		start = (index % layout.workers) * layout.threads
+		pin_cores(layout.cores[start:start + layout.threads])
+	limit_threads(layout.threads)
 
 
 class Pipeline:
@@ -22,6 +78,7 @@ class Pipeline:
 
 	def load_image(self, image_path):
 		"""Load the image"""
+		import cv2
 		image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
 		height = self.config['image_size']
 		width = int(image.shape[1]*(height/image.shape[0]))
@@ -54,24 +111,53 @@ class Pipeline:
 	@staticmethod
 	def remove_background(img_data):
 		"""Remove background"""
-		bg_removed = remove(img_data['image'])
+		from rembg import remove
+		bg_removed = remove(img_data['image'], session=rembg_session())
 		img_data['image'] = crop_background(bg_removed)
 		return img_data
 
 	@measure
 	def prepare_model(self):
 		"""Prepare the model for gpu or cpu"""
+		import torch
+		from rotation import Craft
+		from text_extraction import Config, Router
+		backend, exported = self.config['backend'], self.config['exported']
 		ocr_config = Config.load_config_from_name(self.config['vietocr_model'])
+		ocr_config['backend'], ocr_config['exported'] = backend, exported
 		if (self.config['gpu'] != 0) and torch.cuda.is_available():
-			self.text_detector = Craft('cuda')
+			self.text_detector = Craft('cuda', backend, exported)
 			ocr_config['device'] = 'cuda' if self.config['gpu'] == -1 else f"cuda:{self.config['gpu']-1}"
 		else:
-			self.text_detector = Craft('cpu')
+			self.text_detector = Craft('cpu', backend, exported)
 			ocr_config['device'] = 'cpu'
-		self.text_extractor = Predictor(ocr_config)
+		self.text_extractor = Router(ocr_config, self.config['vietocr_model'], self.config['fallback_engine'],
+		                             self.config['fallback_threshold'], self.config['trocr_model'])
+		self.apply_profile(ocr_config['device'])
+
+	def apply_profile(self, device):
+		"""Switch CRAFT and the primary OCR engine to the configured inference profile"""
+		profile = self.config['profile']
+		if profile == 'fp32':
+			return
+		if self.config['backend'] != 'eager':
+			print(f"[Warning] profile '{profile}' needs the eager backend, ignored")
+			return
+		if profile in CPU_PROFILES and device != 'cpu':
+			print(f"[Warning] profile '{profile}' runs on cpu only, using fp32")
+			return
+		from profiles import apply_profile
+		from rotation import model
+		images = []
+		if profile == 'static_int8':
+			folder = self.config['calibration']
+			images = [model.loadImage(self.load_image(f'{folder}/{filename}')) for filename in sorted(os.listdir(folder))]
+		apply_profile(self.text_detector, self.text_extractor.primary, profile, images)
+		print(f"Inference profile '{profile}' applied")
 
 	def rotate(self, img_data):
 		"""Rotate the image"""
+		from rotation import model, align_box, rotate_90, rotate_180
 		img_1 = model.loadImage(img_data['image'])
 		bboxes = self.text_detector(img_1)
 		img_2 = rotate_90.run(img_1, bboxes)  # rotate 90
@@ -85,14 +171,11 @@ class Pipeline:
 
 	def extract_info(self, img_data):
 		"""Extract information"""
+		from PIL import Image
 		img_data['information'] = []
 		incline = {'prev_height': 0, 'prev_line': -1, }
 		for i, box in enumerate(img_data['bboxes']):
-			x1 = int(box[0][0] if (box[0][0] < box[3][0]) else box[3][0])
-			y1 = int(box[0][1] if (box[0][1] < box[1][1]) else box[1][1])
-			x2 = int(box[2][0] if (box[2][0] > box[1][0]) else box[1][0])
-			y2 = int(box[2][1] if (box[2][1] > box[3][1]) else box[3][1])
-			arr_img = img_data['image'].copy()[y1:y2, x1:x2]  # crop image
+			arr_img = crop_box(img_data['image'], box)  # crop image
 			try:
 				img_box = Image.fromarray(arr_img)
 				detected = self.text_extractor.predict(img_box)  # skip error image box
@@ -119,6 +202,9 @@ class Pipeline:
 		"""Save image"""
 		if not self.config['save_image']:
 			return
+		import cv2
+		import numpy as np
+		from PIL import Image
 		for box in img_data['bboxes']:
 			poly = np.array(box).astype(np.int32).reshape((-1))
 			poly = poly.reshape(-1, 2)
@@ -134,36 +220,49 @@ class Pipeline:
 			return
 		with open(f'{self.config["output"]}/{img_data["name"]}.txt', 'w+', encoding="utf-8") as f:
 			for line in img_data['information']:
-				f.write(' | '.join(line) + '\n')
+				f.write(' | '.join(detected.text for detected in line) + '\n')
+		if self.config['save_confidence']:  # engine and confidence of every box, one line per output line
+			with open(f'{self.config["output"]}/{img_data["name"]}.conf', 'w+', encoding="utf-8") as f:
+				for line in img_data['information']:
+					f.write(' | '.join(f'{d.engine}:{d.confidence:.4f}' for d in line) + '\n')
 
 @measure
 def main(args):
 	config = load_config('run', args)  # load config
 
+	layout = plan_parallelism(config['cores'], config['multiprocessing'])
+	if config['pin_workers']:
+		pin_cores(layout.cores)
+	print(f"Parallelism: {len(layout.cores)} cores (models use all of them), "
+	      f"{layout.workers} worker(s) x {layout.threads} thread(s){' pinned' if config['pin_workers'] else ''}")
+
 	pl = Pipeline(config)
 
 	data = pl.prepare_data()
 
-	pl.prepare_model()
-
 	start = time()
-	if config['multiprocessing'] in [0, 1]:  # multiprocessing disable
+	if layout.workers == 1:  # multiprocessing disable
 		print(f'Multiprocessing will not be used!')
+		limit_threads(len(layout.cores))
 		bg_removed = [pl.remove_background(img_data) for img_data in data]
 	else:  # multiprocessing enable
-		max_cpu = int(torch.multiprocessing.cpu_count()*0.8)  # 80% for safety | max out your thread may crash your system
-		num_cpu = max_cpu if config['multiprocessing'] == -1 else config['multiprocessing']
-		print(f'Maximum {num_cpu} cpu will be used')
-		with Pool(processes=num_cpu) as pool:
+		print(f'Maximum {layout.workers} cpu will be used')
+		# Fork before this process loads any model or raises its own limits, so the
+		# workers only run with the threads init_worker gives them
+		with Pool(layout.workers, init_worker, (layout, Value('i', 0), config['pin_workers'])) as pool:
 			bg_removed = pool.map(pl.remove_background, data)
+		limit_threads(len(layout.cores))  # models run in this process once the pool is done
 	print(f'Done remove background in {round(time()-start, 2)}s')
 
+	pl.prepare_model()
+
 	print('Start extract information...')
 	for img_data in Progress(bg_removed):  # extract information
 		img_data = pl.rotate(img_data)
 		img_data = pl.extract_info(img_data)
 		pl.save_text(img_data)
 		pl.save_image(img_data)
+	print(f'Recognized lines per engine: {dict(pl.text_extractor.counts)}')
 	print(f"Result has been saved to '{config['output']}'")
 
 
@@ -173,6 +272,15 @@ if __name__ == '__main__':
 	args.add_argument('-o', '--output', type=str, help='Output folder path (Default: result/)')
 	args.add_argument('-g', '--gpu', type=int, help='Use which gpu | 0 for cpu | -1 for all (Default: -1)')
 	args.add_argument('-mp', '--multiprocessing', type=int, help='Maximum of cpu can use | -1 for 80 percent (Default: -1)')
+	args.add_argument('-c', '--cores', type=int, help='Cores the whole run may use | -1 for all (Default: -1)')
+	args.add_argument('--pin-workers', action='store_true', default=None, help='Pin every pool worker to its own cores')
+	args.add_argument('-p', '--profile', type=str, help='Inference profile: fp32, channels_last, dynamic_int8, static_int8 or bf16 (Default: fp32)')
+	args.add_argument('-b', '--backend', type=str, help='Model runtime: eager, or torchscript / onnx graphs from export.py (Default: eager)')
+	args.add_argument('--check-config', action='store_true', help='Validate the config and exit without loading any model')
 	args = args.parse_args()
 
+	if args.check_config:
+		problems = validate_config(load_config('run', args))
+		print('\n'.join(f'[Error] {problem}' for problem in problems) or 'Config is valid')
+		exit(1 if problems else 0)
 	main(args)
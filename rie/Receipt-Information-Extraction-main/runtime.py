@@ -0,0 +1,80 @@
+# Runtime backends for the graphs written by export.py. torch and onnxruntime are imported
+# on load, so run.py can validate a backend name without them.
+#   eager        the Python modules, as trained
+#   torchscript  torch.jit graphs (.pt), no torchvision or training code needed
+#   onnx         ONNX Runtime sessions (.onnx)
+import os
+
+BACKENDS = ('eager', 'torchscript', 'onnx')
+EXTENSIONS = {'torchscript': '.pt', 'onnx': '.onnx'}
+
+# Graphs of export.py: name -> (input names, output names)
+GRAPHS = {
+	'craft': (['image'], ['y', 'feature']),
+	'craft_refiner': (['y', 'feature'], ['refined']),
+	'ocr_encoder': (['image'], ['hidden', 'encoder_outputs', 'keys']),
+	'ocr_decoder': (['token', 'hidden', 'encoder_outputs', 'keys'], ['output', 'new_hidden']),
+}
+
+
+def graph_path(folder, name, backend):
+	return os.path.join(folder, name + EXTENSIONS[backend])
+
+
+class OnnxGraph:
+	"""Call an ONNX Runtime session like a module: torch tensors in, torch tensors out"""
+	def __init__(self, path, device='cpu'):
+		import onnxruntime
+		providers = ['CPUExecutionProvider']
+		if device.startswith('cuda') and 'CUDAExecutionProvider' in onnxruntime.get_available_providers():
+			providers.insert(0, 'CUDAExecutionProvider')
+		self.session = onnxruntime.InferenceSession(path, providers=providers)
+		self.inputs = [i.name for i in self.session.get_inputs()]
+		self.device = device
+
+	def __call__(self, *tensors):
+		import torch
+		feed = {name: tensor.detach().cpu().numpy() for name, tensor in zip(self.inputs, tensors)}
+		outputs = [torch.from_numpy(output).to(self.device) for output in self.session.run(None, feed)]
+		return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+
+def load_graph(folder, name, backend, device='cpu'):
+	"""Load graph `name` of an export folder as a callable"""
+	path = graph_path(folder, name, backend)
+	if backend == 'onnx':
+		return OnnxGraph(path, device)
+	import torch
+	return torch.jit.load(path, map_location=device).eval()
+
+
+class ExportedOCR:
+	"""
+	Stands in for the VietOCR model in vietocr's translate functions: cnn passes the
+	image through and transformer runs the exported encoder and single-step decoder
+	"""
+	def __init__(self, folder, backend, device='cpu'):
+		self.encoder = load_graph(folder, 'ocr_encoder', backend, device)
+		self.decoder = load_graph(folder, 'ocr_decoder', backend, device)
+		self.transformer = self
+
+	def eval(self):
+		return self
+
+	def cnn(self, img):
+		return img
+
+	def forward_encoder(self, img):
+		return tuple(self.encoder(img)) + (None,)  # no padding mask: the graphs take exact-width batches
+
+	def forward_decoder(self, tgt, memory):
+		hidden, encoder_outputs, keys, mask = memory
+		output, hidden = self.decoder(tgt[-1], hidden, encoder_outputs, keys)
+		return output.unsqueeze(1), (hidden, encoder_outputs, keys, mask)
+
+	def expand_memory(self, memory, beam_size):
+		hidden, encoder_outputs, keys, mask = memory
+		return hidden.repeat(beam_size, 1), encoder_outputs.repeat(beam_size, 1, 1), keys.repeat(beam_size, 1, 1), mask
+
+	def get_memory(self, memory, i):
+		return tuple(tensor[[i]] for tensor in memory[:3]) + (None,)
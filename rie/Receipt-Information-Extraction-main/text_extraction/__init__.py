@@ -1 +1,14 @@
-from text_extraction.vietocr import Config, Predictor
\ No newline at end of file
+# Resolved on first access, so importing the package does not load torch
+_EXPORTS = {
+	'Config': 'text_extraction.vietocr',
+	'Predictor': 'text_extraction.vietocr',
+	'Router': 'text_extraction.router',
+	'Recognition': 'text_extraction.router',
+}
+
+
+def __getattr__(name):
+	if name not in _EXPORTS:
+		raise AttributeError(f"module 'text_extraction' has no attribute '{name}'")
+	import importlib
+	return getattr(importlib.import_module(_EXPORTS[name]), name)
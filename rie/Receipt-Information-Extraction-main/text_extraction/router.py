@@ -0,0 +1,51 @@
+from collections import namedtuple, Counter
+from text_extraction.vietocr import Config, Predictor
+
+Recognition = namedtuple('Recognition', ['text', 'engine', 'confidence'])
+
+
+class Router:
+	"""Keep confident lines from the primary engine and re-run the rest on a slower, more accurate one
+
+	fallback can be any vietocr model name (e.g. 'vgg_transformer'), 'beamsearch' to re-decode
+	with the primary model, 'trocr' or 'none'. The fallback engine is only built when first needed.
+	"""
+	def __init__(self, ocr_config, primary, fallback='none', threshold=0.8, trocr_model='microsoft/trocr-base-printed'):
+		self.primary = Predictor(ocr_config)
+		self.primary_name = primary
+		self.fallback_name = fallback if fallback else 'none'
+		self.threshold = threshold
+		self.trocr_model = trocr_model
+		self.device = ocr_config['device']
+		self.counts = Counter()
+		self.__fallback = None
+
+	@property
+	def fallback(self):
+		if self.__fallback is None:
+			if self.fallback_name == 'beamsearch':
+				self.__fallback = self.primary
+			elif self.fallback_name == 'trocr':
+				from text_extraction.trocr import TrOCR
+				self.__fallback = TrOCR(self.trocr_model, self.device)
+			else:
+				ocr_config = Config.load_config_from_name(self.fallback_name)
+				ocr_config['device'] = self.device
+				self.__fallback = Predictor(ocr_config)
+		return self.__fallback
+
+	def __predict_fallback(self, img):
+		if self.fallback_name == 'beamsearch':
+			return self.fallback.predict(img, return_prob=True, beamsearch=True)
+		return self.fallback.predict(img, return_prob=True)
+
+	def predict(self, img):
+		"""Recognize a text box, return Recognition(text, engine, confidence)"""
+		text, prob = self.primary.predict(img, return_prob=True)
+		prob = float(prob) if prob is not None else 0.0
+		if self.fallback_name == 'none' or prob >= self.threshold:  # nan confidence also goes to fallback
+			self.counts[self.primary_name] += 1
+			return Recognition(text, self.primary_name, prob)
+		text, prob = self.__predict_fallback(img)
+		self.counts[self.fallback_name] += 1
+		return Recognition(text, self.fallback_name, float(prob))
@@ -0,0 +1,22 @@
+import torch
+
+
+class TrOCR:
+	"""TrOCR recognizer exposing the same predict() interface as the VietOCR Predictor"""
+	def __init__(self, model_name, device):
+		from transformers import TrOCRProcessor, VisionEncoderDecoderModel  # optional, only needed for this engine
+		self.processor = TrOCRProcessor.from_pretrained(model_name)
+		self.model = VisionEncoderDecoderModel.from_pretrained(model_name).to(device)
+		self.model.eval()
+		self.device = device
+
+	def predict(self, img, return_prob=False):
+		pixel_values = self.processor(images=img.convert('RGB'), return_tensors='pt').pixel_values
+		with torch.no_grad():
+			generated = self.model.generate(pixel_values.to(self.device), output_scores=True, return_dict_in_generate=True)
+		text = self.processor.batch_decode(generated.sequences, skip_special_tokens=True)[0]
+		if not return_prob:
+			return text
+		scores = self.model.compute_transition_scores(generated.sequences, generated.scores, normalize_logits=True)
+		prob = float(torch.exp(scores[0].mean())) if scores.numel() else 0.0
+		return text, prob
@@ -1,2 +1,9 @@
-from .tool.predictor import Predictor
-from .tool.config import Cfg as Config
+# Resolved on first access, so config helpers can be used without loading torch
+def __getattr__(name):
+    if name == 'Predictor':
+        from .tool.predictor import Predictor
+        return Predictor
+    if name == 'Config':
+        from .tool.config import Cfg
+        return Cfg
+    raise AttributeError(f"module 'text_extraction.vietocr' has no attribute '{name}'")
@@ -18,6 +18,7 @@ from torch.utils.data.sampler import Sampler
 from vietocr.tool.translate import process_image
 from vietocr.tool.create_dataset import createDataset
 from vietocr.tool.translate import resize
+from vietocr.model.vocab import pad_batch
 
 class OCRDataset(Dataset):
     def __init__(self, lmdb_path, root_dir, annotation_path, vocab, image_height=32, image_min_width=32, image_max_width=512, transform=None):
@@ -156,35 +157,15 @@ class Collator(object):
         self.masked_language_model = masked_language_model
 
     def __call__(self, batch):
-        filenames = []
-        img = []
-        target_weights = []
-        tgt_input = []
-        max_label_len = max(len(sample['word']) for sample in batch)
-        for sample in batch:
-            img.append(sample['img'])
-            filenames.append(sample['img_path'])
-            label = sample['word']
-            label_len = len(label)
-            
-            
-            tgt = np.concatenate((
-                label,
-                np.zeros(max_label_len - label_len, dtype=np.int32)))
-            tgt_input.append(tgt)
-
-            one_mask_len = label_len - 1
-
-            target_weights.append(np.concatenate((
-                np.ones(one_mask_len, dtype=np.float32),
-                np.zeros(max_label_len - one_mask_len,dtype=np.float32))))
-            
-        img = np.array(img, dtype=np.float32)
+        img = np.array([sample['img'] for sample in batch], dtype=np.float32)
+        filenames = [sample['img_path'] for sample in batch]
 
+        tgt_input, label_len = pad_batch([sample['word'] for sample in batch])
+        target_weights = (np.arange(tgt_input.shape[1]) < label_len[:, None] - 1).astype(np.float32)
 
-        tgt_input = np.array(tgt_input, dtype=np.int64).T
-        tgt_output = np.roll(tgt_input, -1, 0).T
+        tgt_output = np.roll(tgt_input, -1, 1)
         tgt_output[:, -1]=0
+        tgt_input = tgt_input.T
         
         # random mask token
         if self.masked_language_model:
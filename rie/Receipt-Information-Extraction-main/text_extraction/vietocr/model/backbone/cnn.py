@@ -15,8 +15,10 @@ class CNN(nn.Module):
         elif backbone == 'resnet50':
             self.model = Resnet50(**kwargs)
 
-    def forward(self, x):
-        return self.model(x)
+    def forward(self, x, widths=None):
+        if widths is None:
+            return self.model(x)
+        return self.model(x, widths)
 
     def freeze(self):
         for name, param in self.model.features.named_parameters():
@@ -3,44 +3,85 @@ from torch import nn
 from torchvision import models
 from einops import rearrange
 from torchvision.models._utils import IntermediateLayerGetter
+from torchvision.models.vgg import cfgs, make_layers
+from torch.nn.modules.utils import _pair
+
+# torchvision layer config of each backbone
+VGG_CFGS = {'vgg11_bn': 'A', 'vgg19_bn': 'E'}
+
+
+def vgg_features(name):
+    """
+    The conv layers of torchvision's vgg model `name`, initialised the same way but built
+    without its ImageNet weights and without the classifier, which this backbone drops
+    """
+    features = make_layers(cfgs[VGG_CFGS[name]], batch_norm=True)
+    for m in features.modules():
+        if isinstance(m, nn.Conv2d):
+            nn.init.kaiming_normal_(m.weight, mode='fan_out', nonlinearity='relu')
+            nn.init.constant_(m.bias, 0)
+        elif isinstance(m, nn.BatchNorm2d):
+            nn.init.constant_(m.weight, 1)
+            nn.init.constant_(m.bias, 0)
+    return features
 
 
 class Vgg(nn.Module):
     def __init__(self, name, ss, ks, hidden, pretrained=True, dropout=0.5):
         super(Vgg, self).__init__()
 
-        if name == 'vgg11_bn':
-            cnn = models.vgg11_bn(pretrained=pretrained)
+        if not pretrained:  # bare architecture, no ImageNet download
+            features = vgg_features(name)
+        elif name == 'vgg11_bn':
+            features = models.vgg11_bn(pretrained=True).features
         elif name == 'vgg19_bn':
-            cnn = models.vgg19_bn(pretrained=pretrained)
+            features = models.vgg19_bn(pretrained=True).features
 
         pool_idx = 0
         
-        for i, layer in enumerate(cnn.features):
+        for i, layer in enumerate(features):
             if isinstance(layer, torch.nn.MaxPool2d):        
-                cnn.features[i] = torch.nn.AvgPool2d(kernel_size=ks[pool_idx], stride=ss[pool_idx], padding=0)
+                features[i] = torch.nn.AvgPool2d(kernel_size=ks[pool_idx], stride=ss[pool_idx], padding=0)
                 pool_idx += 1
  
-        self.features = cnn.features
+        self.features = features
         self.dropout = nn.Dropout(dropout)
         self.last_conv_1x1 = nn.Conv2d(512, hidden, 1)
 
-    def forward(self, x):
+    def forward(self, x, widths=None):
         """
         Shape: 
             - x: (N, C, H, W)
-            - output: (W, N, C)
+            - widths: (N), the image widths of a right padded batch
+            - output: (W, N, C), and the length of each sequence when widths is given
         """
 
-        conv = self.features(x)
+        if widths is None:
+            conv = self.features(x)
+        else:
+            conv = x
+            for layer in self.features:
+                if isinstance(layer, nn.Conv2d):  # the padding must read as zeros, like the conv padding
+                    conv = conv * (torch.arange(conv.shape[-1], device=conv.device) < widths[:, None])[:, None, None, :]
+                conv = layer(conv)
+                if isinstance(layer, nn.AvgPool2d):
+                    widths = self.pool_width(layer, widths)
         conv = self.dropout(conv)
         conv = self.last_conv_1x1(conv)
 
 #        conv = rearrange(conv, 'b d h w -> b d (w h)')
+        height = conv.shape[-2]
         conv = conv.transpose(-1, -2)
         conv = conv.flatten(2)
-        conv = conv.permute(-1, 0, 1)
-        return conv
+        conv = conv.permute(2, 0, 1)  # same as (-1, 0, 1), which ONNX rejects
+        if widths is None:
+            return conv
+        return conv, widths * height
+
+    @staticmethod
+    def pool_width(pool, widths):
+        kernel, stride = _pair(pool.kernel_size)[1], _pair(pool.stride)[1]
+        return torch.div(widths - kernel, stride, rounding_mode='floor') + 1
 
 def vgg11_bn(ss, ks, hidden, pretrained=True, dropout=0.5):
     return Vgg('vgg11_bn', ss, ks, hidden, pretrained, dropout)
@@ -1,9 +1,14 @@
 import torch
 
 class Beam:
+    """
+    Beam search state held in preallocated tensors, one row per beam:
+    token history, back-pointers, scores and a mask of the hypotheses that ended
+    at each step. Every update is a handful of vectorized ops.
+    """
 
     def __init__(self, beam_size=8, min_length=0, n_top=1, ranker=None,
-                 start_token_id=1, end_token_id=2):
+                 start_token_id=1, end_token_id=2, max_length=128):
         self.beam_size = beam_size
         self.min_length = min_length
         self.ranker = ranker
@@ -11,94 +16,95 @@ class Beam:
         self.end_token_id = end_token_id
         self.top_sentence_ended = False
 
-        self.prev_ks = []
-        self.next_ys = [torch.LongTensor(beam_size).fill_(start_token_id)] # remove padding
+        self.steps = 0
+        self.tokens = torch.full((beam_size, max_length + 1), start_token_id, dtype=torch.long) # step t in column t
+        self.prev_ks = torch.zeros(max_length, beam_size, dtype=torch.long)
+        self.scores = torch.zeros(max_length, beam_size)
+        self.ended = torch.zeros(max_length, beam_size, dtype=torch.bool)
 
-        self.current_scores = torch.FloatTensor(beam_size).zero_()
-        self.all_scores = []
+        self.current_scores = torch.zeros(beam_size)
 
-        # Time and k pair for finished.
-        self.finished = []
+        # Number of finished hypotheses
+        self.n_finished = 0
         self.n_top = n_top
 
-        self.ranker = ranker
+    def _grow(self):
+        "Double the preallocated steps."
+        steps = self.prev_ks.size(0)
+        self.tokens = torch.cat((self.tokens, self.tokens.new_zeros(self.beam_size, steps)), dim=1)
+        self.prev_ks = torch.cat((self.prev_ks, torch.zeros_like(self.prev_ks)))
+        self.scores = torch.cat((self.scores, torch.zeros_like(self.scores)))
+        self.ended = torch.cat((self.ended, torch.zeros_like(self.ended)))
 
     def advance(self, next_log_probs):
         # next_probs : beam_size X vocab_size
 
         vocabulary_size = next_log_probs.size(1)
-        # current_beam_size = next_log_probs.size(0)
 
-        current_length = len(self.next_ys)
-        if current_length < self.min_length:
-            for beam_index in range(len(next_log_probs)):
-                next_log_probs[beam_index][self.end_token_id] = -1e10
+        if self.steps + 1 < self.min_length:
+            next_log_probs[:, self.end_token_id] = -1e10
 
-        if len(self.prev_ks) > 0:
-            beam_scores = next_log_probs + self.current_scores.unsqueeze(1).expand_as(next_log_probs)
+        if self.steps > 0:
+            beam_scores = next_log_probs + self.current_scores.unsqueeze(1)
             # Don't let EOS have children.
-            last_y = self.next_ys[-1]
-            for beam_index in range(last_y.size(0)):
-                if last_y[beam_index] == self.end_token_id:
-                    beam_scores[beam_index] = -1e10 # -1e20 raises error when executing
+            beam_scores[self.tokens[:, self.steps] == self.end_token_id] = -1e10 # -1e20 raises error when executing
         else:
             beam_scores = next_log_probs[0]
-            
-        flat_beam_scores = beam_scores.view(-1)
-        top_scores, top_score_ids = flat_beam_scores.topk(k=self.beam_size, dim=0, largest=True, sorted=True)
+
+        top_scores, top_score_ids = beam_scores.view(-1).topk(k=self.beam_size, dim=0, largest=True, sorted=True)
+
+        if self.steps == self.prev_ks.size(0):
+            self._grow()
+
+        next_y = top_score_ids % vocabulary_size
+        ended = next_y == self.end_token_id
 
         self.current_scores = top_scores
-        self.all_scores.append(self.current_scores)
-        
-        prev_k = top_score_ids // vocabulary_size  # (beam_size, )
-        next_y = top_score_ids - prev_k * vocabulary_size  # (beam_size, )
-                
-        
-        self.prev_ks.append(prev_k)
-        self.next_ys.append(next_y)
-
-        for beam_index, last_token_id in enumerate(next_y):
-            
-            if last_token_id == self.end_token_id:
-                
-                # skip scoring
-                self.finished.append((self.current_scores[beam_index], len(self.next_ys) - 1, beam_index))
-
-        if next_y[0] == self.end_token_id:
+        self.prev_ks[self.steps] = torch.div(top_score_ids, vocabulary_size, rounding_mode='floor')
+        self.scores[self.steps] = top_scores
+        self.ended[self.steps] = ended
+        self.steps += 1
+        self.tokens[:, self.steps] = next_y
+
+        self.n_finished += int(ended.sum())
+        if ended[0]:
             self.top_sentence_ended = True
 
     def get_current_state(self):
         "Get the outputs for the current timestep."
-        return torch.stack(self.next_ys, dim=1)
+        return self.tokens[:, :self.steps + 1]
 
     def get_current_origin(self):
         "Get the backpointers for the current timestep."
-        return self.prev_ks[-1]
+        return self.prev_ks[self.steps - 1]
 
     def done(self):
-        return self.top_sentence_ended and len(self.finished) >= self.n_top
+        return self.top_sentence_ended and self.n_finished >= self.n_top
 
     def get_hypothesis(self, timestep, k):
-        hypothesis = []
-        for j in range(len(self.prev_ks[:timestep]) - 1, -1, -1):
-            hypothesis.append(self.next_ys[j + 1][k])
-            # for RNN, [:, k, :], and for trnasformer, [k, :, :]
-            k = self.prev_ks[j][k]
+        "Tokens of beam k at timestep, from the back-pointers, gathered in one indexing op."
+        prev_ks = self.prev_ks[:timestep].tolist()
+        rows = [0] * timestep
+        for j in range(timestep - 1, -1, -1):
+            rows[j] = k
+            k = prev_ks[j][k]
 
-        return hypothesis[::-1]
+        return self.tokens[rows, torch.arange(1, timestep + 1)]
 
     def sort_finished(self, minimum=None):
+        # Finished hypotheses in the order they ended (step, then beam), as (score, timestep, k)
+        times, ks = self.ended[:self.steps].nonzero(as_tuple=True)
+        scores = self.scores[times, ks]
+        times = (times + 1).tolist()
+        ks = ks.tolist()
+
         if minimum is not None:
-            i = 0
             # Add from beam until we have minimum outputs.
-            while len(self.finished) < minimum:
-                # global_scores = self.global_scorer.score(self, self.scores)
-                # s = global_scores[i]
-                s = self.current_scores[i]
-                self.finished.append((s, len(self.next_ys) - 1, i))
-                i += 1
-
-        self.finished = sorted(self.finished, key=lambda a: a[0], reverse=True)
-        scores = [sc for sc, _, _ in self.finished]
-        ks = [(t, k) for _, t, k in self.finished]
-        return scores, ks
+            extra = max(minimum - len(ks), 0)
+            scores = torch.cat((scores, self.current_scores[:extra]))
+            times += [self.steps] * extra
+            ks += list(range(extra))
+
+        # stable, as sorted() was: ties keep the order they ended in
+        scores, order = scores.sort(descending=True, stable=True)
+        return list(scores), [(times[i], ks[i]) for i in order.tolist()]
@@ -277,6 +277,62 @@ class Decoder(nn.Module):
             
         return output, attention
 
+    def init_cache(self, batch_size, device):
+        
+        #the left padding of forward, one [batch size, hid dim, kernel size - 1] per layer
+        hid_dim = self.emb2hid.out_features
+        
+        return [torch.full((batch_size, hid_dim, self.kernel_size - 1), float(self.trg_pad_idx), device=device)
+                for _ in self.convs]
+    
+    def step(self, trg, pos, cache, encoder_conved, encoder_combined):
+        
+        #decode only position pos, the earlier positions are in cache
+        #trg = [batch size]
+        #cache = per layer [batch size, hid dim, kernel size - 1], the last inputs of that layer
+        #encoder_conved = encoder_combined = [batch size, src len, emb dim]
+        
+        embedded = self.dropout(self.tok_embedding(trg) + self.pos_embedding.weight[pos]).unsqueeze(1)
+        
+        #embedded = [batch size, 1, emb dim]
+        
+        conv_input = self.emb2hid(embedded).permute(0, 2, 1)
+        
+        #conv_input = [batch size, hid dim, 1]
+        
+        new_cache = []
+        
+        for conv, previous in zip(self.convs, cache):
+            
+            conv_input = self.dropout(conv_input)
+            
+            window = torch.cat((previous, conv_input), dim = 2)
+            
+            #window = [batch size, hid dim, kernel size]
+            
+            conved = F.glu(conv(window), dim = 1)
+            
+            #conved = [batch size, hid dim, 1]
+            
+            attention, conved = self.calculate_attention(embedded, 
+                                                         conved, 
+                                                         encoder_conved, 
+                                                         encoder_combined)
+            
+            conved = (conved + conv_input) * self.scale
+            
+            new_cache.append(window[:, :, 1:])
+            
+            conv_input = conved
+        
+        conved = self.hid2emb(conved.permute(0, 2, 1))
+        
+        output = self.fc_out(self.dropout(conved))
+        
+        #output = [batch size, 1, output dim]
+        
+        return output, attention, new_cache
+
 class ConvSeq2Seq(nn.Module):
     def __init__(self, vocab_size, emb_dim, hid_dim, enc_layers, dec_layers, enc_kernel_size, dec_kernel_size, enc_max_length, dec_max_length, dropout, pad_idx, device):
         super().__init__()
@@ -287,16 +343,66 @@ class ConvSeq2Seq(nn.Module):
         self.encoder = enc
         self.decoder = dec
 
-    def forward_encoder(self, src):
+    def forward_encoder(self, src, lengths=None):
+        
+        #the encoder convolutions mix padding into the sequence, so padded batches are not supported
+        if lengths is not None:
+            raise ValueError('ConvSeq2Seq does not support right padded batches')
+        
         encoder_conved, encoder_combined = self.encoder(src)
         
-        return encoder_conved, encoder_combined
+        #no target tokens decoded yet, so no decoder cache
+        return encoder_conved, encoder_combined, None, None
 
     def forward_decoder(self, trg, memory):
-        encoder_conved, encoder_combined = memory
-        output, attention = self.decoder(trg, encoder_conved, encoder_combined)
         
-        return output, (encoder_conved, encoder_combined) 
+        #trg = [trg len, batch size], only the last position is decoded
+        #output = [batch size, 1, output dim]
+        encoder_conved, encoder_combined, tokens, cache = memory
+        cache = self.align_cache(trg[:-1], tokens, cache, encoder_conved, encoder_combined)
+        output, attention, cache = self.decoder.step(trg[-1], trg.shape[0] - 1, cache, encoder_conved, encoder_combined)
+        
+        return output, (encoder_conved, encoder_combined, trg, cache)
+
+    def align_cache(self, prefix, tokens, cache, encoder_conved, encoder_combined):
+        
+        #cache for the rows of prefix, reusing the rows of the previous step that have the
+        #same prefix and the same image (beam search reorders the rows of one image),
+        #else decoded again from the start
+        if tokens is not None and tokens.shape[0] == prefix.shape[0]:
+            if torch.equal(tokens, prefix):
+                return cache
+            
+            same = (prefix.unsqueeze(2) == tokens.unsqueeze(1)).all(0)
+            
+            #same = [batch size, batch size], rows of the previous step with the same prefix
+            
+            if same.any(1).all():
+                rows = same.int().argmax(1)
+                
+                #each row's source must also hold the same image
+                if (encoder_conved[rows] == encoder_conved).flatten(1).all(1).all():
+                    return [layer[rows] for layer in cache]
+        
+        cache = self.decoder.init_cache(prefix.shape[1], encoder_conved.device)
+        for pos in range(prefix.shape[0]):
+            _, _, cache = self.decoder.step(prefix[pos], pos, cache, encoder_conved, encoder_combined)
+        
+        return cache
+
+    def expand_memory(self, memory, beam_size):
+        encoder_conved, encoder_combined, _, _ = memory
+        encoder_conved = encoder_conved.repeat(beam_size, 1, 1)
+        encoder_combined = encoder_combined.repeat(beam_size, 1, 1)
+        
+        return encoder_conved, encoder_combined, None, None
+
+    def get_memory(self, memory, i):
+        encoder_conved, encoder_combined, _, _ = memory
+        encoder_conved = encoder_conved[[i]]
+        encoder_combined = encoder_combined[[i]]
+        
+        return encoder_conved, encoder_combined, None, None
 
     def forward(self, src, trg):
         
@@ -2,6 +2,9 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+from text_extraction.vietocr.model.seqmodel.transformer import padding_mask
 
 class Encoder(nn.Module):
     def __init__(self, emb_dim, enc_hid_dim, dec_hid_dim, dropout):
@@ -11,16 +14,22 @@ class Encoder(nn.Module):
         self.fc = nn.Linear(enc_hid_dim * 2, dec_hid_dim)
         self.dropout = nn.Dropout(dropout)
         
-    def forward(self, src):
+    def forward(self, src, lengths=None):
         """
         src: src_len x batch_size x img_channel
-        outputs: src_len x batch_size x hid_dim 
+        lengths: batch_size, the length of each sequence when src is right padded
+        outputs: src_len x batch_size x hid_dim, zero past the lengths
         hidden: batch_size x hid_dim
         """
 
         embedded = self.dropout(src)
         
-        outputs, hidden = self.rnn(embedded)
+        if lengths is None:
+            outputs, hidden = self.rnn(embedded)
+        else:
+            packed = pack_padded_sequence(embedded, lengths.cpu(), enforce_sorted=False)
+            outputs, hidden = self.rnn(packed)
+            outputs, _ = pad_packed_sequence(outputs, total_length=src.shape[0])
                                  
         hidden = torch.tanh(self.fc(torch.cat((hidden[-2,:,:], hidden[-1,:,:]), dim = 1)))
         
@@ -30,6 +39,7 @@ class Attention(nn.Module):
     def __init__(self, enc_hid_dim, dec_hid_dim):
         super().__init__()
         
+        self.dec_hid_dim = dec_hid_dim
         self.attn = nn.Linear((enc_hid_dim * 2) + dec_hid_dim, dec_hid_dim)
         self.v = nn.Linear(dec_hid_dim, 1, bias = False)
         
@@ -53,6 +63,35 @@ class Attention(nn.Module):
         
         return F.softmax(attention, dim = 1)
 
+    def project(self, encoder_outputs):
+        """
+        encoder side of self.attn, computed once per image for inference
+        encoder_outputs: batch_size x src_len x hid_dim
+        outputs: batch_size x src_len x dec_hid_dim
+        """
+
+        return F.linear(encoder_outputs, self.attn.weight[:, self.dec_hid_dim:], self.attn.bias)
+
+    def score(self, hidden, keys, mask=None):
+        """
+        same as forward with the encoder projection taken from project
+        hidden: batch_size x hid_dim
+        keys: batch_size x src_len x dec_hid_dim
+        mask: batch_size x src_len, True on padding, which gets no attention
+        outputs: batch_size x src_len
+        """
+
+        query = F.linear(hidden, self.attn.weight[:, :self.dec_hid_dim])
+
+        energy = torch.tanh(keys + query.unsqueeze(1))
+
+        attention = self.v(energy).squeeze(2)
+
+        if mask is not None:
+            attention = attention.masked_fill(mask, float('-inf'))
+
+        return F.softmax(attention, dim = 1)
+
 class Decoder(nn.Module):
     def __init__(self, output_dim, emb_dim, enc_hid_dim, dec_hid_dim, dropout, attention):
         super().__init__()
@@ -100,6 +139,33 @@ class Decoder(nn.Module):
         
         return prediction, hidden.squeeze(0), a.squeeze(1)
 
+    def step(self, input, hidden, encoder_outputs, keys, mask=None):
+        """
+        inference version of forward: no permutes or checks per step
+        inputs: batch_size
+        hidden: batch_size x hid_dim
+        encoder_outputs: batch_size x src_len x hid_dim
+        keys: batch_size x src_len x dec_hid_dim, from Attention.project
+        mask: batch_size x src_len, True on the padding of a right padded batch
+        """
+
+        embedded = self.dropout(self.embedding(input))
+
+        a = self.attention.score(hidden, keys, mask)
+
+        weighted = torch.bmm(a.unsqueeze(1), encoder_outputs).squeeze(1)
+
+        rnn_input = torch.cat((embedded, weighted), dim = 1)
+
+        _, hidden = self.rnn(rnn_input.unsqueeze(0), hidden.unsqueeze(0))
+
+        # single layer, single step: the GRU output is the new hidden state
+        hidden = hidden.squeeze(0)
+
+        prediction = self.fc_out(torch.cat((hidden, weighted, embedded), dim = 1))
+
+        return prediction, hidden
+
 class Seq2Seq(nn.Module):
     def __init__(self, vocab_size, encoder_hidden, decoder_hidden, img_channel, decoder_embedded, dropout=0.1):
         super().__init__()
@@ -109,31 +175,38 @@ class Seq2Seq(nn.Module):
         self.encoder = Encoder(img_channel, encoder_hidden, decoder_hidden, dropout)
         self.decoder = Decoder(vocab_size, decoder_embedded, encoder_hidden, decoder_hidden, dropout, attn)
         
-    def forward_encoder(self, src):       
+    def forward_encoder(self, src, lengths=None):       
         """
         src: timestep x batch_size x channel
+        lengths: batch_size, the length of each sequence when src is right padded
         hidden: batch_size x hid_dim
-        encoder_outputs: src_len x batch_size x hid_dim
+        encoder_outputs: batch_size x src_len x hid_dim
+        keys: batch_size x src_len x dec_hid_dim
+        mask: batch_size x src_len, True on padding, None without lengths
         """
 
-        encoder_outputs, hidden = self.encoder(src)
+        encoder_outputs, hidden = self.encoder(src, lengths)
+        encoder_outputs = encoder_outputs.permute(1, 0, 2).contiguous()
+        keys = self.decoder.attention.project(encoder_outputs)
+        mask = None if lengths is None else padding_mask(lengths, src.shape[0])
 
-        return (hidden, encoder_outputs)
+        return (hidden, encoder_outputs, keys, mask)
 
     def forward_decoder(self, tgt, memory):
         """
         tgt: timestep x batch_size 
         hidden: batch_size x hid_dim
-        encouder: src_len x batch_size x hid_dim
+        encoder_outputs: batch_size x src_len x hid_dim
+        keys: batch_size x src_len x dec_hid_dim
         output: batch_size x 1 x vocab_size
         """
         
         tgt = tgt[-1]
-        hidden, encoder_outputs = memory
-        output, hidden, _ = self.decoder(tgt, hidden, encoder_outputs)
+        hidden, encoder_outputs, keys, mask = memory
+        output, hidden = self.decoder.step(tgt, hidden, encoder_outputs, keys, mask)
         output = output.unsqueeze(1)
         
-        return output, (hidden, encoder_outputs)
+        return output, (hidden, encoder_outputs, keys, mask)
 
     def forward(self, src, trg):
         """
@@ -161,15 +234,21 @@ class Seq2Seq(nn.Module):
         return outputs
 
     def expand_memory(self, memory, beam_size):
-        hidden, encoder_outputs = memory
+        hidden, encoder_outputs, keys, mask = memory
         hidden = hidden.repeat(beam_size, 1)
-        encoder_outputs = encoder_outputs.repeat(1, beam_size, 1)
+        encoder_outputs = encoder_outputs.repeat(beam_size, 1, 1)
+        keys = keys.repeat(beam_size, 1, 1)
+        if mask is not None:
+            mask = mask.repeat(beam_size, 1)
 
-        return (hidden, encoder_outputs)
+        return (hidden, encoder_outputs, keys, mask)
     
     def get_memory(self, memory, i):
-        hidden, encoder_outputs = memory
+        hidden, encoder_outputs, keys, mask = memory
         hidden = hidden[[i]]
-        encoder_outputs = encoder_outputs[:, [i],:]
+        encoder_outputs = encoder_outputs[[i]]
+        keys = keys[[i]]
+        if mask is not None:
+            mask = mask[[i]]
 
-        return (hidden, encoder_outputs)
+        return (hidden, encoder_outputs, keys, mask)
@@ -53,28 +53,46 @@ class LanguageTransformer(nn.Module):
 
         return mask
     
-    def forward_encoder(self, src):
+    def forward_encoder(self, src, lengths=None):
+        """
+        lengths: (N), the length of each sequence when src is right padded
+        memory: (S, N, E) and its key padding mask (N, S), None without lengths
+        """
+        mask = None
+        if lengths is not None:
+            mask = padding_mask(lengths, src.shape[0])
         src = self.pos_enc(src*math.sqrt(self.d_model))
-        memory = self.transformer.encoder(src)
-        return memory
+        memory = self.transformer.encoder(src, src_key_padding_mask=mask)
+        return memory, mask
     
     def forward_decoder(self, tgt, memory):
+        memory, mask = memory
         tgt_mask = self.gen_nopeek_mask(tgt.shape[0]).to(tgt.device)
         tgt = self.pos_enc(self.embed_tgt(tgt) * math.sqrt(self.d_model))
         
-        output = self.transformer.decoder(tgt, memory, tgt_mask=tgt_mask)
+        output = self.transformer.decoder(tgt, memory, tgt_mask=tgt_mask, memory_key_padding_mask=mask)
 #        output = rearrange(output, 't n e -> n t e')
         output = output.transpose(0, 1)
 
-        return self.fc(output), memory
+        return self.fc(output), (memory, mask)
     
     def expand_memory(self, memory, beam_size):
+        memory, mask = memory
         memory = memory.repeat(1, beam_size, 1)
-        return memory
+        if mask is not None:
+            mask = mask.repeat(beam_size, 1)
+        return memory, mask
     
     def get_memory(self, memory, i):
+        memory, mask = memory
         memory = memory[:, [i], :]
-        return memory
+        if mask is not None:
+            mask = mask[[i]]
+        return memory, mask
+
+def padding_mask(lengths, size):
+    """(N, size) mask, True past the length of each right padded sequence"""
+    return torch.arange(size, device=lengths.device) >= lengths[:, None]
 
 class PositionalEncoding(nn.Module):
     def __init__(self, d_model, dropout=0.1, max_len=100):
@@ -176,8 +176,8 @@ class Trainer():
             else:
                 translated_sentence, prob = translate(batch['img'], self.model)
 
-            pred_sent = self.vocab.batch_decode(translated_sentence.tolist())
-            actual_sent = self.vocab.batch_decode(batch['tgt_output'].tolist())
+            pred_sent = self.vocab.batch_decode(translated_sentence)
+            actual_sent = self.vocab.batch_decode(batch['tgt_output'].cpu().numpy())
 
             img_files.extend(batch['filenames'])
 
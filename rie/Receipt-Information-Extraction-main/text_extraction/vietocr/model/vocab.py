@@ -1,3 +1,15 @@
+import numpy as np
+
+
+def pad_batch(words, pad=0):
+    """Stack encoded words into an int64 matrix padded with pad, and return their lengths"""
+    lengths = np.fromiter((len(word) for word in words), dtype=np.int64, count=len(words))
+    ids = np.full((len(words), lengths.max(initial=0)), pad, dtype=np.int64)
+    if len(words):
+        ids[np.arange(ids.shape[1]) < lengths[:, None]] = np.concatenate([np.asarray(word, dtype=np.int64) for word in words])
+    return ids, lengths
+
+
 class Vocab():
     def __init__(self, chars):
         self.pad = 0
@@ -16,20 +28,65 @@ class Vocab():
         self.i2c[2] = '<eos>'
         self.i2c[3] = '*'
 
+        # code point of every id, for batch_decode; ids 0-3 are not single characters
+        self.codes = np.zeros(max(self.i2c) + 1, dtype=np.uint32)
+        self.codes[4:] = [ord(self.i2c[i]) for i in range(4, len(self.codes))]
+
     def encode(self, chars):
-        return [self.go] + [self.c2i[c] for c in chars] + [self.eos]
+        return [self.go, *map(self.c2i.__getitem__, chars), self.eos]
+
+    def batch_encode(self, texts):
+        "Encode texts into an int64 matrix padded with pad, one row per text, and their lengths."
+        return pad_batch([self.encode(text) for text in texts], self.pad)
     
     def decode(self, ids):
         first = 1 if self.go in ids else 0
-        last = ids.index(self.eos) if self.eos in ids else None
-        sent = ''.join([self.i2c[i] for i in ids[first:last]])
+        try:
+            last = ids.index(self.eos)
+        except ValueError:
+            last = None
+        sent = ''.join(map(self.i2c.__getitem__, ids[first:last]))
         return sent
     
     def __len__(self):
         return len(self.c2i) + 4
     
     def batch_decode(self, arr):
-        texts = [self.decode(ids) for ids in arr]
+        """
+        decode every row of a matrix of ids (list of lists, array or tensor): the go and eos
+        positions are found for all rows at once and each row is one code point buffer
+        """
+        try:
+            arr = np.asarray(arr, dtype=np.int64)
+        except ValueError:  # rows of different lengths
+            return [self.decode(list(ids)) for ids in arr]
+        if arr.ndim != 2:
+            return [self.decode(list(ids)) for ids in arr]
+
+        if arr.size == 0:
+            return [''] * len(arr)
+
+        steps = arr.shape[1]
+        first = (arr == self.go).any(1).astype(np.int64)
+        is_eos = arr == self.eos
+        last = np.where(is_eos.any(1), is_eos.argmax(1), steps)
+
+        columns = np.arange(steps)
+        inside = (columns >= first[:, None]) & (columns < last[:, None])
+        known = (arr >= 0) & (arr < len(self.codes))
+        if (inside & ~known).any():
+            raise KeyError(int(arr[inside & ~known][0]))
+
+        safe = np.where(known, arr, 0)
+        special = (inside & (safe < 4)).any(1)  # <pad>, <sos>, <eos> or * inside the text
+        inside[special] = False
+
+        # all texts in one string, cut at the row boundaries
+        text = self.codes[safe[inside]].tobytes().decode('utf-32-le')
+        ends = np.cumsum(inside.sum(1)).tolist()
+        texts = [text[start:end] for start, end in zip([0] + ends, ends)]
+        for i in np.flatnonzero(special).tolist():
+            texts[i] = self.decode(arr[i].tolist())
         return texts
 
     def __str__(self):
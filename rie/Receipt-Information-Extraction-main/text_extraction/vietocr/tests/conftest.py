@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+# vietocr is imported as text_extraction.vietocr, from the pipeline's root folder
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+# vgg-seq2seq.yml and vgg-transformer.yml on top of base.yml, with a short vocab and
+# fewer transformer layers so the models build quickly
+BASE_CONFIG = {
+    'vocab': 'aAbBcCdDeEfFgGhHiIjJkKlLmMnNoOpPqQrRsStTuUvVwWxXyYzZ0123456789 ',
+    'device': 'cpu',
+    'backbone': 'vgg19_bn',
+    'cnn': {'pretrained': False, 'ss': [[2, 2], [2, 2], [2, 1], [2, 1], [1, 1]],
+            'ks': [[2, 2], [2, 2], [2, 1], [2, 1], [1, 1]], 'hidden': 256},
+    'dataset': {'image_height': 32, 'image_min_width': 32, 'image_max_width': 512},
+    'predictor': {'beamsearch': False},
+}
+SEQ_MODELS = {
+    'seq2seq': {'encoder_hidden': 256, 'decoder_hidden': 256, 'img_channel': 256,
+                'decoder_embedded': 256, 'dropout': 0.1},
+    'transformer': {'d_model': 256, 'nhead': 8, 'num_encoder_layers': 2, 'num_decoder_layers': 2,
+                    'dim_feedforward': 512, 'max_seq_length': 1024, 'pos_dropout': 0.1,
+                    'trans_dropout': 0.1},
+}
+
+
+def random_ocr_config(seq_modeling, folder, seed=0):
+    """
+    config of a vgg model with random weights, saved to folder as its checkpoint. The eos
+    logit is raised so lines end after a few characters instead of at max_seq_length
+    """
+    import torch
+    from text_extraction.vietocr.tool.translate import build_model
+
+    config = dict(BASE_CONFIG, seq_modeling=seq_modeling, transformer=dict(SEQ_MODELS[seq_modeling]))
+    torch.manual_seed(seed)
+    model, vocab = build_model(config, pretrained=False)
+    fc = model.transformer.decoder.fc_out if seq_modeling == 'seq2seq' else model.transformer.fc
+    with torch.no_grad():
+        fc.bias[vocab.eos] += 0.8
+        for module in model.modules():
+            if isinstance(module, torch.nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.2, 0.2)
+                module.running_var.uniform_(0.5, 2)
+    config['weights'] = os.path.join(str(folder), f'{seq_modeling}.pth')
+    torch.save(model.state_dict(), config['weights'])
+    return config
+
+
+@pytest.fixture
+def ocr_config(tmp_path):
+    """ocr_config('seq2seq') or ocr_config('transformer'): a random-weight model config"""
+    return lambda seq_modeling: random_ocr_config(seq_modeling, tmp_path)
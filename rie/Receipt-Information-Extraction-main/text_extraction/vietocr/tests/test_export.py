@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+import yaml
+from PIL import Image
+
+from export import FORMATS, OCRDecoder, OCREncoder, check, example_inputs, export_graph, load_models
+from runtime import graph_path
+from text_extraction.vietocr.tool.config import url_config
+from text_extraction.vietocr.tool.predictor import Predictor
+from utils import load_config
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+
+def backend(fmt):
+    """fmt as a test parameter, skipped when its runtime is not installed"""
+    marks = []
+    if fmt == 'onnx':
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            marks.append(pytest.mark.skip(reason='onnxruntime is not installed'))
+    return pytest.param(fmt, marks=marks)
+
+
+BACKEND_PARAMS = [backend(fmt) for fmt in FORMATS]
+
+
+def export_all(models, folder, fmt):
+    for name, inputs in example_inputs(models).items():
+        export_graph(models[name], inputs, graph_path(str(folder), name, fmt), name, fmt)
+
+
+def random_models(config):
+    """The graphs of export.py around random-weight CRAFT, refiner and vgg_seq2seq models"""
+    from rotation.CRAFT import model
+
+    torch.manual_seed(0)
+    ocr = Predictor(config).model.eval()
+    return {
+        'craft': model.CRAFT().eval(),
+        'craft_refiner': model.RefineNet().eval(),
+        'ocr_encoder': OCREncoder(ocr).eval(),
+        'ocr_decoder': OCRDecoder(ocr).eval(),
+    }
+
+
+@pytest.mark.parametrize('fmt', BACKEND_PARAMS)
+def test_random_weight_graphs_match_eager(ocr_config, tmp_path, fmt):
+    config = ocr_config('seq2seq')
+    models = random_models(config)
+    export_all(models, tmp_path, fmt)
+    assert not check(models, str(tmp_path), fmt)
+
+    # the exported OCR graphs decode the same text as the eager model
+    rng = np.random.default_rng(0)
+    imgs = [Image.fromarray(rng.integers(0, 256, (32, int(w), 3), dtype=np.uint8)) for w in (40, 40, 150, 300)]
+    with torch.no_grad():
+        eager = Predictor(config).predict_batch(imgs)
+        exported = Predictor(dict(config, backend=fmt, exported=str(tmp_path))).predict_batch(imgs)
+    assert exported == eager
+
+
+def missing_weights():
+    """Checkpoints load_models reads from weights/ (run from ROOT), without downloading"""
+    config = os.path.join('config', url_config[load_config('run')['vietocr_model']])
+    paths = ['craft_mlt_25k.pth', 'craft_refiner_CTW1500.pth', os.path.join('config', url_config['base']), config]
+    if os.path.exists(os.path.join('weights', config)):
+        with open(os.path.join('weights', config), encoding='utf-8') as f:
+            paths.append(yaml.safe_load(f)['weights'].split('/')[-1])
+    return [path for path in paths if not os.path.exists(os.path.join('weights', path))]
+
+
+@pytest.mark.parametrize('fmt', BACKEND_PARAMS)
+def test_checkpoint_graphs_match_eager(monkeypatch, tmp_path, fmt):
+    monkeypatch.chdir(ROOT)
+    missing = missing_weights()
+    if missing:
+        pytest.skip('weights not downloaded: ' + ', '.join(missing))
+    models = load_models()
+    export_all(models, tmp_path, fmt)
+    assert not check(models, str(tmp_path), fmt)
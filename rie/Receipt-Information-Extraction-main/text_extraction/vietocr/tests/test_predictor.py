@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from text_extraction.vietocr.model.backbone.vgg import Vgg
+from text_extraction.vietocr.tool.predictor import Predictor
+
+
+def random_crops(seed, n=10):
+    """Text line crops of varied heights and widths, some sharing a width class"""
+    rng = np.random.default_rng(seed)
+    return [Image.fromarray(rng.integers(0, 256, (int(rng.integers(20, 41)), int(rng.integers(20, 301)), 3),
+                                         dtype=np.uint8))
+            for _ in range(n)]
+
+
+@pytest.mark.parametrize('seq_modeling', ['seq2seq', 'transformer'])
+def test_padded_batches_match_exact(ocr_config, seq_modeling):
+    predictor = Predictor(ocr_config(seq_modeling))
+    imgs = random_crops(0)
+    assert len(predictor.batches(imgs, True)) < len(predictor.batches(imgs))
+
+    with torch.no_grad():
+        exact, exact_probs = predictor.predict_batch(imgs, True, padded=False)
+        padded, padded_probs = predictor.predict_batch(imgs, True, padded=True)
+        single = [predictor.predict(img, True) for img in imgs[:3]]
+
+    assert padded == exact
+    np.testing.assert_allclose(padded_probs, exact_probs, atol=1e-6)
+    assert [s for s, _ in single] == exact[:3]
+    np.testing.assert_allclose([p for _, p in single], exact_probs[:3], atol=1e-6)
+
+
+def test_vgg_width_masks():
+    ss = ks = [[2, 2], [2, 2], [2, 1], [2, 1], [1, 1]]
+    torch.manual_seed(0)
+    vgg = Vgg('vgg19_bn', ss, ks, 256, pretrained=False).eval()
+    with torch.no_grad():
+        for module in vgg.modules():
+            if isinstance(module, torch.nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.2, 0.2)
+                module.running_var.uniform_(0.5, 2)
+
+    widths = torch.tensor([40, 90, 131, 130])
+    crops = [torch.randn(1, 3, 32, int(w)) for w in widths]
+    x = torch.cat([F.pad(crop, (0, int(widths.max()) - crop.shape[-1])) for crop in crops], 0)
+
+    with torch.no_grad():
+        conv, lengths = vgg(x, widths)
+        for i, crop in enumerate(crops):
+            expected = vgg(crop)
+            assert lengths[i] == expected.shape[0]
+            torch.testing.assert_close(conv[:lengths[i], i], expected[:, 0], atol=1e-4, rtol=1e-4)
@@ -0,0 +1,58 @@
+import random
+
+import numpy as np
+import pytest
+import torch
+
+from text_extraction.vietocr.model.vocab import Vocab, pad_batch
+
+CHARS = 'aAàÀảẢbBcCdDđĐ0123456789!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~ '
+
+
+def random_ids(rng, vocab):
+    """An id matrix mixing characters with pad, go, eos and mask tokens anywhere"""
+    rows, steps = rng.randint(1, 5), rng.randint(0, 12)
+    special = rng.random()
+    return [[rng.randint(0, 3) if rng.random() < special else rng.randint(4, len(vocab) - 1)
+             for _ in range(steps)] for _ in range(rows)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_batch_decode_matches_decode(seed):
+    vocab = Vocab(CHARS)
+    rng = random.Random(seed)
+    for _ in range(200):
+        ids = random_ids(rng, vocab)
+        expected = [vocab.decode(row) for row in ids]
+        assert vocab.batch_decode(ids) == expected
+        array = np.array(ids, dtype=np.int64).reshape(len(ids), -1)
+        assert vocab.batch_decode(array) == expected
+        assert vocab.batch_decode(torch.from_numpy(array)) == expected
+
+
+def test_batch_decode_ragged_rows():
+    vocab = Vocab(CHARS)
+    ids = [vocab.encode('ab'), vocab.encode('đ0 1')[:-1]]
+    assert vocab.batch_decode(ids) == ['ab', 'đ0 1']
+
+
+def test_batch_decode_unknown_id():
+    vocab = Vocab(CHARS)
+    with pytest.raises(KeyError):
+        vocab.batch_decode([[1, 4, len(vocab) + 3, 2]])
+
+
+def test_batch_encode_round_trip():
+    vocab = Vocab(CHARS)
+    texts = ['', 'aÀ', 'đ0 1!?', 'b' * 20]
+    ids, lengths = vocab.batch_encode(texts)
+    assert ids.shape == (len(texts), 22)
+    assert lengths.tolist() == [len(text) + 2 for text in texts]
+    assert (ids[np.arange(ids.shape[1]) >= lengths[:, None]] == vocab.pad).all()
+    assert [vocab.encode(text) for text in texts] == [row[:n].tolist() for row, n in zip(ids, lengths)]
+    assert vocab.batch_decode(ids) == texts
+
+
+def test_pad_batch_empty():
+    ids, lengths = pad_batch([])
+    assert ids.shape == (0, 0) and lengths.shape == (0,)
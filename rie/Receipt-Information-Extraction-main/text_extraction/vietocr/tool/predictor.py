@@ -1,37 +1,53 @@
-from .translate import build_model, translate, translate_beam_search, process_input, predict
-from .utils import download_weights
+from .translate import build_model, translate, translate_beam_search, process_input, predict, can_pad
+from .utils import download_weights, load_weights
+from text_extraction.vietocr.model.vocab import Vocab
 
+import math
 import torch
+import torch.nn.functional as F
 from collections import defaultdict
 
+PADDED_BUCKET_WIDTH = 128  # px, width class of the padded batches of predict_batch
+
 class Predictor():
     def __init__(self, config):
 
         device = config['device']
         
-        model, vocab = build_model(config)
-		
-        if config['weights'].startswith('http'):
-            weights = download_weights(config['weights'])
+        backend = config.get('backend', 'eager')
+        if backend != 'eager':  # graphs written by export.py, run by runtime.py
+            from runtime import ExportedOCR
+            model, vocab = ExportedOCR(config['exported'], backend, device), Vocab(config['vocab'])
         else:
-            weights = config['weights']
+            model, vocab = build_model(config, pretrained=False)  # every weight comes from the checkpoint
+
+            if config['weights'].startswith('http'):
+                weights = download_weights(config['weights'])
+            else:
+                weights = config['weights']
 
-        model.load_state_dict(torch.load(weights, map_location=torch.device(device)))
+            model.load_state_dict(load_weights(weights, map_location=torch.device(device)))
 
         self.config = config
         self.model = model
         self.vocab = vocab
         self.device = device
 
-    def predict(self, img, return_prob=False):
-        img = process_input(img, self.config['dataset']['image_height'], 
-                self.config['dataset']['image_min_width'], self.config['dataset']['image_max_width'])        
+    def process(self, img):
+        "image tensor for the model, uint8 for models that normalize it themselves (profiles.AutocastOCR)"
+        return process_input(img, self.config['dataset']['image_height'], 
+                self.config['dataset']['image_min_width'], self.config['dataset']['image_max_width'],
+                normalize=not getattr(self.model, 'takes_uint8', False))
+
+    def predict(self, img, return_prob=False, beamsearch=None):
+        img = self.process(img)
         img = img.to(self.config['device'])
 
-        if self.config['predictor']['beamsearch']:
-            sent = translate_beam_search(img, self.model)
-            s = sent
-            prob = None
+        if beamsearch is None:
+            beamsearch = self.config['predictor']['beamsearch']
+
+        if beamsearch:
+            s, prob = translate_beam_search(img, self.model, return_prob=True)
         else:
             s, prob = translate(img, self.model)
             s = s[0].tolist()
@@ -44,41 +60,52 @@ class Predictor():
         else:
             return s
 
-    def predict_batch(self, imgs, return_prob=False):
-        bucket = defaultdict(list)
-        bucket_idx = defaultdict(list)
-        bucket_pred = {}
-        
-        sents, probs = [0]*len(imgs), [0]*len(imgs)
+    def batches(self, imgs, padded=False):
+        """
+        preprocessed imgs grouped into batches: {key: (indices, tensors)}, one batch per exact
+        width, or per width class of PADDED_BUCKET_WIDTH px when padded
+        """
+        bucket = defaultdict(lambda: ([], []))
 
         for i, img in enumerate(imgs):
-            img = process_input(img, self.config['dataset']['image_height'], 
-                self.config['dataset']['image_min_width'], self.config['dataset']['image_max_width'])        
+            img = self.process(img)
         
-            bucket[img.shape[-1]].append(img)
-            bucket_idx[img.shape[-1]].append(i)
+            k = math.ceil(img.shape[-1] / PADDED_BUCKET_WIDTH) if padded else img.shape[-1]
+            bucket[k][0].append(i)
+            bucket[k][1].append(img)
+
+        return dict(bucket)
+
+    def predict_batch(self, imgs, return_prob=False, padded=None):
+        """
+        padded right pads the crops of a width class to its widest crop, the padding is
+        masked in the model so the outputs are the same with far fewer, larger batches.
+        Default: config['predictor']['padded_batch'], ignored for models that cannot mask padding
+        """
+        if padded is None:
+            padded = self.config['predictor'].get('padded_batch', False)
+        padded = padded and can_pad(self.model)
 
+        sents, probs = [0]*len(imgs), [0]*len(imgs)
 
-        for k, batch in bucket.items():
-            batch = torch.cat(batch, 0).to(self.device)
-            s, prob = translate(batch, self.model)
+        for idx, batch in self.batches(imgs, padded).values():
+            widths = torch.tensor([img.shape[-1] for img in batch])
+            width = int(widths.max())
+            if widths.min() == width:
+                batch = torch.cat(batch, 0).to(self.device)
+                s, prob = translate(batch, self.model)
+            else:
+                batch = torch.cat([F.pad(img, (0, width - img.shape[-1])) for img in batch], 0).to(self.device)
+                s, prob = translate(batch, self.model, widths=widths)
             prob = prob.tolist()
 
-            s = s.tolist()
             s = self.vocab.batch_decode(s)
 
-            bucket_pred[k] = (s, prob)
-
-
-        for k in bucket_pred:
-            idx = bucket_idx[k]
-            sent, prob = bucket_pred[k]
             for i, j in enumerate(idx):
-                sents[j] = sent[i]
+                sents[j] = s[i]
                 probs[j] = prob[i]
    
         if return_prob: 
             return sents, probs
         else: 
             return sents
-
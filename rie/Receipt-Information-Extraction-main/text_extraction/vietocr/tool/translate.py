@@ -5,6 +5,7 @@ from PIL import Image
 from torch.nn.functional import log_softmax, softmax
 
 from text_extraction.vietocr.model.transformerocr import VietOCR
+from text_extraction.vietocr.model.backbone.vgg import Vgg
 from text_extraction.vietocr.model.vocab import Vocab
 from text_extraction.vietocr.model.beam import Beam
 
@@ -28,7 +29,7 @@ def batch_translate_beam_search(img, model, beam_size=4, candidates=1, max_seq_l
 
     return sents
    
-def translate_beam_search(img, model, beam_size=4, candidates=1, max_seq_length=128, sos_token=1, eos_token=2):
+def translate_beam_search(img, model, beam_size=4, candidates=1, max_seq_length=128, sos_token=1, eos_token=2, return_prob=False):
     # img: 1xCxHxW
     model.eval()
     device = img.device
@@ -36,15 +37,15 @@ def translate_beam_search(img, model, beam_size=4, candidates=1, max_seq_length=
     with torch.no_grad():
         src = model.cnn(img)
         memory = model.transformer.forward_encoder(src) #TxNxE
-        sent = beamsearch(memory, model, device, beam_size, candidates, max_seq_length, sos_token, eos_token)
+        sent = beamsearch(memory, model, device, beam_size, candidates, max_seq_length, sos_token, eos_token, return_prob)
 
     return sent
         
-def beamsearch(memory, model, device, beam_size=4, candidates=1, max_seq_length=128, sos_token=1, eos_token=2):    
+def beamsearch(memory, model, device, beam_size=4, candidates=1, max_seq_length=128, sos_token=1, eos_token=2, return_prob=False):    
     # memory: Tx1xE
     model.eval()
 
-    beam = Beam(beam_size=beam_size, min_length=0, n_top=candidates, ranker=None, start_token_id=sos_token, end_token_id=eos_token)
+    beam = Beam(beam_size=beam_size, min_length=0, n_top=candidates, ranker=None, start_token_id=sos_token, end_token_id=eos_token, max_length=max_seq_length)
 
     with torch.no_grad():
 #        memory = memory.repeat(1, beam_size, 1) # TxNxE
@@ -67,17 +68,26 @@ def beamsearch(memory, model, device, beam_size=4, candidates=1, max_seq_length=
         for i, (times, k) in enumerate(ks[:candidates]):
             hypothesis = beam.get_hypothesis(times, k)
             hypothesises.append(hypothesis)
-    
-    return [1] + [int(i) for i in hypothesises[0][:-1]]
 
-def translate(img, model, max_seq_length=128, sos_token=1, eos_token=2):
-    "data: BxCXHxW"
+    sent = [1] + [int(i) for i in hypothesises[0][:-1]]
+    if return_prob:
+        # geometric mean of the per-token probabilities of the best hypothesis
+        prob = math.exp(float(scores[0]) / max(len(hypothesises[0]), 1))
+        return sent, prob
+    return sent
+
+def translate(img, model, max_seq_length=128, sos_token=1, eos_token=2, widths=None):
+    "data: BxCXHxW, right padded to the widest image when widths (B) gives the image widths"
     model.eval()
     device = img.device
 
     with torch.no_grad():
-        src = model.cnn(img)
-        memory = model.transformer.forward_encoder(src)
+        if widths is None:
+            src = model.cnn(img)
+            memory = model.transformer.forward_encoder(src)
+        else:
+            src, lengths = model.cnn(img, widths.to(device))
+            memory = model.transformer.forward_encoder(src, lengths)
 
         translated_sentence = [[sos_token]*len(img)]
         char_probs = [[1]*len(img)]
@@ -111,19 +121,32 @@ def translate(img, model, max_seq_length=128, sos_token=1, eos_token=2):
         translated_sentence = np.asarray(translated_sentence).T
         
         char_probs = np.asarray(char_probs).T
-        char_probs = np.multiply(char_probs, translated_sentence>3)
+        # tokens after the first eos depend on the rest of the batch, they do not count
+        ended = np.cumsum(translated_sentence==eos_token, axis=1) > 0
+        char_probs = np.multiply(char_probs, (translated_sentence>3) & ~ended)
         char_probs = np.sum(char_probs, axis=-1)/(char_probs>0).sum(-1)
     
     return translated_sentence, char_probs
 
 
-def build_model(config):
+def can_pad(model):
+    "whether translate can run model on right padded batches: float VGG backbone, transformer or seq2seq"
+    model = getattr(model, 'model', model)  # VietOCR wrapped by profiles.AutocastOCR
+    return (isinstance(model, VietOCR) and model.seq_modeling in ('transformer', 'seq2seq')
+            and isinstance(model.cnn.model, Vgg) and isinstance(model.cnn.model.features, torch.nn.Sequential))
+
+def build_model(config, pretrained=True):
+    """pretrained=False skips the ImageNet backbone weights, for when a full checkpoint is loaded next"""
     vocab = Vocab(config['vocab'])
     device = config['device']
+
+    cnn_args = dict(config['cnn'])
+    if not pretrained and 'pretrained' in cnn_args:
+        cnn_args['pretrained'] = False
     
     model = VietOCR(len(vocab),
             config['backbone'],
-            config['cnn'], 
+            cnn_args, 
             config['transformer'],
             config['seq_modeling'])
     
@@ -140,7 +163,8 @@ def resize(w, h, expected_height, image_min_width, image_max_width):
 
     return new_w, expected_height
 
-def process_image(image, image_height, image_min_width, image_max_width):
+def process_image(image, image_height, image_min_width, image_max_width, normalize=True):
+    "CxHxW float32 in [0, 1], or the uint8 pixels without normalize"
     img = image.convert('RGB')
 
     w, h = img.size
@@ -149,13 +173,15 @@ def process_image(image, image_height, image_min_width, image_max_width):
     img = img.resize((new_w, image_height), Image.ANTIALIAS)
 
     img = np.asarray(img).transpose(2,0, 1)
-    img = img/255
+    if normalize:
+        img = img.astype(np.float32, order='C')
+        img /= 255
     return img
 
-def process_input(image, image_height, image_min_width, image_max_width):
-    img = process_image(image, image_height, image_min_width, image_max_width)
+def process_input(image, image_height, image_min_width, image_max_width, normalize=True):
+    img = process_image(image, image_height, image_min_width, image_max_width, normalize)
     img = img[np.newaxis, ...]
-    img = torch.FloatTensor(img)
+    img = torch.from_numpy(np.ascontiguousarray(img))
     return img
 
 def predict(filename, config):
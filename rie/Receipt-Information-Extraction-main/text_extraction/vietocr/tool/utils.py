@@ -1,11 +1,9 @@
 import os
-import gdown
 import yaml
 import numpy as np
 import uuid
-import requests
 import tempfile
-from utils import download_weight
+from utils import download_weight, load_weights
 
 def download_weights(uri, cached=None, md5=None, quiet=False):
     if uri.startswith('http'):
@@ -13,9 +11,20 @@ def download_weights(uri, cached=None, md5=None, quiet=False):
     return uri
 
 def download_config(id):
-    url = 'https://raw.githubusercontent.com/pbcquoc/vietocr/master/config/{}'.format(id)
-    r = requests.get(url)
-    config = yaml.safe_load(r.text)
+    # kept next to the weights after the first download, so later starts work offline
+    path = os.path.join('weights', 'config', id)
+    if not os.path.exists(path):
+        import requests
+
+        url = 'https://raw.githubusercontent.com/pbcquoc/vietocr/master/config/{}'.format(id)
+        r = requests.get(url)
+        r.raise_for_status()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(r.text)
+
+    with open(path, encoding='utf-8') as f:
+        config = yaml.safe_load(f)
     return config
 
 def compute_accuracy(ground_truth, predictions, mode='full_sequence'):
@@ -1,12 +1,15 @@
 import os
+import sys
 from time import time
 import datetime
 import numpy as np
-from skimage import io
-import cv2
 import yaml
+from collections import namedtuple
 from functools import wraps
-import requests
+
+
+# Cores of the run, pool workers and intra-op threads per worker
+Layout = namedtuple("Layout", ["cores", "workers", "threads"])
 
 
 class Progress:
@@ -77,7 +80,11 @@ class Progress:
 
 def crop_background(image, grayscale=False):
     """Crop black background only"""
+    import cv2
+
     if not type(image).__module__ == np.__name__:
+        from skimage import io
+
         img_arr = io.imread(image, True)
     else:
         img_arr = image
@@ -88,6 +95,56 @@ def crop_background(image, grayscale=False):
     return output
 
 
+def crop_box(image, box):
+    """Crop the axis-aligned rectangle around a detected text box (4 corner points)"""
+    x1 = int(box[0][0] if (box[0][0] < box[3][0]) else box[3][0])
+    y1 = int(box[0][1] if (box[0][1] < box[1][1]) else box[1][1])
+    x2 = int(box[2][0] if (box[2][0] > box[1][0]) else box[1][0])
+    y2 = int(box[2][1] if (box[2][1] > box[3][1]) else box[3][1])
+    return image.copy()[y1:y2, x1:x2]
+
+
+def plan_parallelism(budget=-1, workers=-1):
+    """
+    Split a core budget between pool workers and the thread pools inside each of them
+
+    budget: cores the whole run may use, -1 for every core this process may run on
+    workers: pool processes, -1 for 80% of the budget, 0 or 1 for no pool
+    """
+    if hasattr(os, "sched_getaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count() or 1))
+    cores = available if budget <= 0 else available[:budget]
+    if workers == -1:
+        workers = int(len(cores) * 0.8)  # 80% for safety
+    workers = min(max(workers, 1), len(cores))
+    return Layout(cores, workers, max(len(cores) // workers, 1))
+
+
+def limit_threads(threads):
+    """Cap the intra-op threads of torch, OpenCV, onnxruntime (rembg) and BLAS in this process"""
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)  # read by the libraries loaded from now on
+    try:  # BLAS already loaded by numpy
+        from threadpoolctl import threadpool_limits
+
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+    import cv2
+
+    cv2.setNumThreads(threads)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+
+def pin_cores(cores):
+    """Restrict this process to the given cores, where the OS supports it (Linux)"""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+
 def load_config(config_name, args=None):
     """Load config file"""
     with open("config.yaml") as f:
@@ -129,6 +186,8 @@ def download_weight(model_name, url=False):
     weight_path = f"weights/{model_name}"
     if os.path.exists(weight_path):
         return weight_path
+    import requests
+
     print(f"Weight '{model_name}' not found, requesting...", end="\r")
     with requests.get(url, stream=True) as r:
         r.raise_for_status()
@@ -140,3 +199,13 @@ def download_weight(model_name, url=False):
             for chunk in Progress(r.iter_content(chunk_size=1000)):
                 f.write(chunk)
     return weight_path
+
+
+def load_weights(path, map_location=None):
+    """Load a checkpoint with torch.load, memory-mapped when torch and the file format allow it"""
+    import torch
+
+    try:
+        return torch.load(path, map_location=map_location, mmap=True)
+    except (TypeError, RuntimeError):  # torch < 2.1, or a checkpoint in the legacy format
+        return torch.load(path, map_location=map_location)
@@ -0,0 +1,161 @@
+import heapq
+from collections import namedtuple
+from typing import Dict, Any, Iterable, List, Mapping, Tuple
+
+from money import to_cents
+
+
+# One payment settling (part of) a debt
+Transfer = namedtuple("Transfer", ["debtor", "creditor", "amount"])
+
+# Groups up to this many unsettled participants are solved exactly
+EXACT_LIMIT = 12
+
+
+def net_balances(
+    payments: Iterable[Tuple[str, float]], splits: Iterable[Mapping[str, float]]
+) -> Dict[str, int]:
+    """
+    Net balance of every participant in cents: what they paid minus what they owe.
+
+    Args:
+        payments (Iterable): (payer, amount) records, e.g. one per receipt.
+        splits (Iterable): Participant to amount owed, one mapping per receipt.
+
+    Returns:
+        dict: Participant to balance in cents; positive balances are owed money.
+    """
+    balances: Dict[str, int] = {}
+    for payer, amount in payments:
+        balances[payer] = balances.get(payer, 0) + to_cents(amount)
+    for split in splits:
+        for participant, owed in split.items():
+            balances[participant] = balances.get(participant, 0) - to_cents(owed)
+    return balances
+
+
+def _greedy(balances: Dict[str, int]) -> List[Tuple[str, str, int]]:
+    """Repeatedly match the largest debtor with the largest creditor using two max-heaps."""
+    debtors = [(b, p) for p, b in balances.items() if b < 0]  # Negated: max-heap
+    creditors = [(-b, p) for p, b in balances.items() if b > 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+    transfers = []
+    while debtors and creditors:
+        debt, debtor = heapq.heappop(debtors)
+        credit, creditor = heapq.heappop(creditors)
+        amount = min(-debt, -credit)
+        transfers.append((debtor, creditor, amount))
+        if debt + amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+        if credit + amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+    return transfers
+
+
+def _exact(balances: Dict[str, int]) -> List[Tuple[str, str, int]]:
+    """
+    Minimum number of transfers: split the participants into as many zero-sum groups
+    as possible (a group of k settles in k - 1 transfers), found by a DP over subsets.
+    """
+    people = list(balances)
+    values = [balances[p] for p in people]
+    n = len(people)
+    full = (1 << n) - 1
+    totals = [0] * (full + 1)
+    best = [0] * (full + 1)  # Most zero-sum groups a subset can be ordered into
+    for mask in range(1, full + 1):
+        low = mask & -mask
+        totals[mask] = totals[mask ^ low] + values[low.bit_length() - 1]
+        bonus = totals[mask] == 0
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            rest ^= bit
+            if best[mask ^ bit] + bonus > best[mask]:
+                best[mask] = best[mask ^ bit] + bonus
+
+    # Walk back from the full set; every zero-sum subset on the path closes a group
+    transfers = []
+    mask, group_end = full, full
+    while mask:
+        bonus = totals[mask] == 0
+        rest = mask
+        while rest:
+            bit = rest & -rest
+            rest ^= bit
+            if best[mask ^ bit] + bonus == best[mask]:
+                mask ^= bit
+                break
+        if totals[mask] == 0:
+            group = group_end ^ mask
+            transfers.extend(
+                _greedy({people[i]: values[i] for i in range(n) if group >> i & 1})
+            )
+            group_end = mask
+    return transfers
+
+
+def settle(
+    balances: Mapping[str, int], exact_limit: int = EXACT_LIMIT
+) -> List[Transfer]:
+    """
+    Compute transfers that settle all balances.
+
+    Small groups get the exact minimum number of transfers; larger groups use the
+    greedy heap matcher, which needs at most one transfer fewer than the number of
+    unsettled participants.
+
+    Args:
+        balances (Mapping): Participant to balance in cents, summing to zero.
+        exact_limit (int): Largest number of unsettled participants solved exactly.
+
+    Returns:
+        list: Transfers with amounts in dollars, largest first.
+    """
+    open_balances = {p: b for p, b in balances.items() if b}
+    if sum(open_balances.values()):
+        raise ValueError("Balances do not sum to zero")
+    if len(open_balances) <= exact_limit:
+        transfers = _exact(open_balances)
+    else:
+        transfers = _greedy(open_balances)
+    transfers.sort(key=lambda t: -t[2])
+    return [Transfer(d, c, cents / 100) for d, c, cents in transfers]
+
+
+def settle_receipts(
+    payments: Iterable[Tuple[str, float]],
+    splits: Iterable[Mapping[str, float]],
+    exact_limit: int = EXACT_LIMIT,
+) -> List[Transfer]:
+    """
+    Compute who pays whom from payer records and per-receipt splits.
+
+    Rounding each record to cents can leave up to one cent per record unbalanced;
+    that residue is absorbed by the participant with the largest balance so the
+    transfers always add up.
+
+    Args:
+        payments (Iterable): (payer, amount) records.
+        splits (Iterable): Participant to amount owed, one mapping per receipt.
+        exact_limit (int): Largest number of unsettled participants solved exactly.
+
+    Returns:
+        list: The transfers.
+
+    Raises:
+        ValueError: If payments and splits differ by more than the rounding residue,
+            e.g. a missing payment or a split that does not add up to its receipt.
+    """
+    payments, splits = list(payments), list(splits)
+    balances = net_balances(payments, splits)
+    residue = sum(balances.values())
+    if abs(residue) > len(payments) + len(splits):
+        raise ValueError(
+            f"Payments and splits differ by {residue / 100:.2f}, more than rounding"
+        )
+    if residue and balances:
+        largest = max(balances, key=lambda p: abs(balances[p]))
+        balances[largest] -= residue
+    return settle(balances, exact_limit)
@@ -0,0 +1,678 @@
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from money import CENTS_DTYPE, allocate, from_cents, to_cents_array
+
+
+EXCLUDED = "excluded"
+DEFAULT_CATEGORY = "Groceries (non-taxable)"
+
+
+def _row_weights(assignment: Any) -> Dict[str, float]:
+    """
+    Normalize one item's assignment into participant weights.
+
+    Args:
+        assignment: A list of participants (equal shares), a dict of participant to
+            weight, or "excluded".
+
+    Returns:
+        dict: Participant weights, empty if the item is excluded or unassigned.
+    """
+    if not assignment or assignment == EXCLUDED:
+        return {}
+    if isinstance(assignment, dict):
+        return {p: float(w) for p, w in assignment.items() if w}
+    weights: Dict[str, float] = {}
+    for participant in assignment:
+        weights[participant] = weights.get(participant, 0.0) + 1.0
+    return weights
+
+
+def assignment_matrix(
+    item_names: Sequence[str],
+    item_assignments: Dict[str, Any],
+    participants: Optional[List[str]] = None,
+    sparse: bool = False,
+) -> Tuple[Any, List[str]]:
+    """
+    Build the item x participant weight matrix from per-item assignments.
+
+    Assignments are looked up by item name, so repeated names share one assignment.
+    Only the distinct names are visited in Python; rows are gathered with numpy.
+
+    Args:
+        item_names (Sequence[str]): Name of every item row.
+        item_assignments (dict): Item name to participants, participant weights or
+            "excluded".
+        participants (list): Column order; participants are added in order of first
+            appearance when None.
+        sparse (bool): Return a scipy.sparse CSR matrix instead of a dense array.
+
+    Returns:
+        tuple: The weight matrix and the participant list of its columns.
+    """
+    names = list(dict.fromkeys(item_names))  # Distinct names, first-appearance order
+    fixed = participants is not None
+    participants = list(participants) if fixed else []
+    column = {p: j for j, p in enumerate(participants)}
+
+    name_rows = []
+    for name in names:
+        row = _row_weights(item_assignments.get(name))
+        for participant in row:
+            if participant not in column:
+                if fixed:
+                    raise KeyError(f"Unknown participant '{participant}' for '{name}'")
+                column[participant] = len(participants)
+                participants.append(participant)
+        name_rows.append(row)
+
+    per_name = np.zeros((len(names), len(participants)))
+    for i, row in enumerate(name_rows):
+        for participant, weight in row.items():
+            per_name[i, column[participant]] = weight
+
+    index = {name: i for i, name in enumerate(names)}
+    rows = np.fromiter(
+        (index[name] for name in item_names), dtype=np.intp, count=len(item_names)
+    )
+    matrix = per_name[rows]
+    if sparse:
+        from scipy import sparse as sp
+
+        matrix = sp.csr_matrix(matrix)
+    return matrix, participants
+
+
+def _scaled_amounts(amounts, weights, included) -> np.ndarray:
+    """Divide each item's amount by its total weight, zeroing excluded and unassigned items."""
+    amounts = np.asarray(amounts, dtype=np.float64)
+    row_sums = np.asarray(weights.sum(axis=1), dtype=np.float64).ravel()
+    mask = row_sums > 0
+    if included is not None:
+        mask &= np.asarray(included, dtype=bool)
+    scaled = np.zeros_like(amounts)
+    np.divide(amounts, row_sums, out=scaled, where=mask)
+    return scaled
+
+
+def split_totals(amounts, weights, included=None) -> np.ndarray:
+    """
+    Compute per-participant totals with one matrix product.
+
+    Each item's amount is shared in proportion to its row of weights.
+
+    Args:
+        amounts: Amount of every item (price x quantity), shape (n_items,).
+        weights: Dense array or scipy.sparse matrix, shape (n_items, n_participants).
+        included: Optional boolean mask of items taking part in the split.
+
+    Returns:
+        numpy.ndarray: Total owed by each participant, shape (n_participants,).
+    """
+    scaled = _scaled_amounts(amounts, weights, included)
+    return np.asarray(weights.T @ scaled).ravel()
+
+
+def batch_split_totals(
+    amounts, weights, receipt_index, n_receipts: Optional[int] = None, included=None
+) -> np.ndarray:
+    """
+    Compute per-receipt, per-participant totals for many receipts at once.
+
+    Items of all receipts are stacked into one matrix sharing the participant columns;
+    receipt_index says which receipt each item row belongs to.
+
+    Args:
+        amounts: Amount of every item, shape (n_items,).
+        weights: Dense array or scipy.sparse matrix, shape (n_items, n_participants).
+        receipt_index: Receipt number (0-based) of every item, shape (n_items,).
+        n_receipts (int): Number of receipts, inferred from receipt_index when None.
+        included: Optional boolean mask of items taking part in the split.
+
+    Returns:
+        numpy.ndarray: Totals, shape (n_receipts, n_participants).
+    """
+    receipt_index = np.asarray(receipt_index, dtype=np.intp)
+    if n_receipts is None:
+        n_receipts = int(receipt_index.max()) + 1 if receipt_index.size else 0
+    scaled = _scaled_amounts(amounts, weights, included)
+
+    if hasattr(weights, "tocsr"):  # scipy.sparse: receipt x item selector times weights
+        from scipy import sparse as sp
+
+        selector = sp.csr_matrix(
+            (scaled, (receipt_index, np.arange(receipt_index.size))),
+            shape=(n_receipts, receipt_index.size),
+        )
+        return (selector @ weights.tocsr()).toarray()
+
+    totals = np.zeros((n_receipts, weights.shape[1]))
+    np.add.at(totals, receipt_index, weights * scaled[:, None])
+    return totals
+
+
+def split_totals_cents(amounts, weights, included=None) -> np.ndarray:
+    """
+    Compute exact per-participant totals in integer cents.
+
+    Each item is allocated with money.allocate, so the shares of an item add up to
+    its amount and the participant totals add up to the split items' total.
+
+    Args:
+        amounts: Amount of every item in cents, shape (n_items,).
+        weights: Dense array or scipy.sparse matrix, shape (n_items, n_participants).
+        included: Optional boolean mask of items taking part in the split.
+
+    Returns:
+        numpy.ndarray: int64 total owed by each participant, shape (n_participants,).
+    """
+    if hasattr(weights, "toarray"):
+        weights = weights.toarray()
+    amounts = np.asarray(amounts, dtype=CENTS_DTYPE)
+    if included is not None:
+        amounts = np.where(np.asarray(included, dtype=bool), amounts, 0)
+    return allocate(amounts, weights).sum(axis=0)
+
+
+def item_cents(df) -> np.ndarray:
+    """
+    Amount of every item row (price x quantity) in integer cents.
+
+    Args:
+        df (pandas.DataFrame): Itemized receipt.
+
+    Returns:
+        numpy.ndarray: int64 amounts in cents.
+    """
+    quantities = np.rint(df["Quantity"].to_numpy(dtype=np.float64)).astype(CENTS_DTYPE)
+    return to_cents_array(df["Price"].to_numpy(dtype=np.float64)) * quantities
+
+
+def split_dataframe(df, item_assignments: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Split a receipt DataFrame ('Item Name', 'Price', 'Quantity' columns).
+
+    Amounts are split in integer cents, so the participant totals reconcile with
+    the receipt total of the split items.
+
+    Args:
+        df (pandas.DataFrame): Itemized receipt.
+        item_assignments (dict): Item name to participants, participant weights or
+            "excluded".
+
+    Returns:
+        dict: Participant to total owed, for every participant assigned an item.
+    """
+    # Rows sharing a name share one assignment, so allocate each name's total once
+    amounts = amounts_by_name(df)
+    weights, participants = assignment_matrix(list(amounts), item_assignments)
+    # Leftover cents are handed out by column, so fix the column order by name
+    order = sorted(range(len(participants)), key=participants.__getitem__)
+    cents = np.fromiter(amounts.values(), dtype=CENTS_DTYPE, count=len(amounts))
+    totals = split_totals_cents(cents, weights[:, order])
+    return {participants[j]: from_cents(t) for j, t in zip(order, totals.tolist())}
+
+
+def amounts_by_name(df) -> Dict[str, int]:
+    """
+    Total amount (price x quantity) of every distinct item name, in receipt order.
+
+    Args:
+        df (pandas.DataFrame): Itemized receipt.
+
+    Returns:
+        dict: Item name to amount in cents.
+    """
+    cents = df[["Item Name"]].assign(cents=item_cents(df))
+    amounts = cents.groupby("Item Name", sort=False)["cents"].sum()
+    return {name: int(cents) for name, cents in amounts.items()}
+
+
+class SplitLedger:
+    """
+    Per-participant totals kept up to date one assignment change at a time.
+
+    Changing an item's assignment only touches the participants of its old and new
+    assignment, instead of re-splitting the whole receipt. Totals are kept in
+    integer cents and items are allocated like split_dataframe does, so both agree
+    to the cent.
+
+    Args:
+        amounts (dict): Item name to amount in cents, as returned by amounts_by_name.
+    """
+
+    def __init__(self, amounts: Dict[str, int]):
+        self.amounts = dict(amounts)
+        self.assignments: Dict[str, Any] = {}
+        self.totals: Dict[str, int] = {}  # Participant -> cents owed
+        self._counts: Dict[str, int] = {}  # Number of items assigned to each participant
+
+    def assign(self, item_name: str, assignment: Any) -> None:
+        """
+        Set an item's assignment and update the affected totals.
+
+        Args:
+            item_name (str): The item.
+            assignment: Participants, participant weights or "excluded".
+        """
+        self._apply(item_name, self.assignments.get(item_name), -1)
+        self.assignments[item_name] = assignment
+        self._apply(item_name, assignment, 1)
+
+    def _apply(self, item_name: str, assignment: Any, sign: int) -> None:
+        weights = _row_weights(assignment)
+        if not sum(weights.values()):
+            return
+        participants = sorted(weights)
+        shares = allocate(
+            self.amounts.get(item_name, 0), [weights[p] for p in participants]
+        )
+        for participant, share in zip(participants, shares.tolist()):
+            count = self._counts.get(participant, 0) + sign
+            if count:
+                self._counts[participant] = count
+                self.totals[participant] = self.totals.get(participant, 0) + sign * share
+            else:  # Last item of this participant removed
+                del self._counts[participant]
+                del self.totals[participant]
+
+    def splits(self) -> Dict[str, float]:
+        """
+        Returns:
+            dict: Participant to total owed in dollars, for every participant assigned
+                an item.
+        """
+        return {p: from_cents(t) for p, t in self.totals.items()}
+
+
+class SessionLedger:
+    """
+    Aggregated totals over many receipts, each with its own SplitLedger.
+
+    An assignment change re-applies only the affected participants' deltas of that
+    one receipt to the session totals, so editing one receipt never re-splits the
+    others.
+    """
+
+    def __init__(self):
+        self.receipts: Dict[str, SplitLedger] = {}
+        self.totals: Dict[str, int] = {}  # Participant -> cents owed
+        self._counts: Dict[str, int] = {}  # Number of receipts each participant owes on
+
+    def add_receipt(self, receipt_id: str, amounts: Dict[str, int]) -> SplitLedger:
+        """
+        Add a receipt with no assignments yet, replacing any receipt with the same id.
+
+        Args:
+            receipt_id (str): Unique identifier of the receipt, e.g. its file path.
+            amounts (dict): Item name to amount in cents, as returned by amounts_by_name.
+
+        Returns:
+            SplitLedger: The receipt's ledger.
+        """
+        self.remove_receipt(receipt_id)
+        ledger = SplitLedger(amounts)
+        self.receipts[receipt_id] = ledger
+        return ledger
+
+    def remove_receipt(self, receipt_id: str) -> None:
+        """Remove a receipt and its share of the session totals."""
+        ledger = self.receipts.pop(receipt_id, None)
+        if ledger is not None:
+            self._update(ledger.totals, {})
+
+    def assign(self, receipt_id: str, item_name: str, assignment: Any) -> None:
+        """
+        Set an item's assignment on one receipt and update the affected session totals.
+
+        Args:
+            receipt_id (str): The receipt.
+            item_name (str): The item.
+            assignment: Participants, participant weights or "excluded".
+        """
+        ledger = self.receipts[receipt_id]
+        affected = set(_row_weights(ledger.assignments.get(item_name)))
+        affected.update(_row_weights(assignment))
+        before = {p: ledger.totals[p] for p in affected if p in ledger.totals}
+        ledger.assign(item_name, assignment)
+        after = {p: ledger.totals[p] for p in affected if p in ledger.totals}
+        self._update(before, after)
+
+    def _update(self, before: Dict[str, int], after: Dict[str, int]) -> None:
+        for participant in before.keys() | after.keys():
+            if participant not in before:
+                self._counts[participant] = self._counts.get(participant, 0) + 1
+            elif participant not in after:
+                self._counts[participant] -= 1
+                if not self._counts[participant]:  # Not on any receipt any more
+                    del self._counts[participant]
+                    del self.totals[participant]
+                    continue
+            delta = after.get(participant, 0) - before.get(participant, 0)
+            self.totals[participant] = self.totals.get(participant, 0) + delta
+
+    def receipt_splits(self, receipt_id: str) -> Dict[str, float]:
+        """
+        Returns:
+            dict: Participant to total owed on one receipt.
+        """
+        return self.receipts[receipt_id].splits()
+
+    def splits(self) -> Dict[str, float]:
+        """
+        Returns:
+            dict: Participant to total owed in dollars across all receipts of the session.
+        """
+        return {p: from_cents(t) for p, t in self.totals.items()}
+
+
+# --- Itemized bills with categories, tax and discount ---
+@dataclass
+class BillItem:
+    """
+    One item of a bill as entered in the bill splitter GUIs.
+
+    Attributes:
+        name (str): Item name.
+        price (float): Unit price in dollars.
+        quantity (int): Number of units bought.
+        category (str): Category the tax rate was taken from.
+        tax_rate (float): Tax rate in percent, 0 for non-taxable items.
+        split_quantities (dict): Participant to number of units they take.
+    """
+
+    name: str
+    price: float
+    quantity: int
+    category: str = DEFAULT_CATEGORY
+    tax_rate: float = 0.0
+    split_quantities: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class BillSummary:
+    """
+    Result of calculate_bill, amounts in dollars.
+
+    Attributes:
+        totals (dict): Participant to "total_before_tax", "taxable", "tax" and
+            "total_owed".
+        total_before_discount (float): Sum of all items before discount and tax.
+        taxable (float): Discounted taxable amount taken by participants.
+        non_taxable (float): Non-taxable amount taken by participants.
+        tax (float): Tax taken by participants.
+        total_after_discount (float): Sum of everything the participants owe.
+    """
+
+    totals: Dict[str, Dict[str, float]]
+    total_before_discount: float
+    taxable: float
+    non_taxable: float
+    tax: float
+    total_after_discount: float
+
+
+def resolve_split_quantities(
+    item_name: str,
+    quantity: float,
+    responsible_people: Sequence[str],
+    entered: Dict[str, Any],
+) -> Dict[str, float]:
+    """
+    Turn the per-person quantities typed in the GUI into a full split.
+
+    People with no quantity share the units left over equally.
+
+    Args:
+        item_name (str): Item name, for error messages.
+        quantity (float): Number of units of the item.
+        responsible_people (Sequence[str]): Participants sharing the item.
+        entered (dict): Participant to the quantity entered (str or number); blank or
+            missing entries take an equal share of the rest.
+
+    Returns:
+        dict: Participant to number of units.
+
+    Raises:
+        ValueError: If a quantity is invalid or the quantities exceed the item's.
+    """
+    split_data: Dict[str, float] = {}
+    unspecified = []
+    specified = 0.0
+    for person in responsible_people:
+        qty = entered.get(person)
+        if isinstance(qty, str):
+            qty = qty.strip()
+        if qty is None or qty == "":
+            unspecified.append(person)
+            continue
+        try:
+            qty = float(qty)
+        except ValueError:
+            qty = -1.0
+        if qty < 0:
+            raise ValueError(
+                f"Please enter a valid non-negative quantity for {person} in item '{item_name}'."
+            )
+        split_data[person] = qty
+        specified += qty
+
+    remaining = quantity - specified
+    if remaining < 0:
+        raise ValueError(
+            f"The total specified quantities for item '{item_name}' exceed the total quantity."
+        )
+    for person in unspecified:
+        split_data[person] = remaining / len(unspecified)
+    return split_data
+
+
+def calculate_bill(
+    items: Sequence[BillItem], participants: Sequence[str] = (), discount: float = 0.0
+) -> BillSummary:
+    """
+    Split an itemized bill with tax and discount among participants.
+
+    The discount applies to taxable items only and tax is charged on the discounted
+    amount. Each person pays for the units they take; units nobody takes are left
+    out of the participants' totals. All amounts are computed in integer cents with
+    one vectorized allocation per column of the breakdown, so every item's shares
+    add up exactly.
+
+    Args:
+        items (Sequence[BillItem]): The bill.
+        participants (Sequence[str]): Participants listed even if they take nothing.
+        discount (float): Discount as a fraction, 0 <= discount < 1.
+
+    Returns:
+        BillSummary: Per-participant breakdown and aggregate amounts.
+
+    Raises:
+        ValueError: If the discount is out of range.
+    """
+    if not 0 <= discount < 1:
+        raise ValueError("Please enter a valid discount value between 0 and 100.")
+
+    people = list(dict.fromkeys(participants))
+    for item in items:
+        for person in item.split_quantities:
+            if person not in people:
+                people.append(person)
+
+    amounts, shares, tax_shares, taxable = _allocate_bill(items, people, discount)
+    before_tax = shares.sum(axis=0)
+    return _bill_summary(
+        people,
+        before_tax.tolist(),
+        shares[taxable].sum(axis=0).tolist(),
+        tax_shares.sum(axis=0).tolist(),
+        int(amounts.sum()),
+    )
+
+
+def _allocate_bill(items: Sequence[BillItem], people: List[str], discount: float):
+    """
+    Allocate every item's discounted amount and tax among people in cents.
+
+    Returns:
+        tuple: Item amounts before discount, pre-tax shares and tax shares
+        (item x person) and the mask of taxable items.
+    """
+    # Leftover cents are handed out by column, so allocate in name order
+    column = {p: j for j, p in enumerate(sorted(people))}
+    # One extra column holds the units nobody takes
+    weights = np.zeros((len(items), len(people) + 1))
+    for i, item in enumerate(items):
+        for person, qty in item.split_quantities.items():
+            weights[i, column[person]] = qty
+        weights[i, -1] = max(item.quantity - sum(item.split_quantities.values()), 0)
+
+    quantities = np.array([item.quantity for item in items], dtype=CENTS_DTYPE)
+    tax_rates = np.array([item.tax_rate for item in items], dtype=np.float64)
+    amounts = to_cents_array([item.price for item in items]) * quantities
+    taxable = tax_rates > 0
+    discounted = np.where(
+        taxable, np.rint(amounts * (1 - discount)).astype(CENTS_DTYPE), amounts
+    )
+    tax = np.rint(discounted * tax_rates / 100).astype(CENTS_DTYPE)
+    order = [column[p] for p in people]  # Back to the order of people
+    shares = allocate(discounted, weights)[:, order]
+    tax_shares = allocate(tax, weights)[:, order]
+    return amounts, shares, tax_shares, taxable
+
+
+def _bill_summary(people, before_tax, taxable, tax, amount_total) -> BillSummary:
+    """Build a BillSummary from per-person cents (lists aligned with people)."""
+    owed = [b + t for b, t in zip(before_tax, tax)]
+    totals = {
+        person: {
+            "total_before_tax": from_cents(before_tax[j]),
+            "taxable": from_cents(taxable[j]),
+            "tax": from_cents(tax[j]),
+            "total_owed": from_cents(owed[j]),
+        }
+        for j, person in enumerate(people)
+    }
+    return BillSummary(
+        totals=totals,
+        total_before_discount=from_cents(amount_total),
+        taxable=from_cents(sum(taxable)),
+        non_taxable=from_cents(sum(before_tax) - sum(taxable)),
+        tax=from_cents(sum(tax)),
+        total_after_discount=from_cents(sum(owed)),
+    )
+
+
+class BillLedger:
+    """
+    calculate_bill kept up to date one item at a time.
+
+    Adding, editing or removing an item only re-allocates that item; changing the
+    discount only re-allocates the taxable items, the only ones it applies to.
+    summary() then reads the running per-person and aggregate totals without a
+    pass over the items, and matches calculate_bill to the cent.
+
+    Args:
+        discount (float): Discount as a fraction, 0 <= discount < 1.
+    """
+
+    def __init__(self, discount: float = 0.0):
+        if not 0 <= discount < 1:
+            raise ValueError("Please enter a valid discount value between 0 and 100.")
+        self.discount = discount
+        self.items: Dict[str, BillItem] = {}
+        self.totals: Dict[str, List[int]] = {}  # Person -> [before tax, taxable, tax]
+        self.total_before_discount = 0  # Cents
+        self._shares: Dict[str, Tuple[int, Dict[str, Tuple[int, int, int]]]] = {}
+        self._counts: Dict[str, int] = {}  # Number of items each person takes part in
+
+    def set_item(self, item_id: str, item: Optional[BillItem]) -> None:
+        """
+        Add, replace or (with item None) remove one item.
+
+        Args:
+            item_id (str): Unique identifier of the item.
+            item (BillItem): The new item, or None to remove it.
+        """
+        if item_id in self.items:
+            self._apply(item_id, -1)
+            del self.items[item_id]
+        if item is not None:
+            self.items[item_id] = item
+            self._apply(item_id, 1)
+
+    def set_discount(self, discount: float) -> None:
+        """
+        Change the discount, re-allocating the taxable items only.
+
+        Args:
+            discount (float): Discount as a fraction, 0 <= discount < 1.
+
+        Raises:
+            ValueError: If the discount is out of range.
+        """
+        if not 0 <= discount < 1:
+            raise ValueError("Please enter a valid discount value between 0 and 100.")
+        if discount == self.discount:
+            return
+        taxable = [i for i, item in self.items.items() if item.tax_rate > 0]
+        for item_id in taxable:
+            self._apply(item_id, -1)
+        self.discount = discount
+        for item_id in taxable:
+            self._apply(item_id, 1)
+
+    def _apply(self, item_id: str, sign: int) -> None:
+        if sign > 0:
+            item = self.items[item_id]
+            people = list(item.split_quantities)
+            amounts, shares, tax_shares, taxable = _allocate_bill(
+                [item], people, self.discount
+            )
+            item_shares = {
+                person: (
+                    int(shares[0, j]),
+                    int(shares[0, j]) if taxable[0] else 0,
+                    int(tax_shares[0, j]),
+                )
+                for j, person in enumerate(people)
+            }
+            self._shares[item_id] = (int(amounts[0]), item_shares)
+        amount, item_shares = self._shares[item_id]
+        if sign < 0:
+            del self._shares[item_id]
+        self.total_before_discount += sign * amount
+
+        for person, values in item_shares.items():
+            count = self._counts.get(person, 0) + sign
+            if not count:  # Last item of this person removed
+                del self._counts[person]
+                del self.totals[person]
+                continue
+            self._counts[person] = count
+            totals = self.totals.setdefault(person, [0, 0, 0])
+            for k, value in enumerate(values):
+                totals[k] += sign * value
+
+    def summary(self, participants: Sequence[str] = ()) -> BillSummary:
+        """
+        Args:
+            participants (Sequence[str]): Participants listed even if they take nothing.
+
+        Returns:
+            BillSummary: Per-participant breakdown and aggregate amounts.
+        """
+        people = list(dict.fromkeys(participants))
+        people.extend(p for p in self.totals if p not in people)
+        rows = [self.totals.get(p, (0, 0, 0)) for p in people]
+        return _bill_summary(
+            people,
+            [r[0] for r in rows],
+            [r[1] for r in rows],
+            [r[2] for r in rows],
+            self.total_before_discount,
+        )
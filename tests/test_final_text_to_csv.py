@@ -0,0 +1,192 @@
+import glob
+import os
+import re
+
+import pytest
+
+import receipt_templates
+from final_text_to_csv import (
+    iter_receipt_events,
+    parse_aldi_receipt,
+    parse_receipt_files,
+    parse_receipt_lines,
+)
+from receipt_templates import (
+    StoreTemplate,
+    detect_template,
+    get_template,
+    is_store_header,
+    register_template,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# OCR outputs checked into the repository
+SAMPLES = sorted(
+    glob.glob(os.path.join(ROOT, "aldi template tester", "*.txt"))
+    + glob.glob(os.path.join(ROOT, "results", "*", "*.txt"))
+    + glob.glob(os.path.join(ROOT, "rie", "*", "result", "*.txt"))
+)
+
+
+def legacy_parse_fields(line):
+    fields = [field.strip() for field in line.split("|") if field.strip()]
+    if len(fields) >= 3:
+        try:
+            price = float(fields[-2])
+            tax_class = fields[-1].upper()
+            item_name = " ".join(fields[:-2])
+            return {"name": item_name, "price": price, "tax_class": tax_class}
+        except ValueError:
+            return {}
+    return {}
+
+
+def legacy_parse_aldi_receipt(text):
+    """The whole-text parser final_text_to_csv.py had before streaming."""
+    text = re.sub(r"\s{2,}", " ", text).strip()
+    items, subtotal, total = [], 0.0, 0.0
+    temp_buffer = ""
+    for line in text.split("\n"):
+        if "|" in line:
+            if temp_buffer:
+                line = temp_buffer + " " + line
+                temp_buffer = ""
+            parsed_item = legacy_parse_fields(line)
+            if parsed_item:
+                items.append(parsed_item)
+            else:
+                temp_buffer = line
+        else:
+            temp_buffer += " " + line
+        if "SUBTOTAL" in line.upper():
+            match = re.search(r"SUBTOTAL[\s|]+([\d\.]+)", line, re.IGNORECASE)
+            if match:
+                subtotal = float(match.group(1))
+        elif "TOTAL" in line.upper():
+            match = re.search(r"TOTAL[\s|]+\$?([\d\.]+)", line, re.IGNORECASE)
+            if match:
+                total = float(match.group(1))
+    if temp_buffer:
+        parsed_item = legacy_parse_fields(temp_buffer)
+        if parsed_item:
+            items.append(parsed_item)
+    return {"items": items, "subtotal": subtotal, "total": total}
+
+
+def as_legacy(parsed):
+    """Drop the fields the legacy parser did not have."""
+    items = [{k: v for k, v in item.items() if k != "line"} for item in parsed["items"]]
+    return {"items": items, "subtotal": parsed["subtotal"], "total": parsed["total"]}
+
+
+def read_sample(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        return file.read()
+
+
+def test_samples_found():
+    assert SAMPLES
+
+
+@pytest.mark.parametrize("path", SAMPLES, ids=os.path.basename)
+def test_stream_matches_legacy_parser(path):
+    text = read_sample(path)
+    assert as_legacy(parse_aldi_receipt(text)) == legacy_parse_aldi_receipt(text)
+
+
+def test_items_are_yielded_as_lines_arrive():
+    read = []
+
+    def lines():
+        for line in ["BREAD | 2.49 | F", "MILK | 3.10 | F", "TOTAL | 5.59"]:
+            read.append(line)
+            yield line
+
+    events = iter_receipt_events(lines(), get_template("Aldi"))
+    assert next(events) == ("store", "Aldi")
+    assert next(events) == (
+        "item",
+        {"name": "BREAD", "price": 2.49, "tax_class": "F", "line": 1},
+    )
+    assert len(read) == 1
+    assert list(events)[-1] == ("total", 5.59)
+
+
+def test_wrapped_items_and_blank_lines():
+    parsed = parse_receipt_lines(
+        ["ORGANIC", "", "BANANAS | 1.29 | f", "SUBTOTAL | 1.29"], get_template()
+    )
+    assert parsed["items"] == [
+        {"name": "ORGANIC BANANAS", "price": 1.29, "tax_class": "F", "line": 3}
+    ]
+    assert parsed["subtotal"] == 1.29
+
+
+def test_unparsable_total_is_ignored():
+    parsed = parse_receipt_lines(["EGGS | 4.00 | F", "TOTAL | 12.34."], get_template())
+    assert parsed["total"] == 0.0
+    assert get_template().match_totals("TOTAL | 12.34.") is None
+
+
+def test_parse_receipt_files_skips_bad_files(tmp_path):
+    good = tmp_path / "good.txt"
+    good.write_text("EGGS | 4.00 | F\nTOTAL | 4.00\n", encoding="utf-8")
+    paths = [str(tmp_path / "missing.txt"), str(good)]
+    parsed = list(parse_receipt_files(paths))
+    assert [path for path, _ in parsed] == [str(good)]
+    assert parsed[0][1]["total"] == 4.0
+
+
+@pytest.mark.parametrize("path", SAMPLES, ids=os.path.basename)
+def test_detected_store_matches_legacy_parser(path):
+    # Samples whose header names no store fall back to the generic grammar
+    text = read_sample(path)
+    parsed = parse_receipt_lines(text.splitlines())
+    assert as_legacy(parsed) == legacy_parse_aldi_receipt(text)
+
+
+def test_detect_template():
+    assert detect_template(["", "ALDI'S #123", "aldi"]).name == "Aldi"
+    assert detect_template(["WALMART", "BREAD | 2.49 | F"]) is None
+    assert is_store_header("Aldi")
+    assert not is_store_header("BREAD")
+    assert get_template().name == "Generic"
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Register templates on a copy of the registry, dropped after the test."""
+    monkeypatch.setattr(
+        receipt_templates, "_TEMPLATES", dict(receipt_templates._TEMPLATES)
+    )
+    monkeypatch.setattr(
+        receipt_templates, "_KEYWORD_INDEX", dict(receipt_templates._KEYWORD_INDEX)
+    )
+
+
+def test_registered_template_grammar(registry):
+    register_template(
+        StoreTemplate(
+            "Corner Shop",
+            keywords=("CORNER",),
+            delimiter=";",
+            price_column=1,
+            tax_column=2,
+            tax_codes=("T", "N"),
+            total_markers=("AMOUNT DUE",),
+        )
+    )
+    lines = [
+        "CORNER SHOP",
+        "COFFEE; 4.50; T",
+        "SOUVENIR; 9.99; X",  # Unknown tax code
+        "AMOUNT DUE; 4.50",
+    ]
+    parsed = parse_receipt_lines(lines)
+    assert parsed["store"] == "Corner Shop"
+    # Undelimited lines prefix the next item, the header included
+    assert parsed["items"] == [
+        {"name": "CORNER SHOP COFFEE", "price": 4.5, "tax_class": "T", "line": 2}
+    ]
+    assert parsed["total"] == 4.5
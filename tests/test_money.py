@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from money import (
+    allocate,
+    format_cents,
+    from_cents,
+    parse_cents,
+    split_evenly,
+    to_cents,
+)
+
+
+@pytest.mark.parametrize(
+    "text, cents",
+    [
+        ("12.99", 1299),
+        ("$3.5", 350),
+        ("-0.40", -40),
+        ("7", 700),
+        (".5", 50),
+        ("  2.10 ", 210),
+        ("1.004", 100),
+        ("1.005", 101),  # Half away from zero, without float error
+        ("-1.005", -101),
+        ("0.999", 100),
+    ],
+)
+def test_parse_cents(text, cents):
+    assert parse_cents(text) == cents
+
+
+@pytest.mark.parametrize("text", ["", ".", "$", "abc", "1.2.3", "12,99", "1e3"])
+def test_parse_cents_rejects(text):
+    with pytest.raises(ValueError):
+        parse_cents(text)
+
+
+def test_to_cents():
+    assert to_cents(0.1 + 0.2) == 30
+    assert to_cents("4.20") == 420
+    assert to_cents(3) == 300
+
+
+def test_from_and_format_cents():
+    assert from_cents(1299) == 12.99
+    assert from_cents(np.array([1, 250])).tolist() == [0.01, 2.5]
+    assert format_cents(1299) == "$12.99"
+    assert format_cents(-5) == "-$0.05"
+
+
+def test_allocate_ties_go_left():
+    assert allocate(100, [1, 1, 1]).tolist() == [34, 33, 33]
+    assert allocate(101, [1, 1, 1]).tolist() == [34, 34, 33]
+
+
+def test_allocate_skips_zero_weights():
+    assert allocate([100, 100], [[0, 1, 1], [0, 0, 0]]).tolist() == [
+        [0, 50, 50],
+        [0, 0, 0],
+    ]
+    assert allocate(1, [0, 1, 1]).tolist() == [0, 1, 0]
+
+
+@pytest.mark.parametrize("integral", [True, False])
+@pytest.mark.parametrize("seed", range(10))
+def test_allocate_rows_add_up(seed, integral):
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(0, 100000, 200)
+    if integral:
+        weights = rng.integers(0, 4, (200, 6))
+    else:
+        weights = rng.random((200, 6)) * (rng.random((200, 6)) > 0.3)
+    shares = allocate(amounts, weights)
+
+    assert shares.dtype == np.int64
+    assigned = weights.sum(axis=1) > 0
+    assert (shares.sum(axis=1) == np.where(assigned, amounts, 0)).all()
+    # Every share is its exact proportion rounded down or up
+    exact = (
+        amounts[:, None] * weights / np.where(assigned, weights.sum(axis=1), 1)[:, None]
+    )
+    assert (np.abs(shares - exact) < 1).all()
+    assert (shares[weights == 0] == 0).all()
+    # Rows are independent of each other's position
+    order = rng.permutation(200)
+    assert (allocate(amounts[order], weights[order]) == shares[order]).all()
+
+
+def test_split_evenly():
+    assert split_evenly(100, 3) == [34, 33, 33]
+    assert split_evenly(5, 5) == [1] * 5
@@ -0,0 +1,96 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from settlement import net_balances, settle, settle_receipts
+
+
+def max_zero_sum_groups(values):
+    """Most groups a zero-sum list of balances splits into, by brute force."""
+    if not values:
+        return 0
+    first, rest = values[0], values[1:]
+    best = 0
+    for size in range(len(rest) + 1):
+        for others in combinations(range(len(rest)), size):
+            if first + sum(rest[i] for i in others) == 0:
+                left = [v for i, v in enumerate(rest) if i not in others]
+                best = max(best, 1 + max_zero_sum_groups(left))
+    return best
+
+
+def random_balances(rng, n):
+    """n nonzero integer balances summing to zero, with small values so groups occur."""
+    while True:
+        values = list(rng.integers(-6, 7, n - 1))
+        values.append(-sum(values))
+        if all(values):
+            return {f"p{i}": int(v) for i, v in enumerate(values)}
+
+
+def assert_settles(balances, transfers):
+    """Applying the transfers brings every balance to zero."""
+    left = dict(balances)
+    for debtor, creditor, amount in transfers:
+        cents = round(amount * 100)
+        assert cents > 0
+        assert left[debtor] < 0 < left[creditor]
+        left[debtor] += cents
+        left[creditor] -= cents
+    assert not any(left.values())
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_exact_is_minimal(seed):
+    rng = np.random.default_rng(seed)
+    balances = random_balances(rng, int(rng.integers(2, 8)))
+    transfers = settle(balances)
+    assert_settles(balances, transfers)
+    # A zero-sum group of k people settles in k - 1 transfers, and no fewer
+    groups = max_zero_sum_groups(list(balances.values()))
+    assert len(transfers) == len(balances) - groups
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_greedy_settles_in_fewer_than_n(seed):
+    rng = np.random.default_rng(seed)
+    balances = random_balances(rng, 30)
+    transfers = settle(balances, exact_limit=0)
+    assert_settles(balances, transfers)
+    assert len(transfers) <= len(balances) - 1
+
+
+def test_settle_rejects_unbalanced():
+    with pytest.raises(ValueError):
+        settle({"Ana": 100, "Ben": -99})
+
+
+def test_net_balances_in_cents():
+    balances = net_balances([("Ana", 0.1)] * 3, [{"Ana": 0.1, "Ben": 0.2}])
+    assert balances == {"Ana": 20, "Ben": -20}
+
+
+def test_settle_receipts():
+    payments = [("Ana", 30.0), ("Ben", 12.5)]
+    splits = [{"Ana": 10.0, "Ben": 10.0, "Cy": 10.0}, {"Ana": 2.5, "Cy": 10.0}]
+    # Ana is owed 17.50, Ben 2.50, and Cy owes 20.00
+    assert settle_receipts(payments, splits) == [
+        ("Cy", "Ana", 17.5),
+        ("Cy", "Ben", 2.5),
+    ]
+
+
+def test_settle_receipts_absorbs_rounding():
+    # 10.00 split three ways leaves one cent over
+    payments = [("Ana", 10.0)]
+    splits = [{"Ana": 3.33, "Ben": 3.33, "Cy": 3.33}]
+    transfers = settle_receipts(payments, splits)
+    assert sorted(transfers) == [("Ben", "Ana", 3.33), ("Cy", "Ana", 3.33)]
+
+
+def test_settle_receipts_rejects_missing_payment():
+    payments = [("Ana", 10.0)]
+    splits = [{"Ana": 5.0, "Ben": 5.0}, {"Ana": 2.0, "Ben": 2.0}]
+    with pytest.raises(ValueError, match="more than rounding"):
+        settle_receipts(payments, splits)
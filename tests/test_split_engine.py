@@ -0,0 +1,313 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from money import to_cents
+from split_engine import (
+    EXCLUDED,
+    BillItem,
+    BillLedger,
+    SessionLedger,
+    SplitLedger,
+    amounts_by_name,
+    assignment_matrix,
+    batch_split_totals,
+    calculate_bill,
+    item_cents,
+    resolve_split_quantities,
+    split_dataframe,
+    split_totals,
+)
+
+PEOPLE = ["Ana", "Ben", "Cy", "Dee", "Eli"]
+
+
+def legacy_calculate_splits(df, item_assignments):
+    """The row-by-row split dash.py used before the assignment matrix."""
+    participant_splits = {}
+    for _, row in df.iterrows():
+        item_name = row["Item Name"]
+        if item_assignments.get(item_name) == EXCLUDED:
+            continue
+        assigned_participants = item_assignments.get(item_name, [])
+        if not assigned_participants:
+            continue
+        split_value = row["Price"] * row["Quantity"] / len(assigned_participants)
+        for participant in assigned_participants:
+            participant_splits[participant] = (
+                participant_splits.get(participant, 0.0) + split_value
+            )
+    return participant_splits
+
+
+def random_receipt(rng, n_rows=40, n_names=15):
+    """A receipt with repeated item names and list, excluded or missing assignments."""
+    names = [f"item {i}" for i in range(n_names)]
+    df = pd.DataFrame(
+        {
+            "Item Name": rng.choice(names, n_rows),
+            "Price": rng.integers(1, 5000, n_rows) / 100,
+            "Quantity": rng.integers(1, 4, n_rows),
+        }
+    )
+    assignments = {}
+    for name in names:
+        kind = rng.integers(4)
+        if kind == 0:
+            assignments[name] = EXCLUDED
+        elif kind == 1:
+            assignments[name] = []
+        elif kind == 2:
+            continue  # Never assigned
+        else:  # Repeats count as extra shares
+            assignments[name] = list(rng.choice(PEOPLE, rng.integers(1, 5)))
+    return df, assignments
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+@pytest.mark.parametrize("seed", range(20))
+def test_split_totals_match_iterrows(seed, sparse):
+    df, assignments = random_receipt(np.random.default_rng(seed))
+    weights, participants = assignment_matrix(
+        df["Item Name"].tolist(), assignments, sparse=sparse
+    )
+    totals = split_totals(df["Price"] * df["Quantity"], weights)
+
+    expected = legacy_calculate_splits(df, assignments)
+    assert sorted(participants) == sorted(expected)
+    for participant, total in zip(participants, totals):
+        assert total == pytest.approx(expected[participant], abs=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_split_dataframe_matches_iterrows_to_the_cent(seed):
+    df, assignments = random_receipt(np.random.default_rng(seed))
+    splits = split_dataframe(df, assignments)
+
+    expected = legacy_calculate_splits(df, assignments)
+    assert splits.keys() == expected.keys()
+    # Each distinct item is rounded to whole cents once
+    tolerance = 0.01 * df["Item Name"].nunique() + 1e-9
+    for participant, total in splits.items():
+        assert abs(total - expected[participant]) <= tolerance
+
+
+def test_weighted_assignment():
+    df = pd.DataFrame({"Item Name": ["pizza"], "Price": [12.0], "Quantity": [1]})
+    weights, participants = assignment_matrix(
+        ["pizza"], {"pizza": {"Ana": 2, "Ben": 1}}
+    )
+    totals = dict(zip(participants, split_totals([12.0], weights)))
+    assert totals == {"Ana": 8.0, "Ben": 4.0}
+    assert split_dataframe(df, {"pizza": {"Ana": 2, "Ben": 1}}) == totals
+
+
+def test_fixed_participants_reject_unknown():
+    with pytest.raises(KeyError):
+        assignment_matrix(["pizza"], {"pizza": ["Zed"]}, participants=PEOPLE)
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_batch_split_totals_match_each_receipt(sparse):
+    rng = np.random.default_rng(0)
+    receipts = [random_receipt(rng, n_rows=int(rng.integers(1, 30))) for _ in range(6)]
+    # Stack the receipts; names are made unique per receipt so assignments stay apart
+    frames, assignments = [], {}
+    for r, (df, receipt_assignments) in enumerate(receipts):
+        frames.append(df.assign(**{"Item Name": df["Item Name"] + f" #{r}"}))
+        assignments.update({f"{n} #{r}": a for n, a in receipt_assignments.items()})
+    stacked = pd.concat(frames, ignore_index=True)
+    receipt_index = np.repeat(np.arange(len(receipts)), [len(df) for df, _ in receipts])
+
+    weights, participants = assignment_matrix(
+        stacked["Item Name"].tolist(), assignments, participants=PEOPLE, sparse=sparse
+    )
+    totals = batch_split_totals(
+        stacked["Price"] * stacked["Quantity"], weights, receipt_index
+    )
+
+    assert totals.shape == (len(receipts), len(PEOPLE))
+    for r, (df, receipt_assignments) in enumerate(receipts):
+        expected = legacy_calculate_splits(df, receipt_assignments)
+        for j, participant in enumerate(participants):
+            assert totals[r, j] == pytest.approx(
+                expected.get(participant, 0.0), abs=1e-9
+            )
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_split_dataframe_adds_up_to_the_split_items(seed):
+    df, assignments = random_receipt(np.random.default_rng(seed))
+    splits = split_dataframe(df, assignments)
+
+    assigned = [
+        bool(assignments.get(n)) and assignments[n] != EXCLUDED for n in df["Item Name"]
+    ]
+    assert sum(to_cents(t) for t in splits.values()) == item_cents(df)[assigned].sum()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_split_ledger_matches_split_dataframe(seed):
+    rng = np.random.default_rng(seed)
+    df, assignments = random_receipt(rng)
+    ledger = SplitLedger(amounts_by_name(df))
+    # Assign in random order with reassignments on the way
+    names = list(assignments)
+    for name in rng.permutation(names + names[: len(names) // 2]):
+        ledger.assign(name, list(rng.choice(PEOPLE, rng.integers(1, 4))))
+    for name in rng.permutation(names):
+        ledger.assign(name, assignments[name])
+
+    assert ledger.splits() == split_dataframe(df, assignments)
+
+
+def test_session_ledger_adds_up_receipts():
+    rng = np.random.default_rng(0)
+    receipts = [random_receipt(rng) for _ in range(4)]
+    session = SessionLedger()
+    for r, (df, assignments) in enumerate(receipts):
+        session.add_receipt(r, amounts_by_name(df))
+        for name, assignment in assignments.items():
+            session.assign(r, name, assignment)
+    session.remove_receipt(3)
+    session.assign(0, next(iter(receipts[0][1])), EXCLUDED)
+    receipts[0][1][next(iter(receipts[0][1]))] = EXCLUDED
+
+    expected = {}
+    for df, assignments in receipts[:3]:
+        for participant, total in split_dataframe(df, assignments).items():
+            expected[participant] = expected.get(participant, 0) + to_cents(total)
+    assert {p: to_cents(t) for p, t in session.splits().items()} == expected
+    assert session.receipt_splits(1) == split_dataframe(*receipts[1])
+
+
+def legacy_bill(items, participants, discount):
+    """The float calculate_final_bill of gui ex2.py before split_engine."""
+    keys = ("total_before_tax", "taxable", "tax", "total_owed")
+    totals = {p: dict.fromkeys(keys, 0.0) for p in participants}
+    for item in items:
+        amount = item.price * item.quantity
+        taxed = item.tax_rate > 0
+        discounted = amount * (1 - discount) if taxed else amount
+        tax = discounted * item.tax_rate / 100
+        for person, qty in item.split_quantities.items():
+            share = qty / item.quantity
+            totals[person]["total_before_tax"] += share * discounted
+            totals[person]["taxable"] += share * discounted if taxed else 0.0
+            totals[person]["tax"] += share * tax
+            totals[person]["total_owed"] += share * (discounted + tax)
+    return totals
+
+
+def random_bill(rng, people=PEOPLE[:4]):
+    """Bill items with random tax rates and typed or equal quantity splits."""
+    items = []
+    for _ in range(rng.integers(0, 9)):
+        quantity = int(rng.integers(1, 6))
+        responsible = list(rng.choice(people, rng.integers(1, len(people) + 1), False))
+        entered = {
+            p: str(rng.integers(0, 2)) for p in responsible if rng.random() < 0.3
+        }
+        try:
+            split = resolve_split_quantities("item", quantity, responsible, entered)
+        except ValueError:
+            continue  # Typed quantities above the item's
+        price = int(rng.integers(0, 2000)) / 100
+        tax_rate = float(rng.choice([0, 0, 7.5, 10]))
+        items.append(BillItem("item", price, quantity, "category", tax_rate, split))
+    return items
+
+
+def test_resolve_split_quantities():
+    split = resolve_split_quantities("eggs", 6, ["Ana", "Ben", "Cy"], {"Ana": "2"})
+    assert split == {"Ana": 2.0, "Ben": 2.0, "Cy": 2.0}
+    assert resolve_split_quantities("eggs", 3, ["Ana", "Ben"], {"Ana": " "}) == {
+        "Ana": 1.5,
+        "Ben": 1.5,
+    }
+    for entered in ({"Ana": "7"}, {"Ana": "-1"}, {"Ana": "two"}):
+        with pytest.raises(ValueError):
+            resolve_split_quantities("eggs", 6, ["Ana", "Ben"], entered)
+
+
+def test_calculate_bill_discounts_taxable_items_only():
+    items = [
+        BillItem("soap", 10.0, 1, "Taxable", 10.0, {"Ana": 0.5, "Ben": 0.5}),
+        BillItem("bread", 5.0, 1, split_quantities={"Ana": 1}),
+        BillItem("milk", 2.0, 2, split_quantities={"Ben": 1}),  # One unit untaken
+    ]
+    bill = calculate_bill(items, ["Ana", "Ben", "Cy"], discount=0.1)
+
+    assert bill.totals["Ana"] == {
+        "total_before_tax": 9.5,
+        "taxable": 4.5,
+        "tax": 0.45,
+        "total_owed": 9.95,
+    }
+    assert bill.totals["Ben"]["total_owed"] == 6.95
+    assert bill.totals["Cy"]["total_owed"] == 0.0
+    assert bill.total_before_discount == 19.0
+    assert bill.total_after_discount == 16.9
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_calculate_bill_matches_float_split(seed):
+    rng = np.random.default_rng(seed)
+    items = random_bill(rng)
+    discount = float(rng.choice([0, 0.1, 0.25]))
+    bill = calculate_bill(items, PEOPLE[:4], discount)
+
+    expected = legacy_bill(items, PEOPLE[:4], discount)
+    # Each item's share and its tax are rounded to cents once
+    for person, totals in expected.items():
+        for key, value in totals.items():
+            assert abs(bill.totals[person][key] - value) <= 0.02 * len(items) + 1e-9
+    # The cent shares add up exactly
+    owed = sum(to_cents(t["total_owed"]) for t in bill.totals.values())
+    assert owed == to_cents(bill.total_after_discount)
+    parts = [bill.taxable, bill.non_taxable, bill.tax]
+    assert sum(map(to_cents, parts)) == to_cents(bill.total_after_discount)
+
+
+def test_calculate_bill_rejects_bad_discount():
+    with pytest.raises(ValueError):
+        calculate_bill([], discount=1.0)
+
+
+def random_item(rng):
+    """One random bill item, an unassigned one if random_bill made none."""
+    return next(iter(random_bill(rng)), BillItem("item", 1.0, 1))
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_bill_ledger_matches_calculate_bill(seed):
+    rng = np.random.default_rng(seed)
+    ledger = BillLedger()
+    items = {}
+    for step in range(40):
+        action = rng.random()
+        if action < 0.5 or not items:  # Add
+            item_id = f"item {step}"
+            items[item_id] = random_item(rng)
+            ledger.set_item(item_id, items[item_id])
+        elif action < 0.7:  # Edit
+            item_id = rng.choice(list(items))
+            items[item_id] = random_item(rng)
+            ledger.set_item(item_id, items[item_id])
+        elif action < 0.85:  # Remove
+            item_id = rng.choice(list(items))
+            del items[item_id]
+            ledger.set_item(item_id, None)
+        else:
+            ledger.set_discount(float(rng.choice([0, 0.1, 0.3])))
+
+        expected = calculate_bill(list(items.values()), PEOPLE[:2], ledger.discount)
+        assert ledger.summary(PEOPLE[:2]) == expected
+
+
+def test_bill_ledger_drops_people_with_no_items():
+    ledger = BillLedger()
+    ledger.set_item("soap", BillItem("soap", 3.0, 1, split_quantities={"Cy": 1}))
+    ledger.set_item("soap", None)
+    assert ledger.summary(["Ana"]).totals.keys() == {"Ana"}
+    assert ledger.summary().total_before_discount == 0